@@ -0,0 +1,256 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import numpy as np
+from pydantic import BaseModel, Field
+from agent.logger import logger
+from agent.priority import Priority
+
+
+class AdmissionConfig(BaseModel):
+    MAX_CONCURRENT_RUNS: int = Field(default=16, description="Maximum number of agent runs executing at once")
+    MAX_QUEUE_SIZE: int = Field(default=64, description="Maximum number of requests waiting for a run slot; more are rejected at once")
+    QUEUE_TIMEOUT: float = Field(default=30.0, description="Seconds a request may wait for a run slot before it is rejected")
+    TENANT_MAX_CONCURRENT_RUNS: Optional[int] = Field(
+        default=None,
+        description="Maximum concurrent runs of a single tenant (None for no per-tenant limit)"
+    )
+    TENANT_LIMITS: Dict[str, int] = Field(default_factory=dict, description="Per-tenant overrides of TENANT_MAX_CONCURRENT_RUNS")
+    TENANT_HEADER: str = Field(
+        default="X-Tenant-Id",
+        description="Request header naming the tenant; requests without it are grouped by API key"
+    )
+    BATCH_MAX_CONCURRENT_RUNS: Optional[int] = Field(
+        default=None,
+        description="Maximum concurrent batch runs, keeping the remaining slots for interactive runs (None for no separate limit)"
+    )
+    INTERACTIVE_WAIT_TARGET: float = Field(
+        default=2.0,
+        description="Queue wait in seconds above which interactive latency is at risk and no new batch runs are admitted"
+    )
+    RISK_WINDOW: float = Field(default=30.0, description="Seconds an interactive wait over the target keeps batch admission paused")
+    WAIT_SAMPLES: int = Field(default=1024, description="Number of recent queue waits kept for the wait time statistics")
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted; clients should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("tenant", "priority", "future", "enqueued")
+
+    def __init__(self, tenant: str, priority: Priority, future: asyncio.Future):
+        self.tenant = tenant
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class AdmissionSlot:
+    """A granted run slot; `release` it when the run is over. Releasing twice is harmless."""
+
+    def __init__(self, controller: "AdmissionController", tenant: str, priority: Priority, wait: float):
+        self.tenant = tenant
+        self.priority = priority
+        self.wait = wait
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self, time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """
+    Bounds the number of agent runs executing at once, overall and per tenant.
+
+    Requests over the limit wait in a bounded queue for up to
+    `QUEUE_TIMEOUT` seconds, interactive requests ahead of batch ones and
+    first come, first served within a priority; a waiter whose tenant is at
+    its own limit is skipped rather than blocking the queue. When the queue
+    is full a request is rejected immediately, so under overload the server
+    answers quickly with a retry hint instead of piling up work it cannot
+    finish. The retry hint is estimated from the recent run duration and the
+    current backlog.
+
+    Batch runs are capped at `BATCH_MAX_CONCURRENT_RUNS`, and while
+    interactive requests wait longer than `INTERACTIVE_WAIT_TARGET` no new
+    batch runs start. An interactive request arriving at a full queue
+    preempts the most recently queued batch request, which is rejected.
+
+    The controller lives on the server's event loop and is not thread-safe.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.config = AdmissionConfig(*args, **kwargs)
+        self._running = 0
+        self._tenant_running: Dict[str, int] = {}
+        self._queue: Deque[_Waiter] = deque()
+        self._waits: Deque[float] = deque(maxlen=self.config.WAIT_SAMPLES)
+        self._run_seconds: Optional[float] = None
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "timeout": 0, "preempted": 0}
+        self._priority_running = {priority: 0 for priority in Priority}
+        # Time until which batch admission is paused after a slow interactive wait
+        self._risk_until = 0.0
+
+    async def acquire(self, tenant: str = "default", priority: Priority = Priority.INTERACTIVE) -> AdmissionSlot:
+        """
+        Wait for a run slot for `tenant`.
+
+        Raises:
+            AdmissionRejected: If the queue is full, the wait timed out or the
+                request was preempted by interactive requests
+        """
+        if not self._queue and self._has_capacity(tenant, priority):
+            return self._grant(tenant, priority, 0.0)
+        if len(self._queue) >= self.config.MAX_QUEUE_SIZE and not (
+                priority is Priority.INTERACTIVE and self._preempt_batch()):
+            self._rejected["queue_full"] += 1
+            raise AdmissionRejected("Too many requests queued", self.retry_after())
+
+        waiter = _Waiter(tenant, priority, asyncio.get_running_loop().create_future())
+        self._queue.append(waiter)
+        # Earlier waiters may all be held back by their tenant limits
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), self.config.QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Granted (or preempted) just as the wait ran out
+                return waiter.future.result()
+            self._abandon(waiter)
+            self._rejected["timeout"] += 1
+            raise AdmissionRejected("Timed out waiting for a run slot", self.retry_after())
+        except asyncio.CancelledError:
+            # The client went away while queued; hand back a slot granted meanwhile
+            if waiter.future.done():
+                if waiter.future.exception() is None:
+                    waiter.future.result().release()
+            else:
+                self._abandon(waiter)
+            raise
+
+    def retry_after(self) -> int:
+        """Seconds until a new request is likely to be admitted."""
+        run_seconds = self._run_seconds or 1.0
+        backlog = len(self._queue) + 1
+        return max(1, math.ceil(run_seconds * backlog / self.config.MAX_CONCURRENT_RUNS))
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load, per-tenant usage and queue wait statistics in milliseconds."""
+        tenants: Dict[str, Dict[str, int]] = {
+            tenant: {"running": running, "queued": 0} for tenant, running in self._tenant_running.items()
+        }
+        priorities = {
+            priority.value: {"running": running, "queued": 0} for priority, running in self._priority_running.items()
+        }
+        for waiter in self._queue:
+            tenants.setdefault(waiter.tenant, {"running": 0, "queued": 0})["queued"] += 1
+            priorities[waiter.priority.value]["queued"] += 1
+        waits = np.asarray(self._waits, dtype=np.float64) * 1000.0
+        return {
+            "running": self._running,
+            "queued": len(self._queue),
+            "max_concurrent_runs": self.config.MAX_CONCURRENT_RUNS,
+            "max_queue_size": self.config.MAX_QUEUE_SIZE,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "tenants": tenants,
+            "priorities": priorities,
+            "batch_paused": self._batch_paused(time.monotonic()),
+            "wait_ms": {
+                "samples": len(waits),
+                "mean": round(float(waits.mean()), 3) if len(waits) else 0.0,
+                "p50": round(float(np.percentile(waits, 50)), 3) if len(waits) else 0.0,
+                "p95": round(float(np.percentile(waits, 95)), 3) if len(waits) else 0.0,
+                "max": round(float(waits.max()), 3) if len(waits) else 0.0,
+            },
+            "run_seconds_avg": round(self._run_seconds, 3) if self._run_seconds is not None else None,
+        }
+
+    def _tenant_limit(self, tenant: str) -> Optional[int]:
+        return self.config.TENANT_LIMITS.get(tenant, self.config.TENANT_MAX_CONCURRENT_RUNS)
+
+    def _has_capacity(self, tenant: str, priority: Priority) -> bool:
+        if self._running >= self.config.MAX_CONCURRENT_RUNS:
+            return False
+        if priority is Priority.BATCH:
+            batch_limit = self.config.BATCH_MAX_CONCURRENT_RUNS
+            if batch_limit is not None and self._priority_running[Priority.BATCH] >= batch_limit:
+                return False
+            if self._batch_paused(time.monotonic()):
+                return False
+        limit = self._tenant_limit(tenant)
+        return limit is None or self._tenant_running.get(tenant, 0) < limit
+
+    def _batch_paused(self, now: float) -> bool:
+        """Whether interactive latency is at risk: a recent or current interactive wait is over the target."""
+        if now < self._risk_until:
+            return True
+        target = self.config.INTERACTIVE_WAIT_TARGET
+        return any(
+            waiter.priority is Priority.INTERACTIVE and now - waiter.enqueued > target for waiter in self._queue
+        )
+
+    def _preempt_batch(self) -> bool:
+        """Reject the most recently queued batch request to make room; False if there is none."""
+        for waiter in reversed(self._queue):
+            if waiter.priority is Priority.BATCH and not waiter.future.done():
+                self._queue.remove(waiter)
+                waiter.future.set_exception(
+                    AdmissionRejected("Preempted by interactive requests", self.retry_after())
+                )
+                self._rejected["preempted"] += 1
+                return True
+        return False
+
+    def _grant(self, tenant: str, priority: Priority, wait: float) -> AdmissionSlot:
+        self._running += 1
+        self._tenant_running[tenant] = self._tenant_running.get(tenant, 0) + 1
+        self._priority_running[priority] += 1
+        self._admitted += 1
+        self._waits.append(wait)
+        if priority is Priority.INTERACTIVE and wait > self.config.INTERACTIVE_WAIT_TARGET:
+            self._risk_until = time.monotonic() + self.config.RISK_WINDOW
+            # Queued batch requests may start once the pause is over
+            asyncio.get_running_loop().call_later(self.config.RISK_WINDOW, self._dispatch)
+        return AdmissionSlot(self, tenant, priority, wait)
+
+    def _release(self, slot: AdmissionSlot, run_seconds: float) -> None:
+        self._running -= 1
+        self._priority_running[slot.priority] -= 1
+        remaining = self._tenant_running.pop(slot.tenant) - 1
+        if remaining:
+            self._tenant_running[slot.tenant] = remaining
+        # Exponentially weighted average of run durations for the retry hint
+        self._run_seconds = run_seconds if self._run_seconds is None else 0.9 * self._run_seconds + 0.1 * run_seconds
+        self._dispatch()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        self._queue.remove(waiter)
+        waiter.future.cancel()
+
+    def _dispatch(self) -> None:
+        """Admit queued requests by priority and age, skipping those that are held back by a limit."""
+        if not self._queue or self._running >= self.config.MAX_CONCURRENT_RUNS:
+            return
+        now = time.monotonic()
+        for waiter in sorted(self._queue, key=lambda waiter: (waiter.priority.rank, waiter.enqueued)):
+            if self._running >= self.config.MAX_CONCURRENT_RUNS:
+                break
+            if waiter.future.done() or not self._has_capacity(waiter.tenant, waiter.priority):
+                continue
+            self._queue.remove(waiter)
+            waiter.future.set_result(self._grant(waiter.tenant, waiter.priority, now - waiter.enqueued))
+        logger.debug(f"Admission: {self._running} running, {len(self._queue)} queued")
@@ -1,73 +1,279 @@
 from .cognitive_engine import CognitiveEngine
 from .retriever import Retriever
-from .toolkit import Toolkit
-from .input import Input
-from typing import Dict, Any, Generator
+from .toolkit import Toolkit, ToolResultCache
+from .input import Input, InputType
+from .retriever.reference_documents import BaseReferenceDocument
+from .retriever.attachments import AttachmentChunk, AttachmentIndex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Generator, List, Optional, Tuple
 from agent.memory import Memory
+from agent.conversation_store import ConversationStore, ConversationCache
+from agent.timing import StageTimer
+from agent.messages import Event, Message
+from agent.cancellation import CancellationToken
+from agent.priority import Priority
+from agent.workers import register_after_fork
+from agent.warmup import prestart
+from agent.logger import logger
 
 class Agent:
-    def __init__(self, toolkit: Toolkit, cognitive_engine: CognitiveEngine, retriever: Retriever):
+    def __init__(
+        self,
+        toolkit: Toolkit,
+        cognitive_engine: CognitiveEngine,
+        retriever: Retriever,
+        conversation_store: Optional[ConversationStore] = None,
+        max_cached_conversations: int = 1024
+    ):
         self.toolkit = toolkit
         self.cognitive_engine = cognitive_engine
         self.retriever = retriever
+        self.conversations = ConversationCache(
+            conversation_store, max_cached_conversations
+        ) if conversation_store else None
+        self._executor = None
+        self._summarizing = set()
+        self._summarizing_lock = threading.Lock()
+        register_after_fork(self)
+    
+    def _after_fork(self):
+        # Pool threads do not survive a fork; the pool is recreated on first use
+        self._executor = None
+        self._summarizing = set()
+        self._summarizing_lock = threading.Lock()
     
     def setup(self):
         if self.retriever:
             self.retriever.setup()
     
+    def close(self):
+        """Persist pending conversation writes and release the conversation store."""
+        if self.conversations:
+            self.conversations.close()
+    
+    def warmup_steps(self) -> Dict[str, Callable[[], Any]]:
+        """
+        Steps that move the cost of first use of each component out of the
+        first request, by component name, for `agent.warmup.Warmup`.
+        """
+        steps = {
+            "llm": self.cognitive_engine.provider.warmup,
+            "prompt": lambda: self.cognitive_engine.build_system_prompt(self.toolkit),
+        }
+        if self.retriever:
+            steps["embeddings"] = self.retriever.embedding_provider.warmup
+            steps["vector_index"] = self.retriever.vector_db.warmup
+        steps["tools"] = self.toolkit.warmup
+        
+        def executors():
+            prestart(self.executor)
+            if self.retriever:
+                prestart(self.retriever.executor)
+        
+        steps["executors"] = executors
+        return steps
+    
     def load_data_to_vector_db(self):
         if self.retriever:
             self.retriever.load_data_to_vector_db()
       
-    def respond(self, input: Input, conversation_id: str = None):
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool for work that overlaps with the request path."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent")
+        return self._executor
+
+    def respond(
+        self,
+        input: Input,
+        conversation_id: str = None,
+        cancellation: Optional[CancellationToken] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        tool_cache: Optional[ToolResultCache] = None
+    ):
         """
         Process input and generate a response using the cognitive engine.
         
+        Retrieval (including the semantic answer cache lookup) and the
+        selection of relevant attachment excerpts run in the background while
+        the conversation memory is loaded and the system prompt is rendered;
+        the first LLM call starts once all are ready.
+        
         Args:
             input: The input message and any attachments
             conversation_id: Optional ID to continue a previous conversation
+            cancellation: Optional token; cancelling it stops the LLM stream and
+                running tools and raises `RequestCancelled` from this generator
+            priority: Scheduling class of the run at the LLM rate limiter
+            tool_cache: Optional cache of tool results shared with other runs,
+                e.g. the items of a batch
             
-        Returns:
-            When not streaming: A tuple containing (response_text, updated_state)
-            When streaming: A generator yielding response chunks
+        Yields:
+            Response event chunks, followed by a final "timings" event with
+            per-stage durations in milliseconds
         """
-        memory = Memory(conversation_id)
+        timer = StageTimer()
+        retrieval = None
+        if self.retriever:
+            retrieval = self.executor.submit(timer.timed("retrieval", self._retrieve), input)
+        attachments = None
+        if input.attachments:
+            attachments = self.executor.submit(timer.timed("attachments", self._select_attachments), input)
+        
+        with timer.stage("memory"):
+            memory = Memory(conversation_id, cache=self.conversations)
+        
+        with timer.stage("prompt"):
+            system_prompt = self.cognitive_engine.build_system_prompt(self.toolkit)
+        
+        cached_answer, reference_documents = None, []
+        if retrieval is not None:
+            with timer.stage("retrieval_wait"):
+                cached_answer, reference_documents = retrieval.result()
+        if attachments is not None:
+            with timer.stage("attachments_wait"):
+                attachments = attachments.result()
+        if cancellation is not None:
+            cancellation.raise_if_cancelled()
         
-        # Track the user's message in memory (no persistence)
-        memory.add_message("user", input.message)
+        # Answers only depend on the question for fresh conversations without attachments
+        cacheable = self.retriever is not None and not memory.raw_messages and not input.attachments
+        if cacheable and cached_answer is not None:
+            memory.add_messages([
+                Message("user", input.message),
+                Message("assistant", cached_answer)
+            ])
+            yield Event("answer", cached_answer, True)
+            timer.mark("total")
+            yield Event("timings", timer.as_dict(), True)
+            return
+        if cached_answer is not None:
+            # Retrieval stopped at a cached answer that the conversation's history rules out
+            with timer.stage("retrieval_fallback"):
+                reference_documents = self.retriever.query_and_retrieve(query=input.message)
         
+        answer_parts = []
+        first_event = True
         # Apply buffering to the raw events from the cognitive engine
         for event in self.buffer_events(
             self.cognitive_engine.respond(
                 input=input,
                 memory=memory,
-                toolkit=self.toolkit
+                toolkit=self.toolkit,
+                reference_documents=reference_documents,
+                system_prompt=system_prompt,
+                attachments=attachments,
+                cancellation=cancellation,
+                priority=priority,
+                tool_cache=tool_cache
             )
         ):
+            if first_event:
+                timer.mark("first_event")
+                first_event = False
+            
             # If this is an answer chunk, collect it for memory
-            if event["type"] == "answer":
-                # If this is the final chunk, add to memory (no persistence)
-                if event.get("finished", False):
-                    # External service would handle persistence 
-                    pass
+            if event.type == "answer":
+                answer_parts.append(event.content)
+                # Record the completed turn; the conversation cache persists it in the background
+                if event.finished:
+                    answer = "".join(answer_parts)
+                    memory.add_messages([
+                        Message("user", input.message),
+                        Message("assistant", answer)
+                    ])
+                    self._schedule_summary(memory)
+                    if cacheable:
+                        self.retriever.store_answer(input.message, answer)
             
             # Yield the event to the caller
             yield event
+        
+        timer.mark("total")
+        timings = timer.as_dict()
+        logger.debug(f"Response stage timings (ms): {timings}")
+        yield Event("timings", timings, True)
+    
+    def _retrieve(self, input: Input) -> Tuple[Optional[str], List[BaseReferenceDocument]]:
+        """
+        Look up a cached answer for the question and otherwise retrieve the
+        reference documents for it. Both share one query embedding.
+
+        The conversation history is loaded concurrently, so a cached answer may
+        turn out to be unusable; `respond` then retrieves the documents itself.
+        """
+        if not input.attachments:
+            cached_answer = self.retriever.lookup_answer(input.message)
+            if cached_answer is not None:
+                return cached_answer, []
+        return None, self.retriever.query_and_retrieve(query=input.message)
     
-    def start_server(self, host="0.0.0.0", port=8000):
+    def _schedule_summary(self, memory: Memory):
+        """
+        Compact the older part of a persisted conversation into its rolling
+        summary in the background once the history passes the token
+        threshold, so the next turn's prompt stays roughly the same size.
+        """
+        threshold = self.cognitive_engine.config.HISTORY_TOKEN_THRESHOLD
+        if self.conversations is None or threshold is None:
+            return
+        point = memory.compaction_point(threshold, self.cognitive_engine.config.HISTORY_KEEP_RECENT_TOKENS)
+        if point is None:
+            return
+        with self._summarizing_lock:
+            if memory.conversation_id in self._summarizing:
+                return
+            self._summarizing.add(memory.conversation_id)
+        
+        def summarize():
+            try:
+                summary = self.cognitive_engine.summarize(
+                    memory.summary, memory.raw_messages[memory.summarized:point]
+                )
+                if summary:
+                    memory.set_summary(summary, point)
+                    logger.debug(f"Summarized {point} messages of conversation {memory.conversation_id}")
+            except Exception as e:
+                logger.error(f"Failed to summarize conversation {memory.conversation_id}: {str(e)}")
+            finally:
+                with self._summarizing_lock:
+                    self._summarizing.discard(memory.conversation_id)
+        
+        self.executor.submit(summarize)
+    
+    def _select_attachments(self, input: Input) -> List[AttachmentChunk]:
+        """
+        Index the text attachments of an input for this request only and pick
+        the excerpts relevant to the message within the attachment token budget.
+        """
+        index = self.retriever.attachment_index() if self.retriever else AttachmentIndex()
+        for name, attachment in input.attachments.items():
+            if attachment.get("type") == InputType.TEXT.value:
+                index.add(name, attachment["content"])
+        return index.select(input.message, self.cognitive_engine.config.ATTACHMENT_TOKEN_BUDGET)
+    
+    def start_server(self, host="0.0.0.0", port=8000, admission=None, runs=None, jobs=None, workers=1, affinity=False):
         """
         Start the agent server.
         
         Args:
             host: The host to bind the server to
             port: The port to bind the server to
+            admission: Optional AdmissionController limiting concurrent runs
+            runs: Optional RunRegistry configuring event replay and the grace period
+            jobs: Optional JobQueue serving background runs under /v1/runs
+            workers: Number of server processes forked after the agent is set up
+            affinity: Whether to route requests to the worker holding their conversation, run or upload;
+                required with more than one worker
             
         Returns:
             None
         """
         from .server import AgentServer
-        server = AgentServer(self)
-        server.start(host=host, port=port)
+        server = AgentServer(self, admission=admission, runs=runs, jobs=jobs)
+        server.start(host=host, port=port, workers=workers, affinity=affinity)
     
     def buffer_events(self, events_generator: Generator) -> Generator[Dict[str, Any], None, None]:
         """
@@ -88,26 +294,26 @@ class Agent:
         min_buffer_size = 20  # Minimum number of characters before sending a buffer
         
         for event in events_generator:
-            tag = event["type"]
-            content = event["content"]
-            finished = event.get("finished", False)
+            tag = event.type
+            content = event.content
+            finished = event.finished
             
             # Tool events are always sent immediately
             if tag in ["tool", "tool_output", "tool_error"]:
                 # If we have a pending buffer, flush it first
                 if delta_buffer:
-                    yield {"type": buffer_tag, "content": delta_buffer, "finished": False}
+                    yield Event(buffer_tag, delta_buffer, False)
                     delta_buffer = ""
                 
                 # Send the tool event directly
-                yield {"type": tag, "content": content, "finished": finished}
+                yield Event(tag, content, finished)
                 current_tag = tag
                 last_content = content
                 continue
             
             # If tag changes, flush any existing buffer
             if tag != buffer_tag and delta_buffer:
-                yield {"type": buffer_tag, "content": delta_buffer, "finished": False}
+                yield Event(buffer_tag, delta_buffer, False)
                 delta_buffer = ""
             
             # For tag transitions or new tags
@@ -120,7 +326,7 @@ class Agent:
                         delta_buffer = content
                     else:
                         # Send substantial content directly
-                        yield {"type": tag, "content": content, "finished": finished}
+                        yield Event(tag, content, finished)
                         
                 current_tag = tag
                 last_content = content
@@ -137,7 +343,7 @@ class Agent:
                             
                             # Flush the buffer if it's large enough or this is the final chunk
                             if len(delta_buffer) >= min_buffer_size or finished:
-                                yield {"type": buffer_tag, "content": delta_buffer, "finished": finished}
+                                yield Event(buffer_tag, delta_buffer, finished)
                                 delta_buffer = ""
                                 buffer_tag = None if finished else tag
                         else:
@@ -146,20 +352,17 @@ class Agent:
                                 buffer_tag = tag
                                 delta_buffer = delta
                             else:
-                                yield {"type": tag, "content": delta, "finished": finished}
+                                yield Event(tag, delta, finished)
                 
                 # If content is unchanged but finished status changed, send an empty chunk with finished=True
-                elif finished and not event.get("last_finished", False):
+                elif finished:
                     # Flush any buffer first
                     if delta_buffer:
-                        yield {"type": buffer_tag, "content": delta_buffer, "finished": False}
+                        yield Event(buffer_tag, delta_buffer, False)
                         delta_buffer = ""
                     
-                    yield {"type": tag, "content": "", "finished": True}
-            
-            # Remember the last finished status for this tag
-            event["last_finished"] = finished
+                    yield Event(tag, "", True)
             
         # Flush any remaining buffer at the end
         if delta_buffer:
-            yield {"type": buffer_tag, "content": delta_buffer, "finished": True}
+            yield Event(buffer_tag, delta_buffer, True)
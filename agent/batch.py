@@ -0,0 +1,149 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from pydantic import BaseModel, field_validator
+from agent.input import Input
+from agent.cancellation import CancellationToken, RequestCancelled
+from agent.priority import Priority
+from agent.toolkit import ToolResultCache
+from agent.logger import logger
+
+
+class BatchItem(BaseModel):
+    """One line of a batch file: a chat completion request without streaming options."""
+    messages: List[Dict[str, str]]
+    custom_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    attachments: Optional[Dict[str, bytes]] = None
+
+    @field_validator("attachments", mode="before")
+    def encode_attachments(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, bytes]]:
+        """JSON lines carry attachments as text; the agent expects UTF-8 bytes."""
+        if value is None:
+            return None
+        return {name: content.encode("utf-8") if isinstance(content, str) else content for name, content in value.items()}
+
+    def to_input(self) -> Input:
+        user_messages = [message for message in self.messages if message.get("role") == "user"]
+        if not user_messages:
+            raise ValueError("No user message provided")
+        return Input(message=user_messages[-1]["content"], attachments=self.attachments or {})
+
+
+def parse_items(lines: Iterable[Union[str, bytes]]) -> Iterator[Tuple[int, Union[BatchItem, Exception]]]:
+    """
+    Parse the lines of a JSONL batch file, skipping blank lines.
+
+    Yields:
+        (index, item) pairs, with the parse error in place of the item for
+        malformed lines so that one bad line does not fail the whole batch
+    """
+    index = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield index, BatchItem.model_validate_json(line)
+        except Exception as e:
+            yield index, e
+        index += 1
+
+
+def failed_result(index: int, error: Union[Exception, str], custom_id: Optional[str] = None) -> Dict[str, Any]:
+    return {"index": index, "custom_id": custom_id, "status": "failed", "error": str(error)}
+
+
+def run_item(
+    agent,
+    index: int,
+    item: BatchItem,
+    cancellation: Optional[CancellationToken] = None,
+    tool_cache: Optional[ToolResultCache] = None,
+    priority: Priority = Priority.BATCH
+) -> Dict[str, Any]:
+    """
+    Run one batch item to completion on the calling thread.
+
+    Args:
+        agent: The agent to run the item with
+        index: Position of the item in the batch
+        item: The parsed item
+        cancellation: Optional token shared by the whole batch
+        tool_cache: Cache of tool results shared by the items of the batch
+        priority: Priority of the run at the LLM rate limiter
+
+    Returns:
+        The result line: the answer and stage timings in milliseconds, or
+        the error that failed the item
+    """
+    start = time.perf_counter()
+    try:
+        answer_parts = []
+        timings = {}
+        for event in agent.respond(
+            input=item.to_input(),
+            conversation_id=item.conversation_id,
+            cancellation=cancellation,
+            priority=priority,
+            tool_cache=tool_cache
+        ):
+            if event["type"] == "answer":
+                answer_parts.append(event["content"])
+            elif event["type"] == "timings":
+                timings = event["content"]
+    except RequestCancelled:
+        return failed_result(index, "Batch cancelled", item.custom_id)
+    except Exception as e:
+        logger.error(f"Batch item {index} failed: {str(e)}")
+        result = failed_result(index, e, item.custom_id)
+        result["timings"] = {"total_ms": round((time.perf_counter() - start) * 1000, 3)}
+        return result
+    timings = dict(timings)
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return {
+        "index": index,
+        "custom_id": item.custom_id,
+        "status": "succeeded",
+        "conversation_id": item.conversation_id,
+        "response": {"role": "assistant", "content": "".join(answer_parts)},
+        "timings": timings,
+    }
+
+
+def run_batch(
+    agent,
+    lines: Iterable[Union[str, bytes]],
+    concurrency: int = 4,
+    cancellation: Optional[CancellationToken] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run the items of a JSONL batch file with at most `concurrency` items at
+    once, for offline use without a server.
+
+    The items share the agent, and with it the embedding and answer caches,
+    and one tool result cache for the batch.
+
+    Yields:
+        Result lines in completion order, each tagged with its item's index
+    """
+    tool_cache = ToolResultCache()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="agent-batch") as executor:
+        futures = []
+        for index, item in parse_items(lines):
+            if isinstance(item, Exception):
+                yield failed_result(index, item)
+                continue
+            futures.append(executor.submit(run_item, agent, index, item, cancellation, tool_cache))
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Items not started yet are dropped when the consumer stops early
+            for future in futures:
+                future.cancel()
+    logger.info(f"Batch finished, tool cache: {tool_cache.hits} hits, {tool_cache.misses} misses")
+
+
+def dumps_result(result: Dict[str, Any]) -> str:
+    return json.dumps(result, default=str) + "\n"
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class RequestCancelled(BaseException):
+    """
+    Raised inside a request's work once its cancellation token is cancelled.
+
+    Like `GeneratorExit` it derives from `BaseException`, so the handlers that
+    turn tool and provider failures into error events let it through.
+    """
+    pass
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for one request, shared by the server, the
+    agent, the cognitive engine, LLM providers and tools.
+
+    Code that runs in a loop checks `raise_if_cancelled` between steps. Code
+    that blocks, such as reading an upstream HTTP stream or waiting on a
+    child process, registers a callback that unblocks it (closing the stream,
+    killing the process); callbacks run on the cancelling thread.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._next_id = 0
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the request and run the registered callbacks, once."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RequestCancelled(self.reason)
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run `callback` when the token is cancelled, immediately if it already
+        is. Returns a function that unregisters the callback.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                callback_id = self._next_id
+                self._next_id += 1
+                self._callbacks[callback_id] = callback
+                return lambda: self._unregister(callback_id)
+        callback()
+        return lambda: None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the token is cancelled or `timeout` passes; True if cancelled."""
+        return self._event.wait(timeout)
+
+    def _unregister(self, callback_id: int) -> None:
+        with self._lock:
+            self._callbacks.pop(callback_id, None)
+
+
+def sleep(seconds: float, cancellation: Optional[CancellationToken] = None) -> bool:
+    """Sleep for `seconds`, waking early on cancellation. Returns True if cancelled."""
+    if cancellation is None:
+        time.sleep(seconds)
+        return False
+    return cancellation.wait(seconds)
@@ -1,12 +1,16 @@
 import json
+from contextlib import closing
 from typing import List, Dict, Any, Optional
 from .config import CognitiveEngineConfig
-from agent.toolkit import Toolkit
+from agent.toolkit import Toolkit, ToolOutput, ToolResultCache, as_op
 from agent.input import Input
 from agent.logger import logger
 from .response_parser import ResponseParser
 from .prompt_template import PromptTemplate
 from agent.memory import Memory
+from agent.messages import Event, Message, as_message
+from agent.cancellation import CancellationToken
+from agent.priority import Priority
 class CognitiveEngine:
     def __init__(self, *args, **kwargs):
         self.config = CognitiveEngineConfig(*args, **kwargs)
@@ -14,6 +18,7 @@ class CognitiveEngine:
         self.role = self.config.AGENT_ROLE
         self.permissions = self.config.AGENT_PERMISSIONS
         self.provider = self.config.LLM_PROVIDER
+        self.rate_limiter = self.config.RATE_LIMITER
         self.response_parser = ResponseParser
         self.prompt_template = PromptTemplate(
             name=self.name,
@@ -21,73 +26,138 @@ class CognitiveEngine:
             permissions=self.permissions,
         )
         
+    def build_system_prompt(self, toolkit: Toolkit = None) -> str:
+        """
+        Render the static part of the system prompt (role, permissions, tools
+        and response format) for the given toolkit.
+        """
+        return self.prompt_template.render(toolkit)
+
     def respond(self, 
             input: Input,
             toolkit: Toolkit = None,
             memory: Memory = None,
+            reference_documents: Optional[List] = None,
+            system_prompt: Optional[str] = None,
+            attachments: Optional[List] = None,
+            cancellation: Optional[CancellationToken] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            tool_cache: Optional[ToolResultCache] = None,
         ):
         """
         Core method that processes user input and produces reasoning events.
         
         Args:
             input: The user input message and attachments
-            messages: List of previous conversation messages with roles and content
             toolkit: Optional toolkit for tool usage
+            memory: Conversation history
+            reference_documents: Retrieved documents to include in the system prompt
+            system_prompt: Pre-rendered output of `build_system_prompt`, rendered here if omitted
+            attachments: Attachment excerpts selected for this message
+            cancellation: Optional token; once cancelled, the LLM stream is closed,
+                running tools are stopped and `RequestCancelled` is raised
+            priority: Priority of the run at the LLM rate limiter
+            tool_cache: Optional cache of tool results shared with other runs
             
         Yields:
             Raw reasoning events to be processed by the agent
         """
-        self.prompt_template.set_toolkit(toolkit)
+        if system_prompt is None:
+            system_prompt = self.build_system_prompt(toolkit)
+        if memory is not None and memory.summary:
+            system_prompt += self.prompt_template.render_summary(memory.summary)
+        if reference_documents:
+            system_prompt += self.prompt_template.render_reference_documents(
+                reference_documents, self.config.REFERENCE_TOKEN_BUDGET
+            )
         
-        current_message = {"role": "user", "content": input.message}
+        content = input.message
+        if attachments:
+            content += self.prompt_template.render_attachments(attachments)
+        history = memory.messages if memory is not None else []
         
-        all_messages = memory.messages + [current_message]
+        yield from self._reason(
+            system_prompt, history + [Message("user", content)], toolkit, cancellation, priority, tool_cache
+        )
+
+    def summarize(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Fold older conversation messages into a rolling summary.
         
-        yield from self._reason(self.prompt_template, all_messages)
+        Args:
+            previous_summary: The current summary, if any
+            messages: The messages to add to it, oldest first
+            
+        Returns:
+            The new summary, or None if the LLM returned nothing
+        """
+        request = self.prompt_template.render_summary_request(previous_summary, messages)
+        # Summaries are background work and yield to interactive runs
+        self._throttle(request, Priority.BATCH, max_tokens=self.config.SUMMARY_MAX_TOKENS)
+        summary = self.provider.generate_response(
+            messages=request,
+            max_tokens=self.config.SUMMARY_MAX_TOKENS,
+            temperature=0.0
+        )
+        return summary.strip() if summary else None
 
-    def _reason(self, prompt_template: PromptTemplate, messages: List[Dict[str, str]]):
+    def _reason(
+            self,
+            system_prompt: str,
+            messages: List[Message],
+            toolkit: Toolkit = None,
+            cancellation: Optional[CancellationToken] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            tool_cache: Optional[ToolResultCache] = None
+        ):
         """
         Core reasoning method that processes LLM responses and handles different response types.
         
+        The message list sent to the LLM is built once and extended in place
+        with each iteration's thinking and tool results, so messages (and
+        their cached serialized forms) are shared across iterations.
+        
         Args:
-            prompt_template: The prompt template with the system message.
+            system_prompt: The rendered system prompt.
             messages: The conversation messages to send to the LLM.
+            toolkit: Optional toolkit used to execute requested tools.
+            cancellation: Optional token checked between events and iterations.
+            priority: Priority of the run at the LLM rate limiter.
+            tool_cache: Optional cache of tool results shared with other runs.
             
         Yields:
-            Dict objects with different response types (thinking, answer, tool_usage, tool_error, error).
+            Event objects with different response types (thinking, answer, tool_usage, tool_error, error).
         """
+        cancellation = cancellation or CancellationToken()
+        messages = [Message("system", system_prompt)] + [as_message(message) for message in messages]
         count = 0
         while count < self.config.MAX_ITERATIONS:
+            cancellation.raise_if_cancelled()
             count += 1
             logger.debug(f"Starting reasoning iteration {count}")
             
-            system_message = {
-                "role": "system",
-                "content": prompt_template.system_prompt,
-            }
-            llm_messages = [system_message] + messages
-            
-            logger.debug(f"Sending system prompt: {prompt_template.system_prompt}...")
+            logger.debug(f"Sending system prompt: {system_prompt}...")
             
             parser = self.response_parser()
             
-            for event in self._get_response(llm_messages, parser):
-                tag = event["type"]
-                data = event["content"]
-                finished = event["finished"]
+            for event in self._get_response(messages, parser, cancellation, priority):
+                cancellation.raise_if_cancelled()
+                tag = event.type
+                data = event.content
+                finished = event.finished
                 
                 logger.debug(f"Parser event: type={tag}, finished={finished}")
                 
                 if tag == "thinking":
-                    yield {"type": "thinking", "content": data, "finished": finished}
+                    yield Event("thinking", data, finished)
                     
                     if finished:
                         # Add thinking message to conversation for next iteration
-                        messages.append({"role": "assistant", "content": f"[Thinking] {data}"})
+                        messages.append(Message("assistant", f"[Thinking] {data}"))
                         logger.debug("Thinking phase complete")
 
                 elif tag == "answer":
-                    yield {"type": "answer", "content": data, "finished": finished}
+                    yield Event("answer", data, finished)
                     
                     if finished:
                         # Return after completed answer
@@ -95,7 +165,6 @@ class CognitiveEngine:
                         return
                 
                 elif tag == "tool" and finished:
-                    toolkit = prompt_template.toolkit
                     if toolkit:
                         try:
                             if isinstance(data, dict) and "name" in data and ("args" in data or "input" in data):
@@ -115,52 +184,24 @@ class CognitiveEngine:
                                 if toolkit.supports_streaming(tool_name):
                                     # Process streaming output
                                     logger.debug(f"Executing tool {tool_name} with streaming")
-                                    streaming_count = 0
-                                    final_output = None
-                                    
-                                    for partial_output in toolkit.invoke_stream(tool_name, tool_input):
-                                        streaming_count += 1
-                                        # Format the partial output
-                                        if isinstance(partial_output, dict):
-                                            output_str = json.dumps(partial_output)
-                                        else:
-                                            output_str = str(partial_output)
-                                        
-                                        # Check if this is a finished chunk
-                                        is_finished = False
-                                        if isinstance(partial_output, dict) and partial_output.get("finished", False):
-                                            is_finished = True
-                                            final_output = partial_output
-                                        
-                                        # Create tool result with output included
-                                        tool_with_output = {
-                                            "name": tool_name,
-                                            "input": tool_input,
-                                            "output": partial_output
-                                        }
-                                        tool_json = json.dumps(tool_with_output)
-                                        
-                                        # Yield the tool with output
-                                        yield {"type": "tool", "content": tool_json, "finished": is_finished}
-                                        
-                                        # If this isn't the final chunk, don't add to conversation memory yet
-                                        if not is_finished:
-                                            logger.debug(f"Streamed tool output {streaming_count}: partial result")
+                                    yield Event("tool", json.dumps({"name": tool_name, "input": tool_input}), True)
+                                    output = yield from self._stream_tool(
+                                        toolkit, tool_name, tool_input, cancellation, tool_cache
+                                    )
                                     
                                     # Add the final output to conversation for next iteration
-                                    if final_output:
-                                        tool_with_output = {
-                                            "name": tool_name,
-                                            "input": tool_input,
-                                            "output": final_output
-                                        }
-                                        tool_output_str = json.dumps(tool_with_output)
-                                        
-                                        messages.append({"role": "assistant", "content": f"<tool>{tool_output_str}</tool>"})
-                                        logger.debug(f"Tool {tool_name} streamed execution completed with {streaming_count} updates")
+                                    tool_with_output = {
+                                        "name": tool_name,
+                                        "input": tool_input,
+                                        "output": output
+                                    }
+                                    tool_output_str = json.dumps(tool_with_output)
+                                    
+                                    messages.append(Message("assistant", f"<tool>{tool_output_str}</tool>"))
                                 else:
                                     # Non-streaming tool execution
-                                    output = toolkit.invoke(tool_name, tool_input)
+                                    output = toolkit.invoke(tool_name, tool_input, tool_cache)
+                                    cancellation.raise_if_cancelled()
                                     
                                     # Create tool result with output included
                                     tool_with_output = {
@@ -170,53 +211,128 @@ class CognitiveEngine:
                                     }
                                     tool_output_str = json.dumps(tool_with_output)
                                     
-                                    messages.append({"role": "assistant", "content": f"<tool>{tool_output_str}</tool>"})
-                                    yield {"type": "tool", "content": tool_output_str, "finished": True}
+                                    messages.append(Message("assistant", f"<tool>{tool_output_str}</tool>"))
+                                    yield Event("tool", tool_output_str, True)
                                     
                                     logger.debug(f"Tool {tool_name} executed successfully")
                             else:
                                 error_msg = f"Invalid tool format: {data}"
-                                messages.append({"role": "assistant", "content": error_msg})
-                                yield {"type": "tool_error", "content": error_msg, "finished": True}
+                                messages.append(Message("assistant", error_msg))
+                                yield Event("tool_error", error_msg, True)
                                 logger.error(f"Tool execution error: {error_msg}")
                         except Exception as e:
                             tool_name = data["name"] if isinstance(data, dict) and "name" in data else "unknown"
                             error_msg = f"Error using tool {tool_name}: {str(e)}"
-                            messages.append({"role": "assistant", "content": error_msg})
-                            yield {"type": "tool_error", "content": error_msg, "finished": True}
+                            messages.append(Message("assistant", error_msg))
+                            yield Event("tool_error", error_msg, True)
                             logger.error(f"Tool execution error: {error_msg}")
                     else:
                         error_msg = "Tool requested but no toolkit available"
-                        messages.append({"role": "assistant", "content": error_msg})
-                        yield {"type": "tool_error", "content": error_msg, "finished": True}
+                        messages.append(Message("assistant", error_msg))
+                        yield Event("tool_error", error_msg, True)
                         logger.warning("Tool requested with no toolkit available")
         
         # If we reach here, we've hit the maximum iterations
         logger.warning(f"Maximum reasoning iterations ({self.config.MAX_ITERATIONS}) reached without conclusive answer")
-        yield {"type": "error", "content": "Maximum reasoning iterations reached without conclusive answer.", "finished": True}
+        yield Event("error", "Maximum reasoning iterations reached without conclusive answer.", True)
 
-    def _get_response(self, messages: List[dict], parser: ResponseParser):     
+    def _stream_tool(
+            self,
+            toolkit: Toolkit,
+            tool_name: str,
+            tool_input: Dict[str, Any],
+            cancellation: CancellationToken,
+            tool_cache: Optional[ToolResultCache] = None
+        ):
+        """
+        Run a streaming tool, forwarding each output operation as it arrives.
+        
+        Operations are serialized once, one JSON object per line, and yielded
+        as `tool_output` events that consumers pass through without parsing;
+        the complete output is rebuilt alongside for the conversation.
+        
+        Args:
+            toolkit: The toolkit holding the tool.
+            tool_name: Name of the tool to run.
+            tool_input: Arguments for the tool.
+            cancellation: Token that stops the tool when the request is cancelled.
+            tool_cache: Optional cache of tool results shared with other runs.
+            
+        Yields:
+            `tool_output` events, the last one empty and finished.
+            
+        Returns:
+            The complete tool output.
+        """
+        output = ToolOutput()
+        updates = 0
+        try:
+            for item in toolkit.invoke_stream(tool_name, tool_input, cancellation, tool_cache):
+                cancellation.raise_if_cancelled()
+                op = as_op(item)
+                output.apply(op)
+                updates += 1
+                yield Event("tool_output", op.to_json() + "\n", False)
+        except Exception:
+            # Close the output stream before the error is reported
+            yield Event("tool_output", "", True)
+            raise
+        cancellation.raise_if_cancelled()
+        yield Event("tool_output", "", True)
+        logger.debug(f"Tool {tool_name} streamed execution completed with {updates} updates")
+        return output.value()
+
+    def _throttle(
+            self,
+            messages: List[Message],
+            priority: Priority,
+            cancellation: Optional[CancellationToken] = None,
+            max_tokens: Optional[int] = None
+        ):
+        """Wait for the rate limiter, if any, to admit an LLM call with these messages."""
+        if self.rate_limiter is None:
+            return
+        tokens = sum(as_message(message).tokens for message in messages) + (max_tokens or self.config.MAX_TOKENS)
+        waited = self.rate_limiter.acquire(tokens, priority, cancellation)
+        if waited > 0.0:
+            logger.debug(f"Waited {waited:.2f}s for the LLM rate limiter ({priority.value})")
+
+    def _get_response(
+            self,
+            messages: List[Message],
+            parser: ResponseParser,
+            cancellation: CancellationToken,
+            priority: Priority = Priority.INTERACTIVE
+        ):
         """
         Get a response from the LLM provider and parse it.
         
         Args:
-            messages: List of message dictionaries to send to the LLM.
+            messages: List of messages to send to the LLM.
             parser: The ResponseParser instance to use for parsing.
+            cancellation: Token passed to the provider, which closes its stream when cancelled.
+            priority: Priority of the run at the LLM rate limiter.
             
         Yields:
-            Event dictionaries with type, content, and finished fields.
+            Event objects with type, content, and finished fields.
         """
+        self._throttle(messages, priority, cancellation)
         if self.provider.supports_streaming:
             logger.debug("Using streaming response")
-            for chunk in self.provider.stream_response(
+            stream = self.provider.stream_response(
                 messages=messages,
                 max_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE
-            ):
-                # Parse the chunk and yield any events
-                events = parser.feed(chunk)
-                for event in events:
-                    yield event
+                temperature=self.config.TEMPERATURE,
+                cancellation=cancellation
+            )
+            # Closing the generator releases the upstream connection early
+            with closing(stream):
+                for chunk in stream:
+                    cancellation.raise_if_cancelled()
+                    # Parse the chunk and yield any events
+                    events = parser.feed(chunk)
+                    for event in events:
+                        yield event
         else:
             logger.debug("Using non-streaming response")
             response = self.provider.generate_response(
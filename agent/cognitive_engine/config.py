@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, InstanceOf
-from typing import List
+from typing import List, Optional
 from .llm import BaseLLMProvider
+from .rate_limiter import RateLimiter
 
 class CognitiveEngineConfig(BaseModel):
     LLM_PROVIDER: InstanceOf[BaseLLMProvider] = Field(..., description="LLM provider")
@@ -10,3 +11,15 @@ class CognitiveEngineConfig(BaseModel):
     AGENT_NAME: str = Field(default="Agent", description="Name of the agent")
     AGENT_ROLE: str = Field(default="You are an AI assistant that thinks step by step.", description="Role of the agent")
     AGENT_PERMISSIONS: List[str] = Field(default=[], description="Permissions of the agent")
+    REFERENCE_TOKEN_BUDGET: int = Field(default=2000, description="Maximum estimated tokens of retrieved documents added to the prompt")
+    HISTORY_TOKEN_THRESHOLD: Optional[int] = Field(
+        default=6000,
+        description="Estimated tokens of unsummarized history that trigger a rolling summary (None disables it)"
+    )
+    HISTORY_KEEP_RECENT_TOKENS: int = Field(default=2000, description="Estimated tokens of the latest messages kept verbatim when summarizing")
+    SUMMARY_MAX_TOKENS: int = Field(default=500, description="Maximum tokens of a conversation summary")
+    ATTACHMENT_TOKEN_BUDGET: int = Field(default=4000, description="Maximum estimated tokens of attachment excerpts added to the user message")
+    RATE_LIMITER: Optional[InstanceOf[RateLimiter]] = Field(
+        default=None,
+        description="Limiter for the LLM quota shared by all runs, serving interactive runs before batch runs"
+    )
@@ -13,4 +13,16 @@ class BaseLLMProvider(ABC):
 
     @abstractmethod
     def stream_response(self, messages: List[dict], *args, **kwargs) -> Iterator[str]:
+        """
+        Stream the response text. The engine passes a `cancellation` keyword
+        argument (a `CancellationToken`); providers should close the upstream
+        stream when it is cancelled.
+        """
+        pass
+
+    def warmup(self) -> None:
+        """
+        Prepare for the first request ahead of time, e.g. open pooled
+        connections. Called once when the server starts.
+        """
         pass
@@ -1,9 +1,44 @@
 import json
-from jinja2 import Template
+from functools import lru_cache
 from .response_parser import RESPONSE_FORMAT_PROMPT
 from agent.toolkit import Toolkit
 from agent.toolkit.tool import ToolInfo
-from typing import List, Optional
+from agent.tokens import estimate_tokens, truncate_to_tokens
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+SYSTEM_TEMPLATE = """
+        Your name is {{ name }}, you are an AI agent charged with:
+        {{ role }}
+        You are given the following permissions:
+        {{ permissions }}
+        {% if toolkit %}
+        You have access to the following tools:
+        {% for tool_id, tool in toolkit.tools.items() %}
+        - tool_id: "{{ tool_id }}"
+            description: {{ tool.description }}
+        {% endfor %}
+        {% endif %}
+
+        {{ response_format_prompt }}
+        """
+
+SUMMARY_INSTRUCTIONS = """
+        Summarize the conversation below between a user and an AI agent so that the agent can
+        continue it without the original messages. Keep the user's goals, the facts and resource
+        names discovered, the commands or tools already tried with their outcomes, and any open
+        questions. Merge the previous summary, if given, into the new one. Reply with the summary only.
+        """
+
+
+@lru_cache(maxsize=None)
+def compile_template(template_str: str) -> "Template":
+    """Compile a Jinja template once per process; Jinja is imported on first use."""
+    from jinja2 import Template
+    return Template(template_str)
+
 
 class PromptTemplate:
     """Manages prompt templates for interaction with the LLM."""
@@ -14,44 +49,80 @@ class PromptTemplate:
         self.permissions = permissions
         self.tools = toolkit if toolkit else {}
         self.toolkit = toolkit
-    
+
     def set_toolkit(self, toolkit):
         """
         Set the toolkit for this prompt template.
-        
+
         Args:
             toolkit: Toolkit instance containing available tools
         """
         self.toolkit = toolkit
-        self.toolkit = toolkit
-        
-    def render(self):
-        """Render the template with the current values."""
-        template_str = """
-        Your name is {{ name }}, you are an AI agent charged with:
-        {{ role }}
-        You are given the following permissions:
-        {{ permissions }}
-        {% if toolkit %}
-        You have access to the following tools:
-        {% for tool_id, tool in toolkit.tools.items() %}
-        - tool_id: "{{ tool_id }}"
-            description: {{ tool.description }}
-        {% endfor %}
-        {% endif %}
 
-        {{ response_format_prompt }}
-        """
-        
-        template = Template(template_str)
-        return template.render(
+    def render(self, toolkit: Optional[Toolkit] = None):
+        """Render the template with the current values."""
+        return compile_template(SYSTEM_TEMPLATE).render(
             name=self.name,
             role=self.role,
             permissions=self.permissions,
-            toolkit=self.toolkit,
+            toolkit=toolkit or self.toolkit,
             response_format_prompt=RESPONSE_FORMAT_PROMPT
         )
-    
+
+    def render_reference_documents(self, documents: List, token_budget: int) -> str:
+        """
+        Render retrieved reference documents as a prompt section, in rank order,
+        truncating so that the section stays within `token_budget` tokens.
+
+        Args:
+            documents: Reference documents, most relevant first
+            token_budget: Maximum estimated tokens for the whole section
+        """
+        header = "\nRelevant reference documents (use them when they help answer the user):\n"
+        remaining = token_budget - estimate_tokens(header)
+        sections = []
+        for document in documents:
+            opening = f'<document id="{document.id}">\n'
+            closing = "\n</document>\n"
+            available = remaining - estimate_tokens(opening) - estimate_tokens(closing)
+            if available <= 0:
+                break
+            content = truncate_to_tokens(str(document.data), available)
+            sections.append(f"{opening}{content}{closing}")
+            remaining = available - estimate_tokens(content)
+        return header + "".join(sections) if sections else ""
+
+    def render_attachments(self, chunks: List) -> str:
+        """
+        Render selected attachment excerpts, already trimmed to the attachment
+        token budget, as a section appended to the user message.
+
+        Args:
+            chunks: AttachmentChunk instances in attachment and line order
+        """
+        if not chunks:
+            return ""
+        sections = [
+            f'<attachment name="{chunk.name}" lines="{chunk.start_line}-{chunk.end_line}">\n'
+            f'{chunk.content}\n</attachment>\n'
+            for chunk in chunks
+        ]
+        return "\n\nAttached files (excerpts relevant to the question):\n" + "".join(sections)
+
+    def render_summary(self, summary: str) -> str:
+        """Render the rolling conversation summary as a system prompt section."""
+        return f"\nSummary of the earlier conversation:\n{summary}\n"
+
+    def render_summary_request(self, previous_summary: Optional[str], messages: List[dict]) -> List[dict]:
+        """Build the messages asking the LLM to fold `messages` into `previous_summary`."""
+        transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        if previous_summary:
+            transcript = f"Previous summary:\n{previous_summary}\n\nNew messages:\n{transcript}"
+        return [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": transcript}
+        ]
+
     @property
     def system_prompt(self) -> str:
-        return self.render()
\ No newline at end of file
+        return self.render()
@@ -0,0 +1,164 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from agent.cancellation import CancellationToken
+from agent.priority import Priority
+from agent.workers import register_after_fork
+
+
+class _Bucket:
+    """Token bucket refilled continuously up to one minute's worth of quota."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+
+    def scale(self, fraction: float) -> None:
+        self.capacity *= fraction
+        self.rate *= fraction
+        self.level = min(self.level, self.capacity)
+
+    def refill(self, elapsed: float) -> None:
+        self.level = min(self.capacity, self.level + elapsed * self.rate)
+
+    def shortfall(self, amount: float, floor: float) -> float:
+        """Seconds until `amount` can be taken without going below `floor`; a full bucket always suffices."""
+        deficit = min(amount + floor, self.capacity) - self.level
+        return max(0.0, deficit / self.rate)
+
+
+class RateLimiter:
+    """
+    Client-side limiter for an LLM quota of requests and tokens per minute,
+    shared by every run of a process.
+
+    Calls are charged their estimated prompt tokens plus `max_tokens`, which
+    is how the quota is accounted upstream when the request is accepted.
+    Interactive calls are served first: a batch call waits while any
+    interactive call is waiting, and may not draw the buckets below
+    `batch_reserve` of their capacity, which keeps headroom for interactive
+    traffic. Batch runs are therefore throttled between LLM calls as soon as
+    interactive demand rises, instead of running the quota dry and pushing
+    interactive requests into upstream 429s.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        batch_reserve: float = 0.2
+    ):
+        """
+        Args:
+            requests_per_minute: Request quota, or None for no request limit
+            tokens_per_minute: Token quota, or None for no token limit
+            batch_reserve: Fraction of each bucket that batch calls may not use
+        """
+        self.requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self.batch_reserve = batch_reserve
+        self._condition = threading.Condition()
+        self._updated = time.monotonic()
+        self._waiting = {priority: 0 for priority in Priority}
+        self._waited = {priority: 0.0 for priority in Priority}
+        self._calls = {priority: 0 for priority in Priority}
+        register_after_fork(self)
+
+    def share(self, processes: int) -> None:
+        """
+        Limit this process to its share of the quota when `processes` worker
+        processes each run their own limiter against the same quota.
+        """
+        with self._condition:
+            for bucket in self._buckets():
+                bucket.scale(1.0 / processes)
+
+    def acquire(
+        self,
+        tokens: int,
+        priority: Priority = Priority.INTERACTIVE,
+        cancellation: Optional[CancellationToken] = None
+    ) -> float:
+        """
+        Block until a call costing `tokens` may be made.
+
+        Args:
+            tokens: Estimated tokens of the call
+            priority: Priority of the run making the call
+            cancellation: Optional token that aborts the wait
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RequestCancelled: If the token is cancelled while waiting
+        """
+        start = time.monotonic()
+        unregister = cancellation.register(self._wake) if cancellation else None
+        try:
+            with self._condition:
+                self._waiting[priority] += 1
+                try:
+                    while True:
+                        if cancellation is not None:
+                            cancellation.raise_if_cancelled()
+                        self._refill()
+                        delay = self._delay(tokens, priority)
+                        if delay == 0.0:
+                            break
+                        self._condition.wait(delay)
+                    for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                        if bucket is not None:
+                            bucket.level -= min(amount, bucket.level)
+                finally:
+                    self._waiting[priority] -= 1
+                    # Lower priorities may be waiting for this one to go first
+                    self._condition.notify_all()
+                waited = time.monotonic() - start
+                self._waited[priority] += waited
+                self._calls[priority] += 1
+                return waited
+        finally:
+            if unregister:
+                unregister()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            self._refill()
+            return {
+                "requests_available": round(self.requests.level, 1) if self.requests else None,
+                "tokens_available": round(self.tokens.level) if self.tokens else None,
+                "waiting": {priority.value: count for priority, count in self._waiting.items()},
+                "calls": {priority.value: count for priority, count in self._calls.items()},
+                "wait_seconds": {priority.value: round(waited, 3) for priority, waited in self._waited.items()},
+            }
+
+    def _buckets(self) -> List[_Bucket]:
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        for bucket in self._buckets():
+            bucket.refill(now - self._updated)
+        self._updated = now
+
+    def _delay(self, tokens: int, priority: Priority) -> Optional[float]:
+        """Seconds to wait before the call fits, or None while higher priorities are waiting."""
+        if any(count for other, count in self._waiting.items() if other.rank < priority.rank):
+            return None
+        reserve = self.batch_reserve if priority is Priority.BATCH else 0.0
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.shortfall(1, reserve * self.requests.capacity))
+        if self.tokens:
+            delay = max(delay, self.tokens.shortfall(tokens, reserve * self.tokens.capacity))
+        return delay
+
+    def _after_fork(self) -> None:
+        self._condition = threading.Condition()
+        self._waiting = {priority: 0 for priority in Priority}
+
+    def _wake(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
@@ -1,6 +1,7 @@
 import json
 import re
 import logging
+from agent.messages import Event
 
 RESPONSE_FORMAT_PROMPT = """
 Your response MUST be formatted with specific tags for proper processing:
@@ -80,14 +81,14 @@ class ResponseParser:
         
         # If we have a current tag, finalize it
         if self.current_tag:
-            event = {"type": self.current_tag, "content": self.current_content, "finished": True}
+            event = Event(self.current_tag, self.current_content, True)
             events.append(event)
             self.current_tag = None
             self.current_content = ""
         
         # If we have buffer content with no tag, treat as raw
         elif self.buffer.strip():
-            event = {"type": "raw", "content": self.buffer.strip(), "finished": True}
+            event = Event("raw", self.buffer.strip(), True)
             events.append(event)
             self.buffer = ""
         
@@ -150,12 +151,12 @@ class ResponseParser:
                             if "input" in tool_data and not isinstance(tool_data["input"], str):
                                 tool_data["input"] = json.dumps(tool_data["input"])
                         
-                        event = {"type": "tool", "content": tool_data, "finished": True}
+                        event = Event("tool", tool_data, True)
                     except json.JSONDecodeError:
                         # If JSON parsing fails, just return the raw content
-                        event = {"type": "tool", "content": content, "finished": True}
+                        event = Event("tool", content, True)
                 else:
-                    event = {"type": tag_type, "content": content, "finished": True}
+                    event = Event(tag_type, content, True)
                 
                 events.append(event)
                 
@@ -180,18 +181,24 @@ class ResponseParser:
                     content_start = start_pos + len(start_tag)
                     content = self.buffer[content_start:]
                     
+                    # Hold back a partially received closing tag so partial content only ever grows
+                    for length in range(len(end_tag) - 1, 0, -1):
+                        if content.endswith(end_tag[:length]):
+                            content = content[:-length]
+                            break
+                    
                     # Set current tag and content
                     self.current_tag = tag_type
                     self.current_content = content
                     
                     # Return a partial event
-                    return [{"type": tag_type, "content": content, "finished": False}]
+                    return [Event(tag_type, content, False)]
                 
                 # If we have a closing tag without an opening one, ignore it
         
         # If no tags are found but we have content
         if not events and self.buffer.strip() and not self.current_tag:
-            event = {"type": "raw", "content": self.buffer, "finished": False}
+            event = Event("raw", self.buffer, False)
             return [event]
         
         return events
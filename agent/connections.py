@@ -8,6 +8,10 @@ class BaseConnection(ABC):
         """Get or create a connection instance"""
         pass
     
+    def warmup(self):
+        """Load configuration and open the connection ahead of its first use"""
+        pass
+    
     @abstractmethod
     def close(self):
         """Close the connection and clean up resources"""
@@ -0,0 +1,338 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from agent.messages import Message, as_message
+from agent.workers import register_after_fork
+from agent.logger import logger
+
+
+class ConversationStore(ABC):
+    """Durable storage for conversation messages."""
+
+    @abstractmethod
+    def load(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Load the messages of a conversation in order.
+
+        Args:
+            conversation_id: The conversation to load
+
+        Returns:
+            The messages as {"role", "content"} dicts, or None if the conversation is unknown
+        """
+        pass
+
+    @abstractmethod
+    def append(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        """
+        Append messages to a conversation, creating it if needed.
+
+        Args:
+            conversation_id: The conversation to extend
+            messages: {"role", "content"} dicts in order
+        """
+        pass
+
+    def load_summary(self, conversation_id: str) -> Optional[Tuple[str, int]]:
+        """
+        Load the rolling summary of a conversation.
+
+        Returns:
+            The summary and the number of leading messages it replaces, or None
+        """
+        return None
+
+    def save_summary(self, conversation_id: str, summary: str, summarized: int) -> None:
+        """
+        Store the rolling summary of a conversation. The raw messages it
+        replaces stay in the store.
+
+        Args:
+            conversation_id: The summarized conversation
+            summary: Summary text
+            summarized: Number of leading messages the summary replaces
+        """
+        pass
+
+    def close(self) -> None:
+        """Release the resources held by the store."""
+        pass
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Reference store on SQLite in WAL mode.
+
+    Messages live in an append-only table keyed by (conversation_id, seq), so
+    a turn is a couple of inserts and loading a conversation is one range
+    scan of the primary key. WAL lets readers proceed while a write commits.
+    Rolling summaries are kept in a separate table, one row per
+    conversation. Each thread uses its own connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            conversation_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (conversation_id, seq)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS summaries (
+            conversation_id TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            summarized INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file, created if missing
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.SCHEMA)
+        register_after_fork(self)
+
+    def load(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        rows = self._connection().execute(
+            "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq",
+            (conversation_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        if not messages:
+            return
+        connection = self._connection()
+        with connection:
+            (next_seq,) = connection.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM messages WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+            now = time.time()
+            connection.executemany(
+                "INSERT INTO messages (conversation_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (conversation_id, next_seq + i, message["role"], message["content"], now)
+                    for i, message in enumerate(messages)
+                ]
+            )
+
+    def load_summary(self, conversation_id: str) -> Optional[Tuple[str, int]]:
+        row = self._connection().execute(
+            "SELECT content, summarized FROM summaries WHERE conversation_id = ?",
+            (conversation_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save_summary(self, conversation_id: str, summary: str, summarized: int) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO summaries (conversation_id, content, summarized, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (conversation_id) DO UPDATE SET "
+                "content = excluded.content, summarized = excluded.summarized, updated_at = excluded.updated_at "
+                "WHERE excluded.summarized >= summaries.summarized",
+                (conversation_id, summary, summarized, time.time())
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _after_fork(self) -> None:
+        # SQLite connections must not be used across a fork; abandon the inherited ones
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            # Durable across process crashes; an OS crash may lose the last commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+
+class ConversationRecord:
+    """
+    A conversation as cached in memory: every raw message plus an optional
+    rolling summary that stands in for the first `summarized` of them.
+    """
+    __slots__ = ("messages", "summary", "summarized")
+
+    def __init__(self, messages: List[Message], summary: Optional[str] = None, summarized: int = 0):
+        self.messages = messages
+        self.summary = summary
+        self.summarized = summarized
+
+    def copy(self) -> "ConversationRecord":
+        return ConversationRecord(list(self.messages), self.summary, self.summarized)
+
+
+class ConversationCache:
+    """
+    Write-behind cache in front of a `ConversationStore`.
+
+    The most recently used conversations are kept in a bounded LRU, so a
+    follow-up turn is served from memory. Appends and summaries update the
+    cached copy immediately and are written to the store by a single
+    background thread, so persistence adds no latency to the response path;
+    writes for one conversation keep their order.
+    """
+
+    def __init__(self, store: ConversationStore, max_conversations: int = 1024):
+        self.store = store
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, ConversationRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes: "queue.Queue[Optional[Tuple[str, Callable[[], None]]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._pending: Dict[str, int] = {}
+        register_after_fork(self)
+
+    def get(self, conversation_id: str) -> Optional[ConversationRecord]:
+        """A copy of a conversation, or None if it is unknown."""
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            if record is not None:
+                self._conversations.move_to_end(conversation_id)
+                return record.copy()
+            pending = self._pending.get(conversation_id, 0)
+        if pending:
+            # Evicted while its writes are still queued: the store is behind
+            self.flush()
+        messages = self.store.load(conversation_id)
+        if messages is None:
+            return None
+        summary, summarized = self.store.load_summary(conversation_id) or (None, 0)
+        with self._lock:
+            # Another request may have loaded or extended it meanwhile; keep that copy
+            record = self._conversations.setdefault(
+                conversation_id,
+                ConversationRecord([as_message(message) for message in messages], summary, summarized)
+            )
+            self._conversations.move_to_end(conversation_id)
+            self._evict()
+            return record.copy()
+
+    def create(self, conversation_id: str) -> None:
+        """Start caching a conversation that the store does not know yet."""
+        with self._lock:
+            self._conversations.setdefault(conversation_id, ConversationRecord([]))
+            self._conversations.move_to_end(conversation_id)
+            self._evict()
+
+    def append(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        """Append messages to the cached conversation and queue them for the store."""
+        if not messages:
+            return
+        messages = [as_message(message) for message in messages]
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            if record is not None:
+                record.messages.extend(messages)
+                self._conversations.move_to_end(conversation_id)
+        self._enqueue(conversation_id, lambda: self.store.append(conversation_id, messages))
+
+    def copy(self, source_id: str, target_id: str) -> bool:
+        """
+        Start conversation `target_id` with the messages and summary of
+        `source_id`. Returns False if the source is unknown.
+        """
+        record = self.get(source_id)
+        if record is None:
+            return False
+        self.create(target_id)
+        self.append(target_id, record.messages)
+        if record.summary is not None:
+            self.set_summary(target_id, record.summary, record.summarized)
+        return True
+
+    def set_summary(self, conversation_id: str, summary: str, summarized: int) -> None:
+        """Replace the rolling summary of a conversation and queue it for the store."""
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            if record is not None and summarized >= record.summarized:
+                record.summary, record.summarized = summary, summarized
+        self._enqueue(conversation_id, lambda: self.store.save_summary(conversation_id, summary, summarized))
+
+    def flush(self) -> None:
+        """Block until every queued write has reached the store."""
+        if self._writer is not None:
+            self._writes.join()
+
+    def close(self) -> None:
+        """Write out pending messages, stop the writer and close the store."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        self.store.close()
+
+    def _after_fork(self) -> None:
+        # The writer thread does not survive a fork; the parent flushes before forking
+        self._lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._writer = None
+        self._pending = {}
+
+    def _enqueue(self, conversation_id: str, write: Callable[[], None]) -> None:
+        with self._lock:
+            self._pending[conversation_id] = self._pending.get(conversation_id, 0) + 1
+        self._ensure_writer()
+        self._writes.put((conversation_id, write))
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="conversation-writer", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._writes.get()
+            try:
+                if item is None:
+                    return
+                conversation_id, write = item
+                write()
+            except Exception as e:
+                logger.error(f"Failed to persist conversation {item[0]}: {str(e)}")
+            finally:
+                if item is not None:
+                    with self._lock:
+                        remaining = self._pending.pop(item[0]) - 1
+                        if remaining:
+                            self._pending[item[0]] = remaining
+                self._writes.task_done()
+
+    def _evict(self) -> None:
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
@@ -0,0 +1,149 @@
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Union
+from agent.workers import Affinity
+from agent.logger import logger
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+class StoredFile:
+    """
+    An uploaded file spooled by `FileStore`.
+
+    Small files stay in memory; larger ones roll over to an anonymous
+    temporary file and are read through a read-only memory map, so their
+    content is paged in on demand instead of being copied onto the heap.
+    """
+
+    def __init__(self, file_id: str, filename: str, spool: tempfile.SpooledTemporaryFile, size: int, on_disk: bool):
+        self.id = file_id
+        self.filename = filename
+        self.size = size
+        self.on_disk = on_disk
+        self.created = time.time()
+        self._spool = spool
+        self._buffer: Optional[Union[bytes, mmap.mmap]] = None
+        self._lock = threading.Lock()
+
+    def buffer(self) -> Union[bytes, mmap.mmap]:
+        """Read-only bytes-like view of the content, created on first use."""
+        with self._lock:
+            if self._buffer is None:
+                if self.size == 0:
+                    self._buffer = b""
+                elif self.on_disk:
+                    self._spool.flush()
+                    self._buffer = mmap.mmap(self._spool.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    self._spool.seek(0)
+                    self._buffer = self._spool.read()
+            return self._buffer
+
+    def close(self) -> None:
+        """
+        Release the spooled file. Requests already holding the buffer keep a
+        valid mapping until they drop it; the temporary file is unlinked.
+        """
+        with self._lock:
+            self._buffer = None
+            self._spool.close()
+
+
+class FileStore:
+    """
+    Request-independent store of uploaded attachments.
+
+    Uploads are written chunk by chunk into a `SpooledTemporaryFile` that
+    stays in memory up to `spool_bytes` and moves to disk beyond that, so the
+    body is never buffered whole. Files larger than `max_file_bytes` are
+    rejected while streaming, and files expire `ttl` seconds after upload.
+    """
+
+    def __init__(
+        self,
+        max_file_bytes: int = 100 * 2**20,
+        spool_bytes: int = 2**20,
+        ttl: float = 3600.0,
+        directory: Optional[str] = None
+    ):
+        self.max_file_bytes = max_file_bytes
+        self.spool_bytes = spool_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self._files: Dict[str, StoredFile] = {}
+        self._lock = threading.Lock()
+        # Set in multi-process servers so that file ids route to this process
+        self.affinity: Optional[Affinity] = None
+
+    def new_id(self) -> str:
+        new_id = lambda: f"file_{uuid.uuid4().hex}"
+        return self.affinity.new_id(new_id) if self.affinity else new_id()
+
+    def create(self, filename: str) -> "FileUpload":
+        """Start an upload; write the body into the returned `FileUpload` and call `commit`."""
+        self._expire()
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes, dir=self.directory)
+        return FileUpload(self, filename, spool)
+
+    def get(self, file_id: str) -> Optional[StoredFile]:
+        with self._lock:
+            stored = self._files.get(file_id)
+        if stored is not None and time.time() - stored.created > self.ttl:
+            self.delete(file_id)
+            return None
+        return stored
+
+    def delete(self, file_id: str) -> bool:
+        with self._lock:
+            stored = self._files.pop(file_id, None)
+        if stored is None:
+            return False
+        stored.close()
+        return True
+
+    def _add(self, stored: StoredFile) -> None:
+        with self._lock:
+            self._files[stored.id] = stored
+        logger.debug(f"Stored upload {stored.id} ({stored.filename}, {stored.size} bytes)")
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [file_id for file_id, stored in self._files.items() if stored.created < cutoff]
+        for file_id in expired:
+            self.delete(file_id)
+
+
+class FileUpload:
+    """An upload in progress: enforces the size limit on every write."""
+
+    def __init__(self, store: FileStore, filename: str, spool: tempfile.SpooledTemporaryFile):
+        self.store = store
+        self.filename = os.path.basename(filename)
+        self.size = 0
+        self._spool = spool
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.store.max_file_bytes:
+            self.abort()
+            raise FileTooLargeError(f"{self.filename} exceeds the {self.store.max_file_bytes} byte upload limit")
+        self._spool.write(data)
+
+    def commit(self) -> StoredFile:
+        stored = StoredFile(
+            self.store.new_id(), self.filename, self._spool, self.size,
+            on_disk=self.size > self.store.spool_bytes
+        )
+        self.store._add(stored)
+        return stored
+
+    def abort(self) -> None:
+        self._spool.close()
@@ -2,6 +2,7 @@ from typing import Dict, Any
 from enum import Enum
 from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
+from agent.files import StoredFile
 
 class InputType(Enum):
     TEXT = "text"
@@ -10,6 +11,9 @@ class InputType(Enum):
     # AUDIO = "audio"
     # etc.
 
+# Logs and manifests are the usual large attachments
+TEXT_EXTENSIONS = ('.txt', '.py', '.md', '.json', '.log', '.yaml', '.yml')
+
 class Input(BaseModel):
     message: str
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -19,8 +23,12 @@ class Input(BaseModel):
     def process_attachments(cls, value: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         """Process raw binary attachments into structured data.
         
+        Text content is kept as UTF-8 bytes, or as a read-only memory map for
+        uploaded files, and decoded piece by piece by whoever consumes it
+        instead of being copied into one large string here.
+        
         Args:
-            value: Dictionary of filename to binary content mappings
+            value: Dictionary of filename to binary content or uploaded file mappings
         Returns:
             Processed attachments dictionary
         """
@@ -29,14 +37,16 @@ class Input(BaseModel):
             
         processed = {}
         for filename, binary_content in value.items():
-            if isinstance(binary_content, bytes):  # Only process if raw binary content
-                if filename.lower().endswith(('.txt', '.py', '.md', '.json')):
+            if isinstance(binary_content, (bytes, StoredFile)):  # Only process if raw binary content
+                if filename.lower().endswith(TEXT_EXTENSIONS):
                     input_type = InputType.TEXT
-                    text_content = binary_content.decode('utf-8')
+                    if isinstance(binary_content, StoredFile):
+                        binary_content = binary_content.buffer()
                     
                     processed[filename] = {
                         'type': input_type.value,
-                        'content': text_content,
+                        'content': binary_content,
+                        'size': len(binary_content),
                     }
                 else:
                     raise NotImplementedError(f"File type for {filename} not supported")
@@ -0,0 +1,642 @@
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from pydantic import BaseModel, Field
+from agent.batch import BatchItem
+from agent.cancellation import CancellationToken, RequestCancelled
+from agent.memory import new_conversation_id
+from agent.priority import Priority
+from agent.workers import Affinity, register_after_fork
+from agent.logger import logger
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobQueueConfig(BaseModel):
+    WORKERS: int = Field(default=4, description="Number of background runs executing at once in this process")
+    MAX_QUEUED: int = Field(default=1000, description="Maximum number of queued background runs; more are rejected")
+    POLL_INTERVAL: float = Field(default=1.0, description="Seconds between queue polls of an idle worker")
+    LEASE_SECONDS: float = Field(
+        default=60.0,
+        description="Seconds a claimed run stays owned without a heartbeat; runs of a crashed process are picked up after it"
+    )
+    MAX_ATTEMPTS: int = Field(default=3, description="Number of times a run is started before it is failed")
+    FLUSH_EVENTS: int = Field(default=64, description="Number of events buffered before they are written to the store")
+    FLUSH_INTERVAL: float = Field(default=0.5, description="Seconds after which buffered events are written to the store")
+    WEBHOOK_TIMEOUT: float = Field(default=10.0, description="Timeout in seconds of a completion webhook call")
+    WEBHOOK_RETRIES: int = Field(default=3, description="Number of attempts to deliver a completion webhook")
+    WEBHOOK_SECRET: Optional[str] = Field(
+        default=None,
+        description="Key for the HMAC-SHA256 signature of webhook bodies, sent in X-Signature-256 (None to not sign)"
+    )
+
+
+class QueueFull(Exception):
+    """The job queue holds `MAX_QUEUED` runs already."""
+    pass
+
+
+class Job:
+    """A background agent run as stored in a `JobStore`."""
+    __slots__ = (
+        "id", "status", "request", "priority", "conversation_id", "webhook_url", "metadata",
+        "created_at", "started_at", "finished_at", "attempts", "answer", "error"
+    )
+
+    def __init__(
+        self,
+        id: str,
+        status: str,
+        request: Dict[str, Any],
+        priority: Priority,
+        conversation_id: str,
+        webhook_url: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        created_at: Optional[float] = None,
+        started_at: Optional[float] = None,
+        finished_at: Optional[float] = None,
+        attempts: int = 0,
+        answer: Optional[str] = None,
+        error: Optional[str] = None
+    ):
+        self.id = id
+        self.status = status
+        self.request = request
+        self.priority = priority
+        self.conversation_id = conversation_id
+        self.webhook_url = webhook_url
+        self.metadata = metadata or {}
+        self.created_at = created_at if created_at is not None else time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.attempts = attempts
+        self.answer = answer
+        self.error = error
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED, CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The run as returned by the API and sent to webhooks."""
+        return {
+            "id": self.id,
+            "object": "run",
+            "status": self.status,
+            "priority": self.priority.value,
+            "conversation_id": self.conversation_id,
+            "metadata": self.metadata,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "attempts": self.attempts,
+            "response": {"role": "assistant", "content": self.answer} if self.answer is not None else None,
+            "error": self.error,
+        }
+
+
+class JobStore(ABC):
+    """Durable queue of background runs and the events they produced."""
+
+    @abstractmethod
+    def enqueue(self, job: Job, max_queued: Optional[int] = None) -> None:
+        """
+        Add a queued job.
+
+        Raises:
+            QueueFull: If `max_queued` jobs are queued already
+        """
+        pass
+
+    @abstractmethod
+    def claim(self, lease_seconds: float, owns: Optional[Callable[[str], bool]] = None) -> Optional[Job]:
+        """
+        Atomically take the next job to run: queued jobs by priority and age,
+        or a running job whose lease has expired because its owner died. A
+        job that is taken again loses the events of its earlier attempt.
+
+        Args:
+            lease_seconds: Seconds the job stays owned without a renewal
+            owns: Only take jobs whose conversation id this accepts
+
+        Returns:
+            The job, now running with a fresh lease, or None if there is none
+        """
+        pass
+
+    @abstractmethod
+    def renew(self, job_ids: List[str], lease_seconds: float) -> List[str]:
+        """
+        Extend the leases of running jobs.
+
+        Returns:
+            The ids among them whose cancellation was requested
+        """
+        pass
+
+    @abstractmethod
+    def append_events(self, job_id: str, first_seq: int, events: List[Dict[str, Any]]) -> None:
+        """Store events of a job numbered from `first_seq`."""
+        pass
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, answer: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record the outcome of a running job."""
+        pass
+
+    @abstractmethod
+    def release(self, job_id: str) -> None:
+        """Put a running job back in the queue, e.g. when its process shuts down."""
+        pass
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued job at once, or request the cancellation of a running
+        one from the process that runs it.
+
+        Returns:
+            The job after the change, or None if it is unknown
+        """
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    def events(self, job_id: str, after: int = -1, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Events of a job with sequence numbers above `after`, in order."""
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs by status."""
+        return {}
+
+    def close(self) -> None:
+        """Release the resources held by the store."""
+        pass
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Reference job store on SQLite in WAL mode.
+
+    Claiming runs in an immediate transaction, so several worker processes
+    can share one database file. Events live in a table keyed by
+    (job_id, seq) and are written in batches. Each thread uses its own
+    connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            request TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            priority_rank INTEGER NOT NULL,
+            conversation_id TEXT NOT NULL,
+            webhook_url TEXT,
+            metadata TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            answer TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority_rank, created_at);
+        CREATE TABLE IF NOT EXISTS job_events (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            finished INTEGER NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        ) WITHOUT ROWID;
+    """
+
+    COLUMNS = (
+        "id, status, request, priority, conversation_id, webhook_url, metadata, "
+        "created_at, started_at, finished_at, attempts, answer, error"
+    )
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file, created if missing
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.SCHEMA)
+        register_after_fork(self)
+
+    def enqueue(self, job: Job, max_queued: Optional[int] = None) -> None:
+        connection = self._connection()
+        with connection:
+            if max_queued is not None:
+                (queued,) = connection.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+                if queued >= max_queued:
+                    raise QueueFull(f"{queued} runs are queued already")
+            connection.execute(
+                "INSERT INTO jobs (id, status, request, priority, priority_rank, conversation_id, webhook_url, "
+                "metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id, job.status, json.dumps(job.request), job.priority.value, job.priority.rank,
+                    job.conversation_id, job.webhook_url, json.dumps(job.metadata), job.created_at
+                )
+            )
+
+    def claim(self, lease_seconds: float, owns: Optional[Callable[[str], bool]] = None) -> Optional[Job]:
+        connection = self._connection()
+        now = time.time()
+        # Take the write lock up front so that no other process claims the same job
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                f"SELECT {self.COLUMNS} FROM jobs WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY priority_rank, created_at" + ("" if owns else " LIMIT 1"),
+                (QUEUED, RUNNING, now)
+            )
+            row = next((row for row in rows if owns is None or owns(row[4])), None)
+            if row is None:
+                connection.commit()
+                return None
+            job = self._job(row)
+            connection.execute("DELETE FROM job_events WHERE job_id = ?", (job.id,))
+            connection.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, now, now + lease_seconds, job.id)
+            )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        job.status, job.started_at, job.attempts = RUNNING, now, job.attempts + 1
+        return job
+
+    def renew(self, job_ids: List[str], lease_seconds: float) -> List[str]:
+        if not job_ids:
+            return []
+        connection = self._connection()
+        placeholders = ", ".join("?" for _ in job_ids)
+        with connection:
+            connection.execute(
+                f"UPDATE jobs SET lease_expires = ? WHERE status = ? AND id IN ({placeholders})",
+                (time.time() + lease_seconds, RUNNING, *job_ids)
+            )
+            rows = connection.execute(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({placeholders})", job_ids
+            ).fetchall()
+        return [job_id for (job_id,) in rows]
+
+    def append_events(self, job_id: str, first_seq: int, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO job_events (job_id, seq, type, content, finished) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, first_seq + i, event["type"], json.dumps(event["content"]), int(event["finished"]))
+                    for i, event in enumerate(events)
+                ]
+            )
+
+    def finish(self, job_id: str, status: str, answer: Optional[str] = None, error: Optional[str] = None) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_expires = NULL, answer = ?, error = ? WHERE id = ?",
+                (status, time.time(), answer, error, job_id)
+            )
+
+    def release(self, job_id: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL WHERE id = ? AND status = ?",
+                (QUEUED, job_id, RUNNING)
+            )
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def events(self, job_id: str, after: int = -1, limit: int = 1000) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT seq, type, content, finished FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit)
+        ).fetchall()
+        return [
+            {"seq": seq, "type": type, "content": json.loads(content), "finished": bool(finished)}
+            for seq, type, content, finished in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    @staticmethod
+    def _job(row) -> Job:
+        (job_id, status, request, priority, conversation_id, webhook_url, metadata,
+         created_at, started_at, finished_at, attempts, answer, error) = row
+        return Job(
+            job_id, status, json.loads(request), Priority(priority), conversation_id, webhook_url,
+            json.loads(metadata), created_at, started_at, finished_at, attempts, answer, error
+        )
+
+    def _after_fork(self) -> None:
+        # SQLite connections must not be used across a fork; abandon the inherited ones
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30.0)
+            # Durable across process crashes; an OS crash may lose the last commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+
+class JobQueue:
+    """
+    Runs queued agent runs in the background on a pool of worker threads.
+
+    Requests are persisted in a `JobStore` before they are acknowledged, so
+    they survive restarts, and the number of workers bounds how many long
+    reasoning loops run at once independently of HTTP traffic. A worker
+    streams the events of its run into the store, where clients poll them,
+    and calls the run's webhook when it ends.
+
+    Claimed runs hold a lease that a heartbeat thread renews; the runs of a
+    process that died are taken over by any worker once their lease
+    expires. Cancellation requested through the store reaches the worker
+    with the next heartbeat. On shutdown, running runs are put back in the
+    queue.
+    """
+
+    def __init__(self, agent, store: JobStore, *args, **kwargs):
+        """
+        Args:
+            agent: The agent to run the jobs with
+            store: Durable storage of the queue
+        """
+        self.config = JobQueueConfig(*args, **kwargs)
+        self.agent = agent
+        self.store = store
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        # Set in multi-process servers so that each process runs the jobs of the conversations it holds
+        self.affinity: Optional[Affinity] = None
+        register_after_fork(self)
+
+    def start(self) -> None:
+        """Start the workers and the heartbeat thread."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.config.WORKERS):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def submit(
+        self,
+        request: Dict[str, Any],
+        priority: Priority = Priority.BATCH,
+        webhook_url: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> Job:
+        """
+        Persist a run and wake a worker.
+
+        Args:
+            request: A batch item: messages, optional conversation_id and attachments
+            priority: Priority of the run at the LLM rate limiter
+            webhook_url: URL that receives the run with a POST when it ends
+            metadata: Client data returned with the run
+
+        Raises:
+            ValueError: If the request is invalid
+            QueueFull: If too many runs are queued
+        """
+        item = BatchItem.model_validate(request)
+        item.to_input()
+        job = Job(
+            "run_" + uuid.uuid4().hex,
+            QUEUED,
+            request,
+            priority,
+            item.conversation_id or new_conversation_id(),
+            webhook_url,
+            metadata
+        )
+        self.store.enqueue(job, self.config.MAX_QUEUED)
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def events(self, job_id: str, after: int = -1, limit: int = 1000) -> List[Dict[str, Any]]:
+        return self.store.events(job_id, after, limit)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.store.cancel(job_id)
+        with self._lock:
+            token = self._running.get(job_id)
+        if token is not None:
+            token.cancel("run cancelled")
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = len(self._running)
+        return {"workers": self.config.WORKERS, "running_here": running, "jobs": self.store.stats()}
+
+    def close(self) -> None:
+        """Stop the workers, returning their runs to the queue, and close the store."""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            tokens = list(self._running.values())
+        for token in tokens:
+            token.cancel("shutting down")
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        self.store.close()
+
+    def _after_fork(self) -> None:
+        # Workers are started in each process; pooled webhook connections are not shared
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._running = {}
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(self.config.LEASE_SECONDS, self.affinity.owns if self.affinity else None)
+            except Exception as e:
+                logger.error(f"Failed to claim a background run: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.config.POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(self.config.LEASE_SECONDS / 3):
+            with self._lock:
+                running = dict(self._running)
+            try:
+                for job_id in self.store.renew(list(running), self.config.LEASE_SECONDS):
+                    running[job_id].cancel("run cancelled")
+            except Exception as e:
+                logger.error(f"Failed to renew background run leases: {str(e)}")
+
+    def _execute(self, job: Job) -> None:
+        if job.attempts > self.config.MAX_ATTEMPTS:
+            self._complete(job, FAILED, error=f"Gave up after {job.attempts - 1} attempts")
+            return
+        cancellation = CancellationToken()
+        with self._lock:
+            self._running[job.id] = cancellation
+        logger.info(f"Starting background run {job.id} (attempt {job.attempts})")
+        pending: List[Dict[str, Any]] = []
+        seq = 0
+        flushed = time.monotonic()
+        answer_parts = []
+        status, error = SUCCEEDED, None
+        try:
+            events = self.agent.respond(
+                input=BatchItem.model_validate(job.request).to_input(),
+                conversation_id=job.conversation_id,
+                cancellation=cancellation,
+                priority=job.priority
+            )
+            try:
+                for event in events:
+                    if event.type == "answer":
+                        answer_parts.append(event.content)
+                    pending.append(event.to_dict())
+                    if len(pending) >= self.config.FLUSH_EVENTS or time.monotonic() - flushed >= self.config.FLUSH_INTERVAL:
+                        self.store.append_events(job.id, seq, pending)
+                        seq += len(pending)
+                        pending = []
+                        flushed = time.monotonic()
+            finally:
+                events.close()
+        except RequestCancelled:
+            status = CANCELLED
+        except Exception as e:
+            logger.error(f"Background run {job.id} failed: {str(e)}")
+            status, error = FAILED, str(e)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+        if status == CANCELLED and self._stopping.is_set():
+            # Interrupted by shutdown rather than by a client: run it again later
+            self.store.release(job.id)
+            return
+        try:
+            self.store.append_events(job.id, seq, pending)
+        except Exception as e:
+            logger.error(f"Failed to store events of background run {job.id}: {str(e)}")
+        self._complete(job, status, "".join(answer_parts) if status == SUCCEEDED else None, error)
+
+    def _complete(self, job: Job, status: str, answer: Optional[str] = None, error: Optional[str] = None) -> None:
+        self.store.finish(job.id, status, answer, error)
+        logger.info(f"Background run {job.id} {status}")
+        if job.webhook_url:
+            finished = self.store.get(job.id)
+            if finished is not None:
+                self._deliver(finished)
+
+    def _deliver(self, job: Job) -> None:
+        """POST the finished run to its webhook, retrying failures with exponential backoff."""
+        body = json.dumps(job.to_dict()).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Run-Id": job.id}
+        if self.config.WEBHOOK_SECRET:
+            signature = hmac.new(self.config.WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-256"] = f"sha256={signature}"
+        for attempt in range(self.config.WEBHOOK_RETRIES):
+            try:
+                response = self.session.post(
+                    job.webhook_url, data=body, headers=headers, timeout=self.config.WEBHOOK_TIMEOUT
+                )
+                if response.status_code < 400:
+                    return
+                logger.warning(f"Webhook for run {job.id} returned {response.status_code}")
+            except requests.RequestException as e:
+                logger.warning(f"Webhook for run {job.id} failed: {str(e)}")
+            if attempt + 1 < self.config.WEBHOOK_RETRIES and self._stopping.wait(2 ** attempt):
+                return
+        logger.error(f"Giving up on the webhook for run {job.id}")
@@ -1,22 +1,36 @@
-from typing import List, Dict, Any
+import uuid
+from typing import List, Dict, Optional, Union
 import logging
+from agent.conversation_store import ConversationCache
+from agent.messages import Message, as_message
 
 class Conversation:
-    def __init__(self, messages: List[Dict[str, Any]] = None):
+    def __init__(self, messages: List[Message] = None):
         self.messages = messages or []
 
     def add_message(self, role: str, message: str):
-        self.messages.append({"role": role, "content": message})
+        self.messages.append(Message(role, message))
+
+
+def new_conversation_id() -> str:
+    return f"conv_{uuid.uuid4().hex}"
 
 
 class Memory:
     """
     Contains the conversation history.
+    
+    Long conversations are compacted with a rolling summary: `summary`
+    replaces the first `summarized` messages in prompts, while every raw
+    message stays in the conversation store.
     """
 
-    def __init__(self, conversation_id: str = None):
+    def __init__(self, conversation_id: str = None, cache: Optional[ConversationCache] = None):
         self.conversation_id = conversation_id
         self.conversation = Conversation()
+        self.summary: Optional[str] = None
+        self.summarized = 0
+        self._cache = cache
     
         if conversation_id:
             try:
@@ -27,38 +41,73 @@ class Memory:
                 self.conversation = Conversation()
         else:
             # Generate a new conversation ID if none provided
-            from datetime import datetime
-            self.conversation_id = f"conv_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            self.conversation_id = new_conversation_id()
+            if self._cache is not None:
+                self._cache.create(self.conversation_id)
     
     def _load_conversation(self):
         """
-        Load conversation from external service
-        This is a placeholder for the actual implementation that will fetch
-        conversation history from an external service
+        Load the conversation history through the conversation cache, which
+        serves recent conversations from memory and falls back to the store.
+        Without a cache, or for an unknown id, the conversation starts empty.
         """
-        # TODO: Replace with actual external service call
-        try:
-            # Simulated conversation history for now
-            dummy_response = {
-                "messages": [
-                    {"role": "user", "content": "This is simulated history"},
-                    {"role": "assistant", "content": "And this is a simulated response"}
-                ]
-            }
-            
-            self.conversation = Conversation(dummy_response["messages"])
-        except Exception as e:
-            logging.error(f"Failed to load conversation from external service: {str(e)}")
-            raise
+        if self._cache is None:
+            return
+        record = self._cache.get(self.conversation_id)
+        if record is None:
+            self._cache.create(self.conversation_id)
+        else:
+            self.conversation = Conversation(record.messages)
+            self.summary, self.summarized = record.summary, record.summarized
     
     def add_message(self, role: str, content: str):
         """Add a message to the conversation"""
-        self.conversation.add_message(role, content)
-        # Note: External service persistence will be handled separately
+        self.add_messages([Message(role, content)])
+    
+    def add_messages(self, messages: List[Union[Message, Dict[str, str]]]):
+        """Add messages to the conversation; they are persisted in the background"""
+        messages = [as_message(message) for message in messages]
+        self.conversation.messages.extend(messages)
+        if self._cache is not None:
+            self._cache.append(self.conversation_id, messages)
+    
+    def set_summary(self, summary: str, summarized: int):
+        """Replace the first `summarized` messages with `summary` in prompts"""
+        self.summary, self.summarized = summary, summarized
+        if self._cache is not None:
+            self._cache.set_summary(self.conversation_id, summary, summarized)
+    
+    def compaction_point(self, threshold_tokens: int, keep_recent_tokens: int) -> Optional[int]:
+        """
+        Decide whether the unsummarized history should be compacted.
+        
+        Args:
+            threshold_tokens: Estimated tokens of unsummarized history that trigger compaction
+            keep_recent_tokens: Estimated tokens of the latest messages to keep verbatim
+        
+        Returns:
+            The new value of `summarized`, or None if the history is still small enough
+        """
+        recent = self.messages
+        sizes = [message.tokens for message in recent]
+        if sum(sizes) <= threshold_tokens:
+            return None
+        kept, kept_tokens = len(recent), 0
+        while kept > 0 and kept_tokens + sizes[kept - 1] <= keep_recent_tokens:
+            kept -= 1
+            kept_tokens += sizes[kept]
+        # Always summarize at least one message, and keep whole user/assistant turns together
+        kept = max(kept, 1)
+        if kept < len(recent) and recent[kept].role != "user":
+            kept += 1
+        return self.summarized + min(kept, len(recent))
     
     @property
     def messages(self):
+        """Get the messages not covered by the summary, i.e. the history sent verbatim"""
+        return self.conversation.messages[self.summarized:]
+    
+    @property
+    def raw_messages(self):
         """Get all messages in the conversation"""
         return self.conversation.messages
-
-  
\ No newline at end of file
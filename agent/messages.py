@@ -0,0 +1,115 @@
+from typing import Any, Callable, Dict, List, Optional, Union
+from agent.tokens import estimate_tokens
+
+
+class Message:
+    """
+    A chat message shared between the conversation memory, the reasoning
+    loop and the LLM providers.
+
+    Messages are treated as immutable once created, which lets them cache
+    their estimated token count and the serialized form each provider builds
+    from them: a message sent on every iteration of a reasoning loop, or on
+    every turn of a conversation, is measured and encoded once. Item access
+    (`message["role"]`) is kept for code written against plain dicts.
+    """
+    __slots__ = ("role", "content", "_tokens", "_serialized")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self._tokens: Optional[int] = None
+        self._serialized: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, message: Dict[str, str]) -> "Message":
+        return cls(message["role"], message["content"])
+
+    @property
+    def tokens(self) -> int:
+        """Estimated token count of the content, computed once."""
+        if self._tokens is None:
+            self._tokens = estimate_tokens(self.content)
+        return self._tokens
+
+    def serialized(self, key: str, build: Callable[["Message"], Any]) -> Any:
+        """
+        Provider-specific form of the message, built by `build` on first use
+        and cached under `key`.
+        """
+        if self._serialized is None:
+            self._serialized = {}
+        value = self._serialized.get(key)
+        if value is None:
+            value = self._serialized[key] = build(self)
+        return value
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Message):
+            return self.role == other.role and self.content == other.content
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content[:40]!r})"
+
+
+def as_message(message: Union[Message, Dict[str, str]]) -> Message:
+    """Return `message` itself if it is a `Message`, else wrap the dict."""
+    return message if isinstance(message, Message) else Message.from_dict(message)
+
+
+def encode_json_array(messages: List[Union[Message, Dict[str, str]]], key: str, encode: Callable[[Message], str]) -> str:
+    """
+    JSON array of messages, each encoded by `encode` to a JSON string that is
+    cached on the message under `key`, so unchanged history is not
+    re-serialized on every request.
+    """
+    return "[" + ",".join(as_message(message).serialized(key, encode) for message in messages) + "]"
+
+
+class Event:
+    """
+    A reasoning event streamed from the cognitive engine to the server:
+    a piece of thinking, answer or tool output, `finished` on its last chunk.
+    Item access (`event["type"]`, `event.get("finished")`) is kept for
+    consumers written against plain dicts.
+    """
+    __slots__ = ("type", "content", "finished")
+
+    def __init__(self, type: str, content: Any, finished: bool = False):
+        self.type = type
+        self.content = content
+        self.finished = finished
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": self.type, "content": self.content, "finished": self.finished}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in Event.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in Event.__slots__ else default
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Event):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Event(type={self.type!r}, content={self.content!r}, finished={self.finished!r})"
@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class Priority(Enum):
+    """
+    Scheduling class of an agent run. Interactive runs have a user waiting
+    on them; batch runs (bulk triage, evaluations) yield to interactive ones
+    in the admission queue and at the LLM rate limiter.
+    """
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+    @property
+    def rank(self) -> int:
+        """Lower ranks are served first."""
+        return 0 if self is Priority.INTERACTIVE else 1
@@ -1,6 +1,14 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 from .config import RetrieverConfig
 from .reference_documents import BaseReferenceDocument
+from .bm25 import BM25Index
+from .ranking import reciprocal_rank_fusion, maximal_marginal_relevance
+from .cache import EmbeddingCache, SemanticCache
+from .attachments import AttachmentIndex
+from agent.workers import register_after_fork
 from agent.logger import logger
 
 class Retriever:
@@ -13,46 +21,202 @@ class Retriever:
         for doc in self._config.REFERENCE_DOCUMENTS:
             self.reference_documents[doc.id] = doc
         self.attachments = []
+        self.lexical_index = BM25Index() if self._config.HYBRID_SEARCH else None
+        self._executor = None
+        self.embedding_cache = EmbeddingCache(self._config.EMBEDDING_CACHE_SIZE)
+        self.semantic_cache = SemanticCache(
+            threshold=self._config.SEMANTIC_CACHE_THRESHOLD,
+            ttl=self._config.SEMANTIC_CACHE_TTL,
+            max_size=self._config.SEMANTIC_CACHE_SIZE
+        ) if self._config.SEMANTIC_CACHE else None
+        register_after_fork(self)
         logger.debug(f"Initialized Retriever with {len(self.reference_documents)} reference documents.")
 
+    def _after_fork(self):
+        # Pool threads do not survive a fork; the pool is recreated on first use
+        self._executor = None
+
     def setup(self):
         """Sets up the vector database."""
+        if self.embedding_provider.dimension != self.vector_db.dimension:
+            raise ValueError(
+                f"Embedding dimension {self.embedding_provider.dimension} does not match "
+                f"vector database dimension {self.vector_db.dimension}"
+            )
         logger.debug("Setting up vector database.")
         self.vector_db.setup()
+        if self.vector_db.count and self.embedding_provider.needs_fit:
+            raise ValueError(
+                "Vector database holds reduced embeddings but the embedding projection is not fitted; "
+                "configure the projection path it was saved to"
+            )
         logger.debug("Vector database setup complete.")
 
     def load_data_to_vector_db(self):
-        """Embeds reference documents and stores the vectors in the vector database."""
+        """
+        Embeds reference documents and stores the vectors in the vector database.
+        A store that already holds data, e.g. a persisted snapshot opened by
+        `setup()`, is used as-is instead of being re-embedded if it was built
+        from the same documents with the same embedding model; otherwise it is
+        cleared and rebuilt.
+        """
+        contents = {name: document.data or "" for name, document in self.reference_documents.items()}
+        if self.lexical_index is not None:
+            for name, content in contents.items():
+                self.lexical_index.add_document(name, content)
+            logger.debug(f"Indexed {len(contents)} documents in the BM25 index.")
+
+        fingerprint = self._fingerprint(contents)
+        existing = self.vector_db.count
+        if existing:
+            if self.vector_db.fingerprint == fingerprint:
+                logger.debug(f"Vector database already holds {existing} vectors; skipping embedding.")
+                return existing
+            logger.info("Vector database was built from other documents or another embedding model; rebuilding it.")
+            self.vector_db.clear()
         logger.debug("Loading data into the vector database.")
+        if self.embedding_provider.needs_fit:
+            embeddings = self.embedding_provider.fit_transform(list(contents.values()))
+        else:
+            embeddings = self.embedding_provider.embed_texts(list(contents.values()))
         vectors = []
-        for name, document in self.reference_documents.items():
-            content = document.get_data() or ""
-            embedding = self.embedding_provider.embed_text(content)
+        for name, embedding in zip(contents, embeddings):
             if embedding:
-                metadata = document.get_metadata()
+                metadata = dict(self.reference_documents[name].metadata)
                 metadata.update({'source': name})
                 vectors.append((embedding, metadata))
             else:
                 logger.debug(f"Skipping document '{name}' due to missing embedding.")
         if vectors:
             self.vector_db.add_vectors(vectors)
+            self.vector_db.set_fingerprint(fingerprint)
+            self.vector_db.persist()
+            self.invalidate_caches()
             logger.debug(f"Loaded {len(vectors)} embeddings into the vector database.")
             return len(vectors)
         else:
             logger.error("No embeddings were generated; vector database not updated.")
             return 0
 
+    def _fingerprint(self, contents: Dict[str, str]) -> str:
+        """Hash of the documents to index and the embedding model that indexes them."""
+        digest = hashlib.sha256(self.embedding_provider.identity.encode("utf-8"))
+        for name in sorted(contents):
+            for part in (name, contents[name], repr(sorted(self.reference_documents[name].metadata.items()))):
+                digest.update(b"\0" + part.encode("utf-8"))
+        return digest.hexdigest()
+
     def query_and_retrieve(self, query: str) -> List[BaseReferenceDocument]:
         """Queries the vector database and retrieves similar reference documents."""
         logger.debug(f"Executing query: {query}")
-        query_embedding = self.embedding_provider.embed_text(text=query)
+        top_k = self._config.NUM_REFERENCE_DOCUMENTS
+        if self.lexical_index is None:
+            sources = [source for source, _ in self._vector_search(query, top_k)]
+        else:
+            sources = self._hybrid_search(query, top_k)
+        logger.debug(f"Query returned {len(sources)} results.")
+        return [self.reference_documents[source] for source in sources if source in self.reference_documents]
+
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        """Embeds a query, serving repeated queries from the LRU cache."""
+        embedding = self.embedding_cache.get(query)
+        if embedding is None:
+            embedding = self.embedding_provider.embed_text(text=query)
+            if embedding:
+                self.embedding_cache.put(query, embedding)
+        return embedding
+
+    def lookup_answer(self, query: str) -> Optional[str]:
+        """Returns a cached answer to a semantically equivalent query, if any."""
+        if self.semantic_cache is None:
+            return None
+        embedding = self.embed_query(query)
+        if not embedding:
+            return None
+        answer = self.semantic_cache.lookup(embedding)
+        if answer is not None:
+            logger.debug(f"Semantic cache hit for query: {query}")
+        return answer
+
+    def store_answer(self, query: str, answer: str) -> None:
+        """Caches the final answer to a query for near-duplicate questions."""
+        if self.semantic_cache is None or not answer:
+            return
+        embedding = self.embed_query(query)
+        if embedding:
+            self.semantic_cache.store(embedding, answer)
+
+    def invalidate_caches(self) -> None:
+        """Hook for corpus changes: cached answers may rely on outdated documents."""
+        if self.semantic_cache is not None:
+            self.semantic_cache.invalidate()
+            logger.debug("Semantic answer cache invalidated.")
+
+    def attachment_index(self) -> AttachmentIndex:
+        """Creates an empty request-scoped index for the attachments of one input."""
+        return AttachmentIndex(
+            self.embedding_provider,
+            chunk_tokens=self._config.ATTACHMENT_CHUNK_TOKENS,
+            overlap_tokens=self._config.ATTACHMENT_CHUNK_OVERLAP,
+            prefilter_k=self._config.ATTACHMENT_PREFILTER_K
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retriever")
+        return self._executor
+
+    def _vector_search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        query_embedding = self.embed_query(query)
         if not query_embedding:
             logger.error(f"Failed to generate embedding for the query: {query}")
             return []
-        results = self.vector_db.find_similar(query_embedding, self._config.NUM_REFERENCE_DOCUMENTS)
-        logger.debug(f"Query returned {len(results)} results.")
-        reference_documents = [
-            self.reference_documents[res['source']]
-            for res in results if res['source'] in self.reference_documents
-        ]
-        return reference_documents
\ No newline at end of file
+        rerank = self._config.MMR or self._config.DEDUP_THRESHOLD is not None
+        if not rerank:
+            results = self.vector_db.find_similar(query_embedding, top_k)
+            return [(res['source'], res['score']) for res in results]
+
+        # Over-fetch candidates with their vectors, then diversify and collapse near-duplicates
+        results = self.vector_db.find_similar(
+            query_embedding, max(top_k, self._config.MMR_FETCH_K), with_vectors=True
+        )
+        if not results:
+            return []
+        selected = maximal_marginal_relevance(
+            np.asarray(query_embedding, dtype=np.float32),
+            np.asarray([res['vector'] for res in results], dtype=np.float32),
+            top_k,
+            lambda_mult=self._config.MMR_LAMBDA if self._config.MMR else 1.0,
+            duplicate_threshold=self._config.DEDUP_THRESHOLD
+        )
+        return [(results[i]['source'], results[i]['score']) for i in selected]
+
+    def _hybrid_search(self, query: str, top_k: int) -> List[str]:
+        """
+        Merges BM25 and vector search results with reciprocal-rank fusion.
+
+        With LEXICAL_CONFIDENCE set, BM25 is scored first, which takes well
+        under a millisecond in-process, and a confident lexical match (e.g. an
+        exact pod name or error code) is returned without embedding the query
+        at all. A lone BM25 hit has no runner-up to be measured against and
+        never counts as confident. Without it, the embedding round trip and
+        vector search run in the background while BM25 is scored.
+        """
+        fetch_k = max(top_k, self._config.HYBRID_FETCH_K)
+        confidence = self._config.LEXICAL_CONFIDENCE
+        if confidence is None:
+            vector_future = self.executor.submit(self._vector_search, query, fetch_k)
+            lexical = self.lexical_index.search(query, fetch_k)
+            vector = vector_future.result()
+        else:
+            lexical = self.lexical_index.search(query, fetch_k)
+            if len(lexical) > 1 and lexical[0][1] >= confidence * lexical[1][1]:
+                logger.debug("Confident lexical match for query; skipping vector search.")
+                return [source for source, _ in lexical[:top_k]]
+            vector = self._vector_search(query, fetch_k)
+        fused = reciprocal_rank_fusion(
+            [[source for source, _ in lexical], [source for source, _ in vector]],
+            k=self._config.RRF_K
+        )
+        return fused[:top_k]
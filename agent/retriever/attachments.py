@@ -0,0 +1,214 @@
+import mmap
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from pydantic import BaseModel
+from .bm25 import tokenize
+from .embeddings import BaseEmbeddingProvider
+from agent.tokens import CHARS_PER_TOKEN, estimate_tokens
+from agent.logger import logger
+
+# Attachment content: decoded text, or UTF-8 bytes (possibly a memory-mapped upload) decoded chunk by chunk
+Source = Union[str, bytes, mmap.mmap]
+
+
+class AttachmentChunk(BaseModel):
+    """A contiguous excerpt of a text attachment."""
+    name: str
+    start_line: int
+    end_line: int
+    content: str
+
+
+def line_lengths(source: Source) -> Iterator[int]:
+    """Lengths of the lines of a text or bytes-like buffer, newlines included, without copying them."""
+    newline = "\n" if isinstance(source, str) else b"\n"
+    start, size = 0, len(source)
+    while start < size:
+        end = source.find(newline, start)
+        end = size if end < 0 else end + 1
+        yield end - start
+        start = end
+
+
+def chunk_offsets(lengths: Iterable[int], chunk_tokens: int = 256, overlap_tokens: int = 32) -> List[Tuple[int, int, int, int]]:
+    """
+    Split a text, given by its line lengths, into chunks of about
+    `chunk_tokens` tokens on line boundaries, consecutive chunks sharing about
+    `overlap_tokens` tokens of trailing lines. Lines longer than a chunk are
+    split on their own.
+
+    Returns:
+        (start_line, end_line, start_offset, end_offset) with 1-based inclusive
+        line numbers and a half-open offset range into the source
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    chunks = []
+    window: Deque[Tuple[int, int, int]] = deque()  # (line number, offset, length) of the current chunk
+    size = 0
+    offset = 0
+
+    def emit():
+        first, last = window[0], window[-1]
+        chunks.append((first[0], last[0], first[1], last[1] + last[2]))
+
+    for number, length in enumerate(lengths, start=1):
+        if length > max_chars:
+            if window:
+                emit()
+                window.clear()
+                size = 0
+            chunks.extend(
+                (number, number, offset + i, offset + min(i + max_chars, length))
+                for i in range(0, length, max_chars)
+            )
+            offset += length
+            continue
+        if size + length > max_chars and window:
+            emit()
+            # Carry the trailing lines that fit in the overlap into the next chunk
+            kept, kept_size = 0, 0
+            for _, _, previous in reversed(window):
+                if kept_size + previous > overlap_chars or kept_size + previous + length > max_chars:
+                    break
+                kept += 1
+                kept_size += previous
+            while len(window) > kept:
+                window.popleft()
+            size = kept_size
+        window.append((number, offset, length))
+        size += length
+        offset += length
+    if window:
+        emit()
+    return chunks
+
+
+def excerpt(source: Source, start: int, end: int) -> str:
+    """Text of `source[start:end]`; bytes are decoded, replacing invalid or cut UTF-8 sequences."""
+    if isinstance(source, str):
+        return source[start:end]
+    return bytes(source[start:end]).decode("utf-8", errors="replace")
+
+
+class AttachmentIndex:
+    """
+    Request-scoped index over the text attachments of one input.
+
+    Attachments that fit the token budget are passed through whole. Larger
+    ones are chunked, a BM25 pass over the query terms narrows the chunks
+    down to `prefilter_k` candidates, and the candidates are embedded together with the question in
+    a single batch and ranked by cosine similarity. The cost of a request is
+    therefore bounded by `prefilter_k` embeddings and the prompt by
+    `token_budget`, however large the attachments are. Without an embedding
+    provider the BM25 ranking is used directly.
+
+    Byte sources, such as memory-mapped uploads, are never decoded whole:
+    chunking works on line offsets and each chunk is decoded only when it is
+    scored or selected, so memory use does not grow with attachment size.
+    """
+
+    def __init__(
+        self,
+        embedding_provider: Optional[BaseEmbeddingProvider] = None,
+        chunk_tokens: int = 256,
+        overlap_tokens: int = 32,
+        prefilter_k: int = 64
+    ):
+        self.embedding_provider = embedding_provider
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.prefilter_k = prefilter_k
+        self._sources: Dict[str, Source] = {}
+
+    def add(self, name: str, content: Source) -> None:
+        self._sources[name] = content
+
+    def select(self, query: str, token_budget: int) -> List[AttachmentChunk]:
+        """
+        Pick the attachment excerpts most relevant to `query` whose estimated
+        size fits in `token_budget`, in attachment and line order.
+        """
+        total = sum((len(source) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for source in self._sources.values())
+        if total <= token_budget:
+            chunks = []
+            for name, source in self._sources.items():
+                content = excerpt(source, 0, len(source))
+                chunks.append(AttachmentChunk(name=name, start_line=1, end_line=content.count("\n") + 1, content=content))
+            return chunks
+
+        chunks = [
+            (name, start_line, end_line, start, end)
+            for name, source in self._sources.items()
+            for start_line, end_line, start, end in chunk_offsets(
+                line_lengths(source), self.chunk_tokens, self.overlap_tokens
+            )
+        ]
+
+        def text(i: int) -> str:
+            name, _, _, start, end = chunks[i]
+            return excerpt(self._sources[name], start, end)
+
+        candidates = self._prefilter(query, len(chunks), text)
+        if not candidates:
+            # No lexical overlap at all: fall back to the beginning of each attachment
+            candidates = list(range(min(len(chunks), self.prefilter_k)))
+        contents = {i: text(i) for i in candidates}
+        ranked = self._rank(query, candidates, [contents[i] for i in candidates])
+
+        selected, remaining = [], token_budget
+        for i in ranked:
+            cost = estimate_tokens(contents[i])
+            if cost <= remaining:
+                selected.append(i)
+                remaining -= cost
+        logger.debug(
+            f"Selected {len(selected)} of {len(chunks)} attachment chunks "
+            f"({token_budget - remaining} of {total} estimated tokens)"
+        )
+        return [
+            AttachmentChunk(name=chunks[i][0], start_line=chunks[i][1], end_line=chunks[i][2], content=contents[i])
+            for i in sorted(selected)
+        ]
+
+    def _prefilter(self, query: str, num_chunks: int, text: Callable[[int], str], k1: float = 1.2, b: float = 0.75) -> List[int]:
+        """
+        BM25-rank chunks for a single query without building an inverted index:
+        term frequencies are substring counts of the query terms, which keeps the
+        scan in C and is much cheaper than tokenizing megabytes of attachment
+        for one lookup. Chunks are decoded one at a time through `text(i)`.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms or not num_chunks:
+            return []
+        tf = np.zeros((num_chunks, len(terms)), dtype=np.float32)
+        lengths = np.zeros(num_chunks, dtype=np.float32)
+        for i in range(num_chunks):
+            content = text(i).lower()
+            lengths[i] = len(content)
+            tf[i] = [content.count(term) for term in terms]
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log(1.0 + (num_chunks - df + 0.5) / (df + 0.5))
+        norms = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0))
+        scores = (idf * tf * (k1 + 1) / (tf + norms[:, None])).sum(axis=1)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > self.prefilter_k:
+            matched = matched[np.argpartition(-scores[matched], self.prefilter_k - 1)[:self.prefilter_k]]
+        return [int(i) for i in matched[np.argsort(-scores[matched], kind="stable")]]
+
+    def _rank(self, query: str, candidates: List[int], contents: List[str]) -> List[int]:
+        """Order candidates (given in BM25 order) by embedding similarity to the query."""
+        if self.embedding_provider is None:
+            return candidates
+        embeddings = self.embedding_provider.embed_texts([query] + contents)
+        if embeddings[0] is None:
+            return candidates
+        query_vector = np.asarray(embeddings[0], dtype=np.float32)
+        scores = np.full(len(candidates), -np.inf, dtype=np.float32)
+        for row, embedding in enumerate(embeddings[1:]):
+            if embedding is not None:
+                vector = np.asarray(embedding, dtype=np.float32)
+                scores[row] = vector @ query_vector / max(float(np.linalg.norm(vector)), 1e-12)
+        # Stable sort keeps the BM25 order among ties and failed embeddings
+        return [candidates[row] for row in np.argsort(-scores, kind="stable")]
@@ -0,0 +1,116 @@
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Keeps Kubernetes identifiers such as "web-7d9f8b-x2k", "v1.Pod" or "CrashLoopBackOff" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9](?:[a-z0-9_.:/-]*[a-z0-9])?")
+SUBTOKEN_SEPARATORS = re.compile(r"[_.:/-]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased tokens: every compound identifier is emitted whole and also
+    split into its parts, so "my-pod-7d9f" matches both exactly and by "pod".
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = SUBTOKEN_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-process Okapi BM25 inverted index.
+
+    Documents are collected in a build buffer and frozen into compact postings
+    on first search: one uint32 array of document numbers and one uint16
+    array of term frequencies shared by all terms, each term pointing at its
+    slice. Scoring a query is a handful of vectorized NumPy operations.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._doc_ids: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._term_counts: List[Counter] = []
+        self._dirty = False
+        self._terms: Dict[str, Tuple[int, int, float]] = {}
+        self._postings_docs = np.empty(0, dtype=np.uint32)
+        self._postings_tfs = np.empty(0, dtype=np.uint16)
+        self._length_norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def add_document(self, doc_id: str, text: str) -> None:
+        """Add or replace a document; the postings are rebuilt on the next search."""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self._doc_numbers:
+                self._term_counts[self._doc_numbers[doc_id]] = counts
+            else:
+                self._doc_numbers[doc_id] = len(self._doc_ids)
+                self._doc_ids.append(doc_id)
+                self._term_counts.append(counts)
+            self._dirty = True
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Return up to `top_k` (doc_id, score) pairs with a positive score, best first."""
+        with self._lock:
+            if self._dirty:
+                self._build()
+            terms, postings_docs, postings_tfs = self._terms, self._postings_docs, self._postings_tfs
+            length_norms, doc_ids = self._length_norms, self._doc_ids
+
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in terms:
+                continue
+            start, end, idf = terms[term]
+            docs = postings_docs[start:end]
+            tfs = postings_tfs[start:end].astype(np.float32)
+            # Each document appears once per term, so plain fancy-index accumulation is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + length_norms[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(doc_ids[i], float(scores[i])) for i in matched]
+
+    def _build(self) -> None:
+        """Freeze the build buffer into compact postings. Caller holds the lock."""
+        num_docs = len(self._doc_ids)
+        lengths = np.array([sum(counts.values()) for counts in self._term_counts], dtype=np.float32)
+        average_length = lengths.mean() if num_docs and lengths.sum() else 1.0
+        self._length_norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_number, counts in enumerate(self._term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_number, tf))
+
+        total = sum(len(entries) for entries in postings.values())
+        postings_docs = np.empty(total, dtype=np.uint32)
+        postings_tfs = np.empty(total, dtype=np.uint16)
+        terms = {}
+        offset = 0
+        for term, entries in postings.items():
+            end = offset + len(entries)
+            postings_docs[offset:end] = [doc_number for doc_number, _ in entries]
+            postings_tfs[offset:end] = [min(tf, 65535) for _, tf in entries]
+            idf = float(np.log(1 + (num_docs - len(entries) + 0.5) / (len(entries) + 0.5)))
+            terms[term] = (offset, end, idf)
+            offset = end
+
+        self._terms = terms
+        self._postings_docs = postings_docs
+        self._postings_tfs = postings_tfs
+        self._dirty = False
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache mapping exact query text to its embedding."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(text)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(text)
+            self.hits += 1
+            return embedding
+
+    def put(self, text: str, embedding: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[text] = embedding
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SemanticCache:
+    """
+    Cache of final answers keyed by query embedding.
+
+    A lookup hits when a stored, unexpired query has cosine similarity of at
+    least `threshold` with the new one. Entries live in a fixed-size ring, so
+    the oldest entries are overwritten first, and lookups are a single
+    matrix-vector product.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_size: int = 1024):
+        if max_size < 1:
+            raise ValueError(f"Semantic cache size must be at least 1, got {max_size}")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._embeddings: Optional[np.ndarray] = None
+        self._expires = np.zeros(max_size, dtype=np.float64)
+        self._answers: List[Optional[str]] = [None] * max_size
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def lookup(self, embedding: List[float]) -> Optional[str]:
+        query = self._normalize(embedding)
+        with self._lock:
+            if not self._size:
+                return None
+            similarities = self._embeddings[:self._size] @ query
+            similarities[self._expires[:self._size] < time.monotonic()] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._answers[best]
+            return None
+
+    def store(self, embedding: List[float], answer: str) -> None:
+        query = self._normalize(embedding)
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.max_size, len(query)), dtype=np.float32)
+            slot = self._next
+            self._embeddings[slot] = query
+            self._answers[slot] = answer
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._next = (slot + 1) % self.max_size
+            self._size = min(self._size + 1, self.max_size)
+
+    def invalidate(self) -> None:
+        """Drop every cached answer, e.g. because the corpus changed."""
+        with self._lock:
+            self._answers = [None] * self.max_size
+            self._next = 0
+            self._size = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, InstanceOf
-from typing import List
+from typing import List, Optional
 from .embeddings import BaseEmbeddingProvider
 from .vector_db import BaseVectorDB
 from .reference_documents import BaseReferenceDocument
@@ -12,4 +12,36 @@ class RetrieverConfig(BaseModel):
     REFERENCE_DOCUMENTS: List[InstanceOf[BaseReferenceDocument]] = Field(
         default_factory=list,
         description="List of reference documents for RAG"
-    )
\ No newline at end of file
+    )
+    HYBRID_SEARCH: bool = Field(
+        default=False,
+        description="Combine vector search with a local BM25 index using reciprocal-rank fusion"
+    )
+    HYBRID_FETCH_K: int = Field(default=20, description="Candidates taken from each ranking before fusion")
+    RRF_K: int = Field(default=60, description="Reciprocal-rank fusion damping constant")
+    LEXICAL_CONFIDENCE: Optional[float] = Field(
+        default=3.0,
+        description="Use BM25 results alone, without embedding the query, when the top BM25 score "
+                    "is at least this many times the runner-up (at least two BM25 hits are required). "
+                    "None always fuses both rankings."
+    )
+    EMBEDDING_CACHE_SIZE: int = Field(default=1024, description="Query embeddings kept in the LRU cache (0 disables it)")
+    SEMANTIC_CACHE: bool = Field(default=False, description="Serve answers to near-duplicate questions from cache")
+    SEMANTIC_CACHE_THRESHOLD: float = Field(default=0.95, description="Minimum cosine similarity for a semantic cache hit")
+    SEMANTIC_CACHE_TTL: float = Field(default=3600.0, description="Seconds a cached answer stays valid")
+    SEMANTIC_CACHE_SIZE: int = Field(
+        default=1024, ge=1, description="Maximum number of cached answers; disable the cache with SEMANTIC_CACHE"
+    )
+    MMR: bool = Field(default=False, description="Re-rank vector results with maximal marginal relevance")
+    MMR_LAMBDA: float = Field(default=0.5, description="MMR trade-off: 1.0 is pure relevance, 0.0 pure diversity")
+    MMR_FETCH_K: int = Field(default=20, description="Candidates fetched from the vector database for re-ranking")
+    DEDUP_THRESHOLD: Optional[float] = Field(
+        default=None,
+        description="Collapse results whose embeddings have at least this cosine similarity to a better result"
+    )
+    ATTACHMENT_CHUNK_TOKENS: int = Field(default=256, description="Estimated tokens per chunk of a large attachment")
+    ATTACHMENT_CHUNK_OVERLAP: int = Field(default=32, description="Estimated tokens shared by consecutive attachment chunks")
+    ATTACHMENT_PREFILTER_K: int = Field(
+        default=64,
+        description="Attachment chunks kept by BM25 and embedded per request, bounding embedding cost"
+    )
@@ -1,5 +1,7 @@
+import os
 from abc import ABC, abstractmethod
 from typing import Optional, List
+import numpy as np
 
 class BaseEmbeddingProvider(ABC):
     def __init__(self, dimension: int):
@@ -22,4 +24,152 @@ class BaseEmbeddingProvider(ABC):
         Returns:
             Optional[List[float]]: The embedding vector or None if embedding fails.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeds several texts. Providers with a batch endpoint override this to
+        embed them in as few requests as possible.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List[Optional[List[float]]]: One embedding, or None on failure, per text.
+        """
+        return [self.embed_text(text) for text in texts]
+
+    @property
+    def needs_fit(self) -> bool:
+        """Whether `fit_transform` must see the corpus before queries can be embedded."""
+        return False
+
+    @property
+    def identity(self) -> str:
+        """
+        Identifies the embedding space, so that vectors stored by another model
+        or configuration are recognized as incompatible.
+        """
+        return f"{type(self).__name__}:{self.dimension}"
+
+    def warmup(self) -> None:
+        """Prepare for the first query ahead of time, e.g. open pooled connections."""
+        pass
+
+
+class ReducedEmbeddingProvider(BaseEmbeddingProvider):
+    """
+    Wraps another provider and returns lower-dimensional embeddings.
+
+    "truncate" keeps the leading components and re-normalizes, which suits
+    models trained with nested (Matryoshka) representations such as
+    text-embedding-3-*. "pca" projects onto principal components fitted on the
+    corpus, for providers whose vectors don't truncate well; the projection
+    has to be fitted, or loaded from `path`, before queries can be embedded, and
+    is saved there so stored and query vectors stay in the same space.
+    """
+    supported_methods = ["truncate", "pca"]
+
+    def __init__(self, provider: BaseEmbeddingProvider, dimension: int, method: str = "truncate", path: Optional[str] = None):
+        """
+        Args:
+            provider (BaseEmbeddingProvider): Provider producing the full embeddings
+            dimension (int): Target dimension, at most `provider.dimension`
+            method (str): "truncate" or "pca"
+            path (Optional[str]): .npz file the PCA projection is loaded from and saved to
+        """
+        if method not in self.supported_methods:
+            raise ValueError(f"Unsupported reduction method: {method}. Must be one of {self.supported_methods}")
+        if not 0 < dimension <= provider.dimension:
+            raise ValueError(f"Target dimension {dimension} must be between 1 and {provider.dimension}")
+        super().__init__(dimension=dimension)
+        self.provider = provider
+        self.method = method
+        self.path = path
+        self._mean: Optional[np.ndarray] = None
+        self._components: Optional[np.ndarray] = None
+        if method == "pca" and path and os.path.exists(path):
+            self.load(path)
+
+    @property
+    def needs_fit(self) -> bool:
+        return self.method == "pca" and self._components is None
+
+    @property
+    def identity(self) -> str:
+        return f"{self.provider.identity}/{self.method}:{self.dimension}"
+
+    def warmup(self) -> None:
+        self.provider.warmup()
+
+    def embed_text(self, text: str) -> Optional[List[float]]:
+        if self.needs_fit:
+            raise RuntimeError("PCA projection has not been fitted; call fit_transform on the corpus first")
+        embedding = self.provider.embed_text(text)
+        if embedding is None:
+            return None
+        return self.reduce(np.asarray([embedding], dtype=np.float32))[0].tolist()
+
+    def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if self.needs_fit:
+            raise RuntimeError("PCA projection has not been fitted; call fit_transform on the corpus first")
+        return self._reduce_batch(self.provider.embed_texts(texts))
+
+    def fit_transform(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed `texts` with the wrapped provider, fit the projection on them and
+        return their reduced embeddings (None where embedding failed).
+        """
+        embeddings = self.provider.embed_texts(texts)
+        if self.method == "pca":
+            valid = [embedding for embedding in embeddings if embedding is not None]
+            if valid:
+                self.fit(np.asarray(valid, dtype=np.float32))
+        return self._reduce_batch(embeddings)
+
+    def _reduce_batch(self, embeddings: List[Optional[List[float]]]) -> List[Optional[List[float]]]:
+        valid = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        results: List[Optional[List[float]]] = [None] * len(embeddings)
+        if not valid:
+            return results
+        reduced = self.reduce(np.asarray([embeddings[i] for i in valid], dtype=np.float32))
+        for row, i in enumerate(valid):
+            results[i] = reduced[row].tolist()
+        return results
+
+    def fit(self, vectors: np.ndarray) -> None:
+        """Fit the PCA projection on full-dimensional vectors and save it if a path is set."""
+        if len(vectors) < self.dimension:
+            raise ValueError(f"PCA to {self.dimension} dimensions needs at least {self.dimension} vectors, got {len(vectors)}")
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        self._mean = mean.astype(np.float32)
+        self._components = np.ascontiguousarray(vt[:self.dimension].T, dtype=np.float32)
+        if self.path:
+            self.save(self.path)
+
+    def reduce(self, vectors: np.ndarray) -> np.ndarray:
+        """Reduce full-dimensional vectors of shape (n, provider.dimension) to unit vectors of shape (n, dimension)."""
+        if self.method == "truncate":
+            reduced = vectors[:, :self.dimension]
+        else:
+            reduced = (vectors - self._mean) @ self._components
+        return reduced / np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, mean=self._mean, components=self._components)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        with np.load(path) as state:
+            mean, components = state["mean"], state["components"]
+        if components.shape != (self.provider.dimension, self.dimension):
+            raise ValueError(
+                f"Stored projection {components.shape} does not match "
+                f"({self.provider.dimension}, {self.dimension})"
+            )
+        self._mean, self._components = mean, components
@@ -0,0 +1,70 @@
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Merge several rankings of ids with reciprocal-rank fusion: each id scores
+    sum(1 / (k + rank)) over the rankings it appears in.
+
+    Args:
+        rankings: Ranked id lists, best first
+        k: Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        The fused ranking, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    top_k: int,
+    lambda_mult: float = 0.5,
+    duplicate_threshold: Optional[float] = None
+) -> List[int]:
+    """
+    Select up to `top_k` candidates that are relevant to the query but not
+    redundant with each other.
+
+    Each step picks the candidate maximising
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, selected)). Candidates
+    whose cosine similarity to an already selected one reaches
+    `duplicate_threshold` are collapsed into it and never selected.
+
+    Args:
+        query: Query embedding, shape (d,)
+        candidates: Candidate embeddings, shape (n, d)
+        top_k: Number of candidates to select
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+        duplicate_threshold: Optional cosine similarity above which candidates are duplicates
+
+    Returns:
+        Indices into `candidates`, in selection order
+    """
+    if len(candidates) == 0 or top_k <= 0:
+        return []
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.zeros(len(candidates), dtype=similarity.dtype)
+    available = np.ones(len(candidates), dtype=bool)
+    selected = []
+
+    while len(selected) < top_k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+        if duplicate_threshold is not None:
+            available &= similarity[pick] < duplicate_threshold
+    return selected
@@ -33,6 +33,12 @@ class BaseVectorDB(ABC):
         """The similarity metrics supported by this vector database."""
         pass
 
+    @property
+    @abstractmethod
+    def count(self) -> int:
+        """The number of vectors currently stored."""
+        pass
+
     @abstractmethod
     def setup(self, **kwargs) -> None:
         """Set up the tables, create indexes, etc."""
@@ -48,12 +54,45 @@ class BaseVectorDB(ABC):
         """Add vectors and metadata to the index."""
         pass
 
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """
+        Fingerprint of the corpus and embedding model the stored vectors were
+        built from, as recorded by `set_fingerprint`. Stores that cannot record
+        one return None, and their contents are rebuilt at every startup.
+        """
+        return None
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Record the fingerprint of the current contents; kept by `persist`."""
+        pass
+
+    def clear(self) -> None:
+        """Remove all vectors and the fingerprint, leaving the store set up."""
+        self.teardown()
+        self.setup()
+
+    def persist(self) -> None:
+        """
+        Persist the current contents so that later startups can skip re-indexing.
+        Stores that persist on their own need not override this.
+        """
+        pass
+
+    def warmup(self) -> None:
+        """
+        Bring the index into memory ahead of the first query, e.g. page in
+        memory-mapped files. Called once when the server starts, after `setup`.
+        """
+        pass
+
     @abstractmethod
     def find_similar(
         self, 
         query_vector: List[float], 
         top_k: int,
-        filter_dict: Optional[Dict] = None
+        filter_dict: Optional[Dict] = None,
+        with_vectors: bool = False
     ) -> List[Dict]:
         """
         Find the top_k most similar vectors to the query vector.
@@ -62,7 +101,8 @@ class BaseVectorDB(ABC):
         :param query_vector: The query vector to find similar vectors for
         :param top_k: Number of most similar vectors to return
         :param filter_dict: Optional metadata filters (e.g., {"document_type": "pdf"})
-        :return: List of results containing 'uri', 'retriever_id', and 'score'
+        :param with_vectors: Also return the stored vector of each result under 'vector'
+        :return: List of results containing 'source', 'metadata', and 'score'
         """
         pass
 
@@ -0,0 +1,347 @@
+import asyncio
+import hashlib
+import json
+import threading
+import uuid
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from agent.cancellation import CancellationToken, RequestCancelled
+from agent.workers import Affinity
+from agent.logger import logger
+
+if TYPE_CHECKING:
+    from fastapi import Request
+
+
+class RunConfig(BaseModel):
+    EVENT_BUFFER_SIZE: int = Field(
+        default=4096,
+        description="Number of recent events each run keeps for subscribers that attach late or reconnect"
+    )
+    GRACE_PERIOD: float = Field(
+        default=30.0,
+        description="Seconds a run keeps going without subscribers, and stays resumable after it ends"
+    )
+
+
+class EventsExpired(Exception):
+    """The events a subscriber asked for are no longer in the run's buffer."""
+    pass
+
+
+def coalescing_key(
+    messages: List[Dict[str, str]],
+    attachments: Dict[str, Any],
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Digest identifying a request by its messages, the options that affect
+    how it runs and its attachment contents. Requests with the same key
+    would run the same reasoning loop.
+    """
+    digest = hashlib.sha256(json.dumps([messages, options or {}], sort_keys=True).encode("utf-8"))
+    for filename in sorted(attachments):
+        content = attachments[filename]
+        if hasattr(content, "buffer"):
+            content = content.buffer()
+        digest.update(b"\0" + filename.encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def new_run_id() -> str:
+    return "run_" + uuid.uuid4().hex
+
+
+def parse_event_id(event_id: str) -> Tuple[str, int]:
+    """
+    Split an event id into the run id and the sequence number of the event.
+
+    Raises:
+        ValueError: If the id is malformed
+    """
+    run_id, _, seq = event_id.strip().rpartition(":")
+    if not run_id:
+        raise ValueError(f"Malformed event id {event_id}")
+    return run_id, int(seq)
+
+
+class AgentRun:
+    """
+    One execution of `Agent.respond` whose events can be followed by several
+    subscribers, and resumed by a subscriber that reconnects.
+
+    The blocking event generator runs on its own thread, so a request never
+    blocks the event loop. Each event gets the next sequence number of the
+    run and is kept in a ring buffer of the most recent `buffer_size`
+    events; `event_id` names it across runs. Every subscriber reads from its
+    own position: one that attaches while the run is in flight first
+    receives the events it missed, then follows live.
+
+    When the last subscriber goes away before the run is over, or no
+    subscriber attaches after it starts, the run keeps going for
+    `grace_period` seconds so that a reconnecting client can pick
+    it up; if nobody does, the cancellation token is cancelled: the agent
+    closes the upstream LLM stream, kills running tools and the thread exits.
+
+    Runs live on the server's event loop and are not thread-safe.
+    """
+
+    def __init__(
+        self,
+        events: Iterator[Any],
+        cancellation: CancellationToken,
+        conversation_id: Optional[str] = None,
+        key: Optional[str] = None,
+        buffer_size: int = 4096,
+        grace_period: float = 30.0,
+        run_id: Optional[str] = None
+    ):
+        """
+        Args:
+            events: The generator returned by `Agent.respond`
+            cancellation: The token passed to `Agent.respond`
+            conversation_id: Conversation the run records its turn in
+            key: Coalescing key of the request, if it may be shared
+            buffer_size: Number of recent events kept for replay
+            grace_period: Seconds the run keeps going without subscribers
+            run_id: Id of the run, generated if omitted
+        """
+        self.id = run_id or new_run_id()
+        self.cancellation = cancellation
+        self.conversation_id = conversation_id
+        self.key = key
+        self.grace_period = grace_period
+        self.finished = False
+        self._source = events
+        # (event, types with an unfinished chunk before it) by sequence number modulo the size
+        self._ring: List[Optional[Tuple[Any, FrozenSet[str]]]] = [None] * max(1, buffer_size)
+        self._next_seq = 0
+        self._open: FrozenSet[str] = frozenset()
+        self._error: Optional[Exception] = None
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._expiry: Optional[asyncio.TimerHandle] = None
+        self._done_callbacks: List[Callable[[], None]] = []
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest event still buffered."""
+        return max(0, self._next_seq - len(self._ring))
+
+    @property
+    def joinable(self) -> bool:
+        """Whether a new subscriber would see the whole run."""
+        return not self.finished and not self.cancellation.cancelled and self.first_seq == 0
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.id}:{seq}"
+
+    def can_resume(self, after: int) -> bool:
+        """Whether every event after sequence number `after` can still be delivered."""
+        return not self.cancellation.cancelled and after + 1 >= self.first_seq
+
+    def open_types(self, after: int) -> FrozenSet[str]:
+        """
+        Event types with a chunk delivered up to `after` whose last chunk was
+        not, e.g. thinking that a resumed stream continues mid-way.
+        """
+        if after < 0:
+            return frozenset()
+        if after + 1 >= self._next_seq:
+            return self._open
+        return self._ring[(after + 1) % len(self._ring)][1]
+
+    def add_done_callback(self, callback: Callable[[], None]) -> None:
+        """Call `callback` on the event loop once the run is over, immediately if it already is."""
+        if self.finished:
+            callback()
+        else:
+            self._done_callbacks.append(callback)
+
+    def start(self) -> "AgentRun":
+        loop = asyncio.get_running_loop()
+
+        def produce():
+            error = None
+            try:
+                for event in self._source:
+                    loop.call_soon_threadsafe(self._append, event)
+            except RequestCancelled:
+                pass
+            except Exception as e:
+                error = e
+            finally:
+                self._source.close()
+                loop.call_soon_threadsafe(self._finish, error)
+
+        threading.Thread(target=produce, name="agent-respond", daemon=True).start()
+        # A client can go away before its response subscribes; the first subscriber disarms this
+        self._expiry = loop.call_later(self.grace_period, self._expire)
+        return self
+
+    async def subscribe(
+        self,
+        request: "Request",
+        after: int = -1,
+        poll_interval: float = 0.5
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Follow the events of the run after sequence number `after`, from the
+        beginning by default.
+
+        While no event arrives the client connection is polled every
+        `poll_interval` seconds, and iteration stops once the client has
+        gone away.
+
+        Args:
+            request: The HTTP request of the subscriber, watched for disconnects
+            after: Sequence number of the last event the subscriber has seen
+            poll_interval: Seconds between disconnect checks while idle
+
+        Yields:
+            (sequence number, event) pairs
+
+        Raises:
+            EventsExpired: If the subscriber fell behind the event buffer
+            Exception: The error that ended the run, if any
+        """
+        self._subscribers += 1
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        seq = after + 1
+        try:
+            while True:
+                while seq < self._next_seq:
+                    if seq < self.first_seq:
+                        raise EventsExpired(f"Events of run {self.id} before {self.event_id(self.first_seq)} expired")
+                    yield seq, self._ring[seq % len(self._ring)][0]
+                    seq += 1
+                if self.finished:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        logger.info("Client disconnected from the run")
+                        return
+        finally:
+            self._subscribers -= 1
+            if not self._subscribers and not self.finished:
+                # Keep going for a while so that the client can reconnect
+                self._expiry = asyncio.get_running_loop().call_later(self.grace_period, self._expire)
+
+    def _expire(self) -> None:
+        self._expiry = None
+        if not self._subscribers and not self.finished:
+            logger.info(f"No client reconnected to run {self.id}, cancelling it")
+            self.cancellation.cancel("client disconnected")
+
+    def _notify(self) -> None:
+        # Wake the current waiters; later waiters wait on a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _append(self, event: Any) -> None:
+        self._ring[self._next_seq % len(self._ring)] = (event, self._open)
+        self._next_seq += 1
+        event_type = event["type"]
+        if event.get("finished", False):
+            if event_type in self._open:
+                self._open = self._open - {event_type}
+        elif event_type not in self._open:
+            self._open = self._open | {event_type}
+        self._notify()
+
+    def _finish(self, error: Optional[Exception]) -> None:
+        self.finished = True
+        self._error = error
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        self._notify()
+        callbacks, self._done_callbacks = self._done_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in run done callback: {str(e)}")
+
+
+class RunRegistry:
+    """
+    Registry of the agent runs of a server.
+
+    Runs are found by id for clients that reconnect, for up to the grace
+    period after they end. Coalescable runs are also found by key while in
+    flight: a request whose key matches a joinable run subscribes to it
+    instead of starting its own (single flight).
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.config = RunConfig(*args, **kwargs)
+        self._runs: Dict[str, AgentRun] = {}
+        self._by_key: Dict[str, AgentRun] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.resumed = 0
+        # Set in multi-process servers so that run ids route to this process
+        self.affinity: Optional[Affinity] = None
+
+    def start(
+        self,
+        events: Iterator[Any],
+        cancellation: CancellationToken,
+        conversation_id: Optional[str] = None,
+        key: Optional[str] = None
+    ) -> AgentRun:
+        """Start a run of the `Agent.respond` generator `events` and register it."""
+        run = AgentRun(
+            events,
+            cancellation,
+            conversation_id,
+            key,
+            buffer_size=self.config.EVENT_BUFFER_SIZE,
+            grace_period=self.config.GRACE_PERIOD,
+            run_id=self.affinity.new_id(new_run_id) if self.affinity else None
+        ).start()
+        self.started += 1
+        self._runs[run.id] = run
+        if key is not None:
+            self._by_key[key] = run
+        run.add_done_callback(lambda: self._finished(run))
+        return run
+
+    def get(self, run_id: str) -> Optional[AgentRun]:
+        """The run with id `run_id`, if it is in flight or ended recently."""
+        return self._runs.get(run_id)
+
+    def join(self, key: str) -> Optional[AgentRun]:
+        """The in-flight run for `key` to subscribe to, or None to start one."""
+        run = self._by_key.get(key)
+        if run is None or not run.joinable:
+            return None
+        self.coalesced += 1
+        return run
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": sum(not run.finished for run in self._runs.values()),
+            "retained": len(self._runs),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "resumed": self.resumed,
+        }
+
+    def _finished(self, run: AgentRun) -> None:
+        if run.key is not None and self._by_key.get(run.key) is run:
+            del self._by_key[run.key]
+        if run.cancellation.cancelled:
+            self._runs.pop(run.id, None)
+        else:
+            # Clients that dropped near the end can still fetch the rest
+            asyncio.get_running_loop().call_later(self.config.GRACE_PERIOD, self._runs.pop, run.id, None)
@@ -1,13 +1,56 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import json
+from typing import Callable, List, Optional, Dict, Any
 from datetime import datetime
 from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import threading
 import uvicorn
 from agent.logger import logger
+from agent.files import FileStore, FileTooLargeError
+from agent.input import TEXT_EXTENSIONS
+from agent.memory import new_conversation_id
+from agent.sse import SSEEncoder
+from agent.cancellation import CancellationToken
+from agent.admission import AdmissionController, AdmissionRejected
+from agent.priority import Priority
+from agent.batch import BatchItem, dumps_result, failed_result, parse_items, run_item
+from agent.toolkit import ToolResultCache
+from agent.runs import RunRegistry, coalescing_key, parse_event_id
+from agent.jobs import JobQueue, QueueFull
+from agent.workers import LOOPBACK, Affinity, PreforkServer
+from agent.warmup import Warmup
+
+# Headers that describe one connection and are not forwarded between workers
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+})
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    Streaming response that closes its body iterator and calls `on_close`
+    once the response ends, however it ends: completed, failed, or aborted
+    by a client disconnect before or during streaming.
+    """
+    
+    def __init__(self, *args, on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()
+            finally:
+                if self.on_close is not None:
+                    self.on_close()
+
 
 class Message(BaseModel):
     role: str
@@ -18,10 +61,21 @@ class ChatCompletionRequest(BaseModel):
     messages: List[Message]
     stream: Optional[bool] = False
     attachments: Optional[Dict[str, bytes]] = None
+    file_ids: Optional[List[str]] = None
     show_thinking: Optional[bool] = True
     show_tool_requests: Optional[bool] = True
     show_tool_outputs: Optional[bool] = True
     conversation_id: Optional[str] = None
+    priority: Optional[str] = None
+    coalesce: Optional[bool] = True
+
+class RunCreateRequest(BaseModel):
+    messages: List[Message]
+    conversation_id: Optional[str] = None
+    attachments: Optional[Dict[str, str]] = None
+    priority: Optional[str] = None
+    webhook_url: Optional[str] = None
+    metadata: Optional[Dict[str, str]] = None
 
 class ChatCompletionResponseChoice(BaseModel):
     index: int
@@ -45,10 +99,131 @@ class StreamChunk(BaseModel):
     choices: List[Dict[str, Any]]
 
 class AgentServer:
-    def __init__(self, agent):
-        """Initialize the server with an agent instance"""
+    def __init__(
+        self,
+        agent,
+        file_store: Optional[FileStore] = None,
+        admission: Optional[AdmissionController] = None,
+        runs: Optional[RunRegistry] = None,
+        jobs: Optional[JobQueue] = None
+    ):
+        """
+        Initialize the server with an agent instance, the store for uploaded
+        files, the admission controller that limits concurrent agent runs,
+        the registry that lets clients share and resume runs and, optionally,
+        the queue that serves background runs under /v1/runs
+        """
         self.agent = agent
+        self.files = file_store or FileStore()
+        self.admission = admission or AdmissionController()
+        self.runs = runs or RunRegistry()
+        self.jobs = jobs
         self.app = None
+        self.warmup = Warmup(agent.warmup_steps())
+        # Set in each worker of a multi-process server
+        self.affinity: Optional[Affinity] = None
+        self.worker_ports: List[int] = []
+        self._forward_client = None
+    
+    def _start_worker(self, index: int, workers: int, worker_ports: List[int]) -> None:
+        """
+        Prepare a forked worker: give it its share of the LLM rate limits and,
+        with affinity, make the ids it creates route back to it.
+        """
+        rate_limiter = getattr(self.agent.cognitive_engine, "rate_limiter", None)
+        if rate_limiter is not None:
+            rate_limiter.share(workers)
+        if worker_ports:
+            self.affinity = Affinity(index, workers)
+            self.worker_ports = worker_ports
+            self.files.affinity = self.affinity
+            self.runs.affinity = self.affinity
+            if self.jobs is not None:
+                self.jobs.affinity = self.affinity
+    
+    def _owner(self, http_request: Request, *keys: Optional[str]) -> Optional[int]:
+        """
+        Worker that owns the first of `keys` that is set, if it is not this
+        one and the request was not already forwarded. Only requests arriving
+        on a per-worker port, which only other workers reach, count as
+        forwarded; clients cannot skip routing by sending the header.
+        """
+        if self.affinity is None or self._forwarded(http_request):
+            return None
+        for key in keys:
+            if key:
+                owner = self.affinity.owner(key)
+                return None if owner == self.affinity.index else owner
+        return None
+    
+    def _forwarded(self, http_request: Request) -> bool:
+        """Whether another worker relayed the request to this one."""
+        server = http_request.scope.get("server")
+        return (
+            server is not None and server[1] in self.worker_ports
+            and http_request.headers.get("x-forwarded-worker") is not None
+        )
+    
+    async def _forward(self, http_request: Request, worker: int) -> ReleasingStreamingResponse:
+        """Relay a request to the worker that owns its state and stream back the response."""
+        import httpx
+        if self._forward_client is None:
+            self._forward_client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0))
+        headers = {
+            name: value for name, value in http_request.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS
+        }
+        headers["x-forwarded-worker"] = str(self.affinity.index)
+        upstream = await self._forward_client.send(
+            self._forward_client.build_request(
+                http_request.method,
+                f"http://{LOOPBACK}:{self.worker_ports[worker]}{http_request.url.path}",
+                params=http_request.query_params,
+                headers=headers,
+                content=await http_request.body()
+            ),
+            stream=True
+        )
+        
+        async def relay():
+            try:
+                async for chunk in upstream.aiter_raw():
+                    yield chunk
+            finally:
+                await upstream.aclose()
+        
+        return ReleasingStreamingResponse(
+            relay(),
+            status_code=upstream.status_code,
+            headers={
+                name: value for name, value in upstream.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS
+            }
+        )
+    
+    def _copy_turn(self, run, conversation_id: str) -> None:
+        """Copy the conversation a finished shared run recorded its turn in to `conversation_id`."""
+        conversations = self.agent.conversations
+        if conversations is None or run.cancellation.cancelled:
+            return
+        # The source may have to be loaded from the store; keep that off the event loop
+        asyncio.get_running_loop().run_in_executor(None, conversations.copy, run.conversation_id, conversation_id)
+    
+    def _new_conversation_id(self) -> str:
+        if self.affinity is not None:
+            return self.affinity.new_id(new_conversation_id)
+        return new_conversation_id()
+    
+    def _tenant(self, request: Request) -> str:
+        """
+        Tenant a request is accounted to for admission: the tenant header if
+        present, else a digest of its API key, else "default".
+        """
+        tenant = request.headers.get(self.admission.config.TENANT_HEADER)
+        if tenant:
+            return tenant
+        api_key = request.headers.get("x-api-key") or request.headers.get("authorization")
+        if api_key:
+            return "key_" + hashlib.sha256(api_key.encode()).hexdigest()[:12]
+        return "default"
     
     def setup_app(self):
         """Setup FastAPI application with all routes and middleware"""
@@ -57,8 +232,17 @@ class AgentServer:
         async def lifespan(app: FastAPI):
             # Agent is already initialized
             logger.info("Agent server starting up")
+            # Warm up in the background; /ready reports when the first requests will be fast
+            threading.Thread(target=self.warmup.run, name="warmup", daemon=True).start()
+            if self.jobs is not None:
+                self.jobs.start()
             yield
             logger.info("Shutting down agent server")
+            if self._forward_client is not None:
+                await self._forward_client.aclose()
+            if self.jobs is not None:
+                self.jobs.close()
+            self.agent.close()
 
         app = FastAPI(lifespan=lifespan)
 
@@ -80,6 +264,7 @@ class AgentServer:
         @app.post("/v1/chat/completions")
         async def chat_completions(
             request: ChatCompletionRequest,
+            http_request: Request,
             agent = Depends(get_agent),
             conversation_id: Optional[str] = None
         ):
@@ -95,38 +280,128 @@ class AgentServer:
             user_message = user_messages[-1].content
             
             # Use conversation_id from query param if provided, otherwise from request body
-            conversation_id = conversation_id or request.conversation_id
+            explicit_conversation_id = conversation_id or request.conversation_id
+            
+            # In a multi-process server, runs, cached conversations and uploads live in
+            # the worker that created them
+            last_event_id = http_request.headers.get("last-event-id") if request.stream else None
+            owner = self._owner(
+                http_request,
+                last_event_id.partition(":")[0] if last_event_id else None,
+                explicit_conversation_id,
+                *(request.file_ids or [])
+            )
+            if owner is not None:
+                return await self._forward(http_request, owner)
             
-            # Create input object with attachments if provided
-            from agent.input import Input
-            input_obj = Input(message=user_message, attachments=request.attachments)
+            # Uploaded files are attached by id and read lazily from their spool
+            attachments = dict(request.attachments or {})
+            for file_id in request.file_ids or []:
+                stored = self.files.get(file_id)
+                if stored is None:
+                    raise HTTPException(status_code=404, detail=f"File {file_id} not found")
+                attachments[stored.filename] = stored
             
             # Convert Pydantic messages to dict format for the agent
             messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
             
+            # Priority class from the request body, else the X-Priority header
+            priority_name = request.priority or http_request.headers.get("x-priority") or Priority.INTERACTIVE.value
+            try:
+                priority = Priority(priority_name.lower())
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Unknown priority {priority_name}")
+            tenant = self._tenant(http_request)
+            
+            run = None
+            coalesced = False
+            queue_wait = "0.0"
+            after = -1
+            if last_event_id:
+                # A client that lost its stream picks up its run after the last event it received
+                try:
+                    run_id, after = parse_event_id(last_event_id)
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"Malformed Last-Event-ID {last_event_id}")
+                run = self.runs.get(run_id)
+                if run is None:
+                    raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+                if not run.can_resume(after):
+                    raise HTTPException(status_code=410, detail=f"Events after {last_event_id} are no longer available")
+                self.runs.resumed += 1
+            else:
+                # Identical fresh requests in flight share one run, unless tools may change
+                # state or the request continues a conversation
+                key = None
+                if request.coalesce and not explicit_conversation_id and not agent.toolkit.has_side_effects:
+                    key = coalescing_key(messages, attachments, {"priority": priority.value, "tenant": tenant})
+                run = self.runs.join(key) if key else None
+                coalesced = run is not None
+            
+            if run is None:
+                # Create input object with attachments if provided
+                from agent.input import Input
+                input_obj = Input(message=user_message, attachments=attachments)
+                
+                # Wait for a run slot; under overload the request is turned away quickly
+                try:
+                    slot = await self.admission.acquire(tenant, priority)
+                except AdmissionRejected as e:
+                    raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+                queue_wait = f"{slot.wait * 1000:.1f}"
+                
+                # An identical request may have started its run while this one was queued
+                run = self.runs.join(key) if key else None
+                if run is not None:
+                    slot.release()
+                    coalesced = True
+                else:
+                    # New conversations get their id here so it can be returned to the client.
+                    # The run is cancelled once no client has followed it for the grace period,
+                    # which stops the LLM stream and tools
+                    cancellation = CancellationToken()
+                    run_conversation_id = explicit_conversation_id or self._new_conversation_id()
+                    run = self.runs.start(
+                        agent.respond(
+                            input=input_obj, conversation_id=run_conversation_id, cancellation=cancellation, priority=priority
+                        ),
+                        cancellation,
+                        run_conversation_id,
+                        key
+                    )
+                    run.add_done_callback(slot.release)
+            conversation_id = run.conversation_id
+            if coalesced:
+                # Clients sharing a run must not continue each other's conversations: each
+                # subscriber gets its own, holding a copy of the turn once the run is over
+                conversation_id = self._new_conversation_id()
+                run.add_done_callback(lambda: self._copy_turn(run, conversation_id))
+            elif after >= 0 and run.key is not None:
+                # Whoever resumes a shared run need not be the client that started it
+                conversation_id = None
+            headers = {
+                "X-Run-Id": run.id,
+                "X-Queue-Wait-Ms": queue_wait,
+                "X-Coalesced": "true" if coalesced else "false",
+            }
+            if conversation_id is not None:
+                headers["X-Conversation-Id"] = conversation_id
+            
             # Handle streaming response
             if request.stream:
                 async def stream_response():
-                    # Start the response with an empty chunk
-                    start_chunk = {
-                        "choices": [{
-                            "index": 0,
-                            "delta": {"role": "assistant"},
-                            "finish_reason": None
-                        }]
-                    }
-                    yield f"data: {json.dumps(start_chunk)}\n\n"
-                    
-                    # Get the input ready for the agent
-                    if agent.retriever:
-                        agent.retriever.query_and_retrieve(query=input_obj.message)
+                    encoder = SSEEncoder()
+                    # Start the response with an empty chunk, unless it is resumed
+                    if after < 0:
+                        yield encoder.role("assistant")
                     
                     # Process and stream the response
                     try:
-                        # Track content for each tag type to handle closing tags properly
-                        tag_content = {}
+                        # Track content for each tag type to handle closing tags properly;
+                        # a resumed stream may continue inside a tag
+                        tag_content = {tag: "" for tag in run.open_types(after)}
                         
-                        for chunk in agent.respond(input=input_obj, conversation_id=conversation_id):
+                        async for seq, chunk in run.subscribe(http_request, after):
                             tag = chunk["type"]
                             content = chunk["content"]
                             finished = chunk.get("finished", False)
@@ -161,50 +436,18 @@ class AgentServer:
                                 tag_open = f"<{tag}>"
                                 tag_close = f"</{tag}>"
                                 
-                                # For tool_output, handle both streaming and non-streaming cases
+                                # tool_output carries the output operations of a streaming
+                                # tool, already serialized: forward them without reparsing
                                 if tag == "tool_output":
                                     if tag not in tag_content:
-                                        # First chunk of this response
-                                        tag_content[tag] = content
-                                        formatted_content = f"{tag_open}{content}"
-                                        
-                                        # If it's already finished with the first chunk, close the tag
-                                        if finished:
-                                            formatted_content += f"{tag_close}"
-                                            tag_content.pop(tag, None)
-                                    else:
-                                        # Continuation of a previous chunk
-                                        # Try to parse both the previous and new content as JSON
-                                        try:
-                                            prev_content = json.loads(tag_content[tag])
-                                            new_content = json.loads(content)
-                                            
-                                            # If they're both JSON objects and have the same keys, update incrementally
-                                            if isinstance(prev_content, dict) and isinstance(new_content, dict):
-                                                # Find new or modified keys
-                                                delta_content = {}
-                                                for key, value in new_content.items():
-                                                    if key not in prev_content or prev_content[key] != value:
-                                                        delta_content[key] = value
-                                                
-                                                if delta_content:
-                                                    # Only send the delta
-                                                    formatted_content = json.dumps(delta_content)
-                                                    tag_content[tag] = content  # Update the stored content
-                                            else:
-                                                # For non-object JSON or complete replacement, just send the new content
-                                                formatted_content = content
-                                                tag_content[tag] = content
-                                        except (json.JSONDecodeError, TypeError):
-                                            # If either is not valid JSON, treat as text and append
-                                            new_text = content[len(tag_content[tag]):] if content.startswith(tag_content[tag]) else content
-                                            formatted_content = new_text
-                                            tag_content[tag] = content
-                                        
-                                        # If this chunk has finished, close the tag
-                                        if finished:
-                                            formatted_content += f"{tag_close}"
-                                            tag_content.pop(tag, None)
+                                        tag_content[tag] = ""
+                                        formatted_content = tag_open
+                                    formatted_content += content
+                                    
+                                    # If this chunk has finished, close the tag
+                                    if finished:
+                                        formatted_content += tag_close
+                                        tag_content.pop(tag, None)
                                 else:
                                     # For tool and tool_error, just wrap with tags
                                     formatted_content = f"{tag_open}{content}{tag_close}"
@@ -214,63 +457,47 @@ class AgentServer:
                                 formatted_content = content
                             
                             # Skip empty content unless it's a finished tag that needs closing
-                            if not formatted_content and not (finished and tag in tag_content):
+                            # or the end of the answer, which carries the finish reason
+                            if not formatted_content and not (finished and (tag in tag_content or tag == "answer")):
                                 continue
-                                
-                            # Prepare the delta response chunk
-                            delta_chunk = {
-                                "choices": [{
-                                    "index": 0,
-                                    "delta": {"content": formatted_content},
-                                    "finish_reason": "stop" if finished and tag == "answer" else None
-                                }]
-                            }
                             
-                            # Send the chunk
-                            yield f"data: {json.dumps(delta_chunk)}\n\n"
+                            # Send the delta response chunk, with an id to resume the stream after it
+                            yield encoder.content(
+                                formatted_content, "stop" if finished and tag == "answer" else None, run.event_id(seq)
+                            )
                         
                         # End the stream with a final done message
-                        yield "data: [DONE]\n\n"
+                        yield SSEEncoder.DONE
                     
                     except Exception as e:
                         logger.error(f"Error in stream_response: {str(e)}")
-                        error_chunk = {
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": f"\n\nError: {str(e)}"},
-                                "finish_reason": "stop"
-                            }]
-                        }
-                        yield f"data: {json.dumps(error_chunk)}\n\n"
-                        yield "data: [DONE]\n\n"
+                        yield encoder.content(f"\n\nError: {str(e)}", "stop")
+                        yield SSEEncoder.DONE
                 
-                return StreamingResponse(
+                return ReleasingStreamingResponse(
                     stream_response(),
                     media_type="text/event-stream",
                     headers={
                         "Content-Type": "text/event-stream",
                         "Cache-Control": "no-cache",
                         "Connection": "keep-alive",
+                        **headers,
                     },
                 )
             else:
                 # Non-streaming response
                 try:
-                    # Get the input ready for the agent
-                    if agent.retriever:
-                        agent.retriever.query_and_retrieve(query=input_obj.message)
-                    
-                    # Get a non-streaming response
-                    response_gen = agent.respond(input=input_obj, conversation_id=conversation_id)
-                    
                     # For non-streaming, collect all data and return final response
                     response_text = ""
-                    for chunk in response_gen:
+                    timings = {}
+                    async for _, chunk in run.subscribe(http_request):
                         if chunk["type"] == "answer":
                             response_text += chunk["content"]
+                        elif chunk["type"] == "timings":
+                            timings = chunk["content"]
                     
                     # Construct the response
-                    return {
+                    body = {
                         "choices": [
                             {
                                 "index": 0,
@@ -285,24 +512,233 @@ class AgentServer:
                             "prompt_tokens": 0,  # We don't track tokens here
                             "completion_tokens": 0,
                             "total_tokens": 0
-                        }
+                        },
+                        "timings": timings,
+                        "conversation_id": conversation_id
                     }
+                    return JSONResponse(body, headers=headers)
                 except Exception as e:
                     logger.error(f"Error in non-streaming response: {str(e)}")
                     raise HTTPException(status_code=500, detail=str(e))
 
+        @app.post("/v1/chat/completions/batch")
+        async def chat_completions_batch(http_request: Request, agent = Depends(get_agent), concurrency: int = 4):
+            """
+            Run a JSONL body of chat completion requests, at most `concurrency`
+            at a time, and stream one JSON line per item as it finishes.
+
+            Every item is admitted as a batch run, so a batch never takes the
+            slots interactive requests need; an item that is rejected waits
+            for the retry hint and asks again. The items share one tool result
+            cache besides the agent's embedding and answer caches.
+            """
+            body = await http_request.body()
+            items = list(parse_items(body.splitlines()))
+            if not items:
+                raise HTTPException(status_code=400, detail="No batch items provided")
+            concurrency = max(1, min(concurrency, self.admission.config.MAX_CONCURRENT_RUNS))
+            tenant = self._tenant(http_request)
+            tool_cache = ToolResultCache()
+            # Cancelled when the client disconnects, which stops every running item
+            cancellation = CancellationToken()
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run(index: int, item: BatchItem) -> Dict[str, Any]:
+                if item.conversation_id and self.affinity is not None and not self.affinity.owns(item.conversation_id):
+                    return failed_result(
+                        index,
+                        f"Conversation {item.conversation_id} is held by another worker; continue it through /v1/chat/completions",
+                        item.custom_id
+                    )
+                async with semaphore:
+                    while True:
+                        try:
+                            slot = await self.admission.acquire(tenant, Priority.BATCH)
+                            break
+                        except AdmissionRejected as e:
+                            await asyncio.sleep(e.retry_after)
+                    try:
+                        result = await loop.run_in_executor(
+                            None, run_item, agent, index, item, cancellation, tool_cache
+                        )
+                    finally:
+                        slot.release()
+                    result["queue_wait_ms"] = round(slot.wait * 1000, 3)
+                    return result
+
+            async def stream_results():
+                tasks = [
+                    asyncio.ensure_future(run(index, item))
+                    for index, item in items if not isinstance(item, Exception)
+                ]
+                try:
+                    for index, item in items:
+                        if isinstance(item, Exception):
+                            yield dumps_result(failed_result(index, item))
+                    for task in asyncio.as_completed(tasks):
+                        yield dumps_result(await task)
+                    logger.info(
+                        f"Batch of {len(items)} items finished, tool cache: "
+                        f"{tool_cache.hits} hits, {tool_cache.misses} misses"
+                    )
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+            return ReleasingStreamingResponse(
+                stream_results(),
+                media_type="application/x-ndjson",
+                on_close=cancellation.cancel,
+            )
+
+        @app.post("/v1/files")
+        async def upload_file(request: Request, filename: str):
+            """
+            Upload an attachment as the raw request body. The body is streamed
+            into a spooled temporary file, so it is never held in memory whole,
+            and the returned id can be passed in `file_ids` of chat requests.
+            """
+            if not filename.lower().endswith(TEXT_EXTENSIONS):
+                raise HTTPException(status_code=415, detail=f"File type for {filename} not supported")
+            declared = request.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > self.files.max_file_bytes:
+                raise HTTPException(status_code=413, detail=f"File exceeds the {self.files.max_file_bytes} byte upload limit")
+            
+            upload = self.files.create(filename)
+            try:
+                async for chunk in request.stream():
+                    upload.write(chunk)
+            except FileTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except Exception:
+                upload.abort()
+                raise
+            stored = upload.commit()
+            return {
+                "id": stored.id,
+                "object": "file",
+                "filename": stored.filename,
+                "bytes": stored.size,
+                "created_at": int(stored.created)
+            }
+
+        @app.delete("/v1/files/{file_id}")
+        async def delete_file(http_request: Request, file_id: str):
+            owner = self._owner(http_request, file_id)
+            if owner is not None:
+                return await self._forward(http_request, owner)
+            if not self.files.delete(file_id):
+                raise HTTPException(status_code=404, detail=f"File {file_id} not found")
+            return {"id": file_id, "object": "file", "deleted": True}
+
+        if self.jobs is not None:
+            @app.post("/v1/runs", status_code=202)
+            async def create_run(request: RunCreateRequest):
+                """
+                Queue an agent run in the background. Poll it with GET
+                /v1/runs/{id}, or pass `webhook_url` to receive the finished
+                run with a POST.
+                """
+                try:
+                    priority = Priority((request.priority or Priority.BATCH.value).lower())
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"Unknown priority {request.priority}")
+                item = {
+                    "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
+                    "conversation_id": request.conversation_id,
+                    "attachments": request.attachments,
+                }
+                try:
+                    job = await asyncio.to_thread(
+                        self.jobs.submit, item, priority, request.webhook_url, request.metadata
+                    )
+                except QueueFull as e:
+                    raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "60"})
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                return JSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/v1/runs/{job.id}"})
+
+            @app.get("/v1/runs/{run_id}")
+            async def get_run(run_id: str, after: int = -1, limit: int = 1000):
+                """
+                Status of a background run and its events with sequence
+                numbers above `after`; pass the last `seq` seen to poll for more.
+                """
+                job = await asyncio.to_thread(self.jobs.get, run_id)
+                if job is None:
+                    raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+                events = await asyncio.to_thread(self.jobs.events, run_id, after, max(1, min(limit, 1000)))
+                body = job.to_dict()
+                body["events"] = events
+                body["last_seq"] = events[-1]["seq"] if events else after
+                return body
+
+            @app.post("/v1/runs/{run_id}/cancel")
+            async def cancel_run(run_id: str):
+                job = await asyncio.to_thread(self.jobs.cancel, run_id)
+                if job is None:
+                    raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+                return job.to_dict()
+
+        @app.get("/v1/admission")
+        async def admission_stats():
+            """
+            Concurrency, queue depth and queue wait statistics of the admission
+            controller, the number of runs shared by identical requests, and the state of the LLM rate limiter if one is configured
+            """
+            stats = self.admission.stats()
+            stats["runs"] = self.runs.stats()
+            if self.jobs is not None:
+                stats["background_runs"] = self.jobs.stats()
+            rate_limiter = getattr(self.agent.cognitive_engine, "rate_limiter", None)
+            if rate_limiter is not None:
+                stats["rate_limiter"] = rate_limiter.stats()
+            return stats
+
         @app.get("/health")
         async def health_check():
-            """Health check endpoint"""
-            return {"status": "healthy", "agent": self.agent.name if self.agent else "None"}
+            """Liveness: the process serves requests, warm or not"""
+            return {"status": "healthy", "agent": self.agent.cognitive_engine.name if self.agent else "None"}
+        
+        @app.get("/ready")
+        async def readiness_check():
+            """
+            Readiness: 200 once the warmup has finished, 503 until then, with
+            the warmup duration of each component
+            """
+            return JSONResponse(self.warmup.report(), status_code=200 if self.warmup.ready else 503)
         
         self.app = app
         return app
     
-    def start(self, host="0.0.0.0", port=8000):
-        """Start the server"""
+    def start(self, host="0.0.0.0", port=8000, workers=1, affinity=False):
+        """
+        Start the server, in `workers` processes forked from this one if more
+        than one. With `affinity`, requests that continue a conversation, resume
+        a run or use an upload are routed to the worker that holds it, and
+        background jobs run on the worker that holds their conversation.
+
+        Raises:
+            ValueError: If `workers` is more than one without `affinity`
+        """
         if self.app is None:
             self.setup_app()
         
-        logger.info(f"Starting agent server on {host}:{port}")
-        uvicorn.run(self.app, host=host, port=port)
+        if workers <= 1:
+            logger.info(f"Starting agent server on {host}:{port}")
+            uvicorn.run(self.app, host=host, port=port)
+            return
+        if not affinity:
+            # Every worker caches conversations; only routing keeps those caches coherent
+            raise ValueError("Serving from several workers requires affinity")
+        
+        # Build what the workers can share copy-on-write before forking, and leave
+        # no writes pending that every worker would inherit
+        self.agent.cognitive_engine.build_system_prompt(self.agent.toolkit)
+        if self.agent.conversations is not None:
+            self.agent.conversations.flush()
+        server = PreforkServer(self.app, host, port, workers, affinity)
+        ports = [server.worker_port(index) for index in range(workers)] if affinity else []
+        server.on_worker_start = lambda index: self._start_worker(index, workers, ports)
+        server.run()
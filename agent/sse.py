@@ -0,0 +1,74 @@
+import json
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps_string_json(text: str) -> bytes:
+    return encode_basestring_ascii(text).encode("ascii")
+
+
+def _dumps_json(obj: Any) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+
+# (string encoder, general encoder) per JSON backend; both return bytes
+BACKENDS: Dict[str, Tuple[Callable[[str], bytes], Callable[[Any], bytes]]] = {
+    "json": (_dumps_string_json, _dumps_json),
+}
+if orjson is not None:
+    BACKENDS["orjson"] = (orjson.dumps, orjson.dumps)
+DEFAULT_BACKEND = "orjson" if orjson is not None else "json"
+
+
+class SSEEncoder:
+    """
+    Encodes OpenAI-style chat completion chunks as server-sent event frames.
+
+    Every content frame has the same JSON around its delta string, so the
+    bytes before and after it are built once and only the delta is escaped
+    per frame; no intermediate dicts are created. orjson is used for
+    escaping when installed, otherwise the C string encoder of the standard
+    json module.
+    """
+
+    DONE = b"data: [DONE]\n\n"
+
+    def __init__(self, index: int = 0, backend: str = DEFAULT_BACKEND):
+        self._dumps_string, self._dumps = BACKENDS[backend]
+        self._content_prefix = f'data: {{"choices": [{{"index": {index}, "delta": {{"content": '.encode()
+        self._suffixes = {
+            None: b'}, "finish_reason": null}]}\n\n',
+            "stop": b'}, "finish_reason": "stop"}]}\n\n',
+        }
+        self._role_frames = {}
+        self.index = index
+
+    def content(self, text: str, finish_reason: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+        """Frame carrying a content delta, with an `id` field if `event_id` is given."""
+        suffix = self._suffixes.get(finish_reason)
+        if suffix is None:
+            suffix = self._suffixes[finish_reason] = (
+                b'}, "finish_reason": ' + self._dumps_string(finish_reason) + b'}]}\n\n'
+            )
+        frame = self._content_prefix + self._dumps_string(text) + suffix
+        if event_id is not None:
+            return b"id: " + event_id.encode("utf-8") + b"\n" + frame
+        return frame
+
+    def role(self, role: str = "assistant") -> bytes:
+        """Opening frame announcing the role of the streamed message."""
+        frame = self._role_frames.get(role)
+        if frame is None:
+            frame = self._role_frames[role] = self.event(
+                {"choices": [{"index": self.index, "delta": {"role": role}, "finish_reason": None}]}
+            )
+        return frame
+
+    def event(self, payload: Any) -> bytes:
+        """Frame carrying an arbitrary JSON payload."""
+        return b"data: " + self._dumps(payload) + b"\n\n"
@@ -0,0 +1,43 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict
+
+
+class StageTimer:
+    """Records wall-clock durations of named stages; safe to use from several threads."""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._timings[name] = self._timings.get(name, 0.0) + seconds
+
+    def mark(self, name: str) -> None:
+        """Record the time elapsed since the timer was created."""
+        self.record(name, time.perf_counter() - self._start)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: str, func: Callable) -> Callable:
+        """Wrap `func` so each call is recorded as stage `name`."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds."""
+        with self._lock:
+            return {name: round(seconds * 1000, 2) for name, seconds in self._timings.items()}
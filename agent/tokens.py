@@ -0,0 +1,16 @@
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count of a text. Uses the common ~4 characters per token
+    heuristic, which avoids a tokenizer dependency and is close enough for
+    budgeting prompt sections.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text so that its estimated token count fits in `max_tokens`."""
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars]
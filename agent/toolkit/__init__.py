@@ -1,7 +1,10 @@
-from typing import Dict, Any, Generator
+from typing import Dict, Any, Generator, Optional
+from agent.cancellation import CancellationToken
 from .config import ToolkitConfig
 from .tool import BaseTool
 from .executor import PythonCodeExecutor
+from .stream import ToolOutput, ToolOutputOp, as_op
+from .cache import ToolResultCache
 import json
 
 class Toolkit:
@@ -17,33 +20,86 @@ class Toolkit:
         if self.code_executor:
             self.tools[self.code_executor.id] = self.code_executor
 
-    def invoke(self, tool_name: str, input: Dict[str, Any]) -> Dict[str, Any]:
+    @property
+    def has_side_effects(self) -> bool:
+        """
+        Returns whether any tool may change external state, in which case
+        identical requests must each run on their own.
+        """
+        return any(tool.side_effects for tool in self.tools.values())
+
+    def warmup(self) -> None:
+        """Warm up every tool of the toolkit."""
+        for tool in self.tools.values():
+            tool.warmup()
+
+    def invoke(self, tool_name: str, input: Dict[str, Any], cache: Optional[ToolResultCache] = None) -> Dict[str, Any]:
         """
         Synchronously invoke a tool and return the complete result.
+        A result found in `cache` is returned without running the tool.
+        Tools with side effects always run.
         """
         tool = self.tools.get(tool_name)
+        if tool.side_effects:
+            cache = None
 
-        return tool.invoke(**input)
+        if cache is not None:
+            hit, result = cache.get(tool_name, input)
+            if hit:
+                return result
+        result = tool.invoke(**input)
+        if cache is not None:
+            cache.put(tool_name, input, result)
+        return result
             
-    def invoke_stream(self, tool_name: str, input: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
+    def invoke_stream(
+        self,
+        tool_name: str,
+        input: Dict[str, Any],
+        cancellation: Optional[CancellationToken] = None,
+        cache: Optional[ToolResultCache] = None
+    ) -> Generator[Any, None, None]:
         """
         Invoke a tool with streaming support, yielding partial results as they become available.
         
         Args:
             tool_name: Name of the tool to invoke
             input: Arguments to pass to the tool
+            cancellation: Optional token that stops the tool when the request is cancelled
+            cache: Optional cache of completed results; a cached result is
+                yielded as a single operation replacing the whole output.
+                Tools with side effects always run
             
         Yields:
-            Partial results from the tool as they become available
+            Partial results from the tool as they become available, usually `ToolOutputOp`s
             
         Raises:
             ValueError: If the tool is not found
         """
         tool = self.tools.get(tool_name)
+        if tool.side_effects:
+            cache = None
+        if cache is not None:
+            hit, result = cache.get(tool_name, input)
+            if hit:
+                yield ToolOutputOp.replace("", result)
+                return
         if tool.supports_streaming:
-            yield from tool.invoke_stream(**input)
+            if cache is None:
+                yield from tool.invoke_stream(cancellation, **input)
+                return
+            output = ToolOutput()
+            for item in tool.invoke_stream(cancellation, **input):
+                op = as_op(item)
+                output.apply(op)
+                yield op
+            # A cancelled run ends early with partial output, which must not be reused
+            if cancellation is None or not cancellation.cancelled:
+                cache.put(tool_name, input, output.value())
         else:
             result = tool.invoke(**input)
+            if cache is not None:
+                cache.put(tool_name, input, result)
             yield result
             
     def supports_streaming(self, tool_name: str) -> bool:
@@ -0,0 +1,50 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+class ToolResultCache:
+    """
+    Thread-safe LRU cache of completed tool results keyed by tool name and
+    input, shared by the runs of one batch so that identical tool calls made
+    by many items (listing namespaces, reading cluster state) run once.
+
+    Only calls that completed without raising are stored. Identical calls
+    that start at the same time may both run.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(tool_name: str, input: Dict[str, Any]) -> str:
+        return tool_name + "\0" + json.dumps(input, sort_keys=True, default=str)
+
+    def get(self, tool_name: str, input: Dict[str, Any]) -> Tuple[bool, Any]:
+        """(True, result) for a cached call, else (False, None)."""
+        key = self.key(tool_name, input)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key]
+
+    def put(self, tool_name: str, input: Dict[str, Any], result: Any) -> None:
+        if self.max_size <= 0:
+            return
+        key = self.key(tool_name, input)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -42,6 +42,13 @@ class PythonCodeExecutorConfig(BaseModel):
         default_factory=list,
         description="List of volume configurations"
     )
+    side_effects: bool = Field(
+        default=True,
+        description=(
+            "Whether the executed code may change external state (e.g. modify cluster resources). "
+            "Only set to False when the executor can only read, e.g. with read-only credentials"
+        )
+    )
 
 
 class ToolkitConfig(BaseModel):
@@ -1,10 +1,36 @@
-import io
-import contextlib
-import traceback
+import codecs
+import os
+import selectors
+import subprocess
+import sys
+import time
 from pydantic import BaseModel
-from typing import Optional, Type, Dict, Any
+from typing import Optional, Type, Dict, Any, Generator
 from .tool import BaseTool
 from .config import PythonCodeExecutorConfig
+from .stream import ToolOutputOp, collect_output
+from agent.cancellation import CancellationToken
+
+# Runs the code read from stdin with REPL semantics in the child process
+_RUNNER = """
+import sys, traceback
+code = sys.stdin.read()
+try:
+    compiled = compile(code, "<string>", "eval")
+except SyntaxError:
+    compiled = None
+try:
+    if compiled is None:
+        exec(compile(code, "<string>", "exec"), {})
+    else:
+        result = eval(compiled, {})
+        if result is not None:
+            print(repr(result))
+except Exception:
+    traceback.print_exc()
+"""
+
+_READ_SIZE = 65536
 
 class PythonCodeExecutionInput(BaseModel):
     code: str
@@ -18,44 +44,77 @@ class PythonCodeExecutor(BaseTool):
     def __init__(self, config: PythonCodeExecutorConfig):
         self.config = config
         super().__init__(self.config.id)
+        self._supports_streaming = True
+        self._side_effects = self.config.side_effects
 
     def _invoke(self, inputs: PythonCodeExecutionInput) -> dict:
         """
-        Attempt to mimic REPL behavior:
+        Run the code to completion and return the captured stdout and stderr.
+        """
+        return PythonCodeExecutionResponse(**collect_output(self._invoke_stream(inputs))).model_dump()
+
+    def _invoke_stream(
+        self,
+        inputs: PythonCodeExecutionInput,
+        cancellation: Optional[CancellationToken] = None
+    ) -> Generator[ToolOutputOp, None, None]:
+        """
+        Attempt to mimic REPL behavior in a separate Python process:
         - If the provided code is a single expression, evaluate it (using eval)
             and print its repr (if non-None).
         - Otherwise, execute it as a script (using exec).
-        Standard output and standard error are captured and returned.
+        Standard output and standard error are streamed as append operations
+        on the `output` and `error` fields while the code runs. The process is
+        killed once `timeout` seconds have passed, the consumer stops reading
+        or the request is cancelled.
         """
-        code = inputs.code
-        
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
+        yield ToolOutputOp.replace("", {"output": "", "error": ""})
 
-        # Redirect stdout/stderr to capture prints and errors.
-        with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(stderr_buffer):
-            try:
-                # First try compiling the code as an expression.
-                compiled_expr = compile(code, "<string>", "eval")
-                result = eval(compiled_expr, {})
-                if result is not None:
-                    print(repr(result))
-            except SyntaxError:
-                # Not a single expression—treat code as a series of statements.
-                try:
-                    compiled_code = compile(code, "<string>", "exec")
-                    exec(compiled_code, {})
-                except Exception:
-                    traceback.print_exc()  # Print any errors to stderr
-            except Exception:
-                traceback.print_exc()  # Print errors from eval to stderr
-
-        response = PythonCodeExecutionResponse(
-            output=stdout_buffer.getvalue(),
-            error=stderr_buffer.getvalue()
+        process = subprocess.Popen(
+            [sys.executable, "-u", "-c", _RUNNER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
         )
-        
-        return response.model_dump()
+        unregister = cancellation.register(process.kill) if cancellation else None
+        try:
+            process.stdin.write(inputs.code.encode("utf-8"))
+            process.stdin.close()
+
+            streams = {process.stdout.fileno(): "output", process.stderr.fileno(): "error"}
+            decoders = {fd: codecs.getincrementaldecoder("utf-8")(errors="replace") for fd in streams}
+            deadline = time.monotonic() + inputs.timeout if inputs.timeout else None
+            with selectors.DefaultSelector() as selector:
+                for fd in streams:
+                    selector.register(fd, selectors.EVENT_READ)
+                while selector.get_map():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        process.kill()
+                        yield ToolOutputOp.append("error", f"Execution timed out after {inputs.timeout} seconds\n")
+                        break
+                    for key, _ in selector.select(remaining):
+                        data = os.read(key.fd, _READ_SIZE)
+                        if not data:
+                            selector.unregister(key.fd)
+                        text = decoders[key.fd].decode(data, final=not data)
+                        if text:
+                            yield ToolOutputOp.append(streams[key.fd], text)
+        finally:
+            if unregister:
+                unregister()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def warmup(self) -> None:
+        """
+        Run an empty program once, so that the interpreter and the modules the
+        runner imports are in the page cache before the first real execution.
+        """
+        collect_output(self._invoke_stream(PythonCodeExecutionInput(code="pass")))
 
     @property
     def description(self) -> str:
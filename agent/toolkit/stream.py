@@ -0,0 +1,102 @@
+import json
+from typing import Any, Dict, Iterable, List
+
+
+class ToolOutputOp:
+    """
+    One incremental change to the output of a streaming tool.
+
+    Streaming tools describe their output as a sequence of operations instead
+    of repeated snapshots, in the spirit of JSON Patch: `append` extends a
+    string field with new text and `replace` sets a field to a value. `path`
+    names a top-level field of the output object, or the whole output when
+    empty. Each operation is serialized once and forwarded to clients as is,
+    so streaming a large output costs time proportional to the new bytes only.
+    """
+    __slots__ = ("op", "path", "value")
+
+    APPEND = "append"
+    REPLACE = "replace"
+
+    def __init__(self, op: str, path: str, value: Any):
+        if op not in (self.APPEND, self.REPLACE):
+            raise ValueError(f"Unknown tool output operation: {op}")
+        self.op = op
+        self.path = path
+        self.value = value
+
+    @classmethod
+    def append(cls, path: str, text: str) -> "ToolOutputOp":
+        return cls(cls.APPEND, path, text)
+
+    @classmethod
+    def replace(cls, path: str, value: Any) -> "ToolOutputOp":
+        return cls(cls.REPLACE, path, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"op": self.op, "path": self.path, "value": self.value}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"ToolOutputOp(op={self.op!r}, path={self.path!r}, value={self.value!r})"
+
+
+def as_op(item: Any) -> ToolOutputOp:
+    """
+    Operation for an item yielded by a streaming tool. Tools that yield plain
+    values instead of operations are treated as replacing the whole output.
+    """
+    return item if isinstance(item, ToolOutputOp) else ToolOutputOp.replace("", item)
+
+
+class ToolOutput:
+    """
+    Applies `ToolOutputOp`s to rebuild the complete output of a streaming
+    tool. Appended text is kept as a list of parts and joined once in
+    `value`, so accumulating a long output is linear in its size.
+    """
+
+    def __init__(self):
+        self._value: Any = {}
+        self._parts: Dict[str, List[str]] = {}
+
+    def apply(self, op: ToolOutputOp) -> None:
+        if op.op == ToolOutputOp.REPLACE:
+            if op.path:
+                self._object()[op.path] = op.value
+                self._parts.pop(op.path, None)
+            else:
+                self._value = op.value
+                self._parts.clear()
+            return
+        parts = self._parts.get(op.path)
+        if parts is None:
+            current = self._object().get(op.path) if op.path else self._value
+            parts = self._parts[op.path] = [current] if isinstance(current, str) else []
+        parts.append(op.value)
+
+    def value(self) -> Any:
+        """The output with every operation applied so far."""
+        if "" in self._parts:
+            return "".join(self._parts[""])
+        if not self._parts:
+            return self._value
+        value = dict(self._object())
+        for path, parts in self._parts.items():
+            value[path] = "".join(parts)
+        return value
+
+    def _object(self) -> Dict[str, Any]:
+        if not isinstance(self._value, dict):
+            raise ValueError("Field operations require the tool output to be an object")
+        return self._value
+
+
+def collect_output(items: Iterable[Any]) -> Any:
+    """Complete output of a tool stream, for callers that do not stream."""
+    output = ToolOutput()
+    for item in items:
+        output.apply(as_op(item))
+    return output.value()
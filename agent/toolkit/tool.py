@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Type, Generator, Union, Optional
 from pydantic import BaseModel
+from agent.cancellation import CancellationToken
 
 class JSONSerializationError(Exception):
     pass
@@ -15,10 +16,21 @@ class BaseTool(ABC):
     def __init__(self, id: str) -> None:
         self._id = id
         self._supports_streaming = False
+        self._side_effects = False
 
     @property
     def id(self) -> str:
         return self._id
+
+    @property
+    def side_effects(self) -> bool:
+        """
+        Returns whether invoking this tool may change external state. Results
+        of such tools are never cached or shared between requests. Tools that
+        can run arbitrary code or mutate resources must set `_side_effects`;
+        only read-only tools may leave it False.
+        """
+        return self._side_effects
         
     @property
     def supports_streaming(self) -> bool:
@@ -65,26 +77,38 @@ class BaseTool(ABC):
         """
         pass
         
-    def _invoke_stream(self, inputs: BaseModel) -> Generator[Dict[str, Any], None, None]:
+    def _invoke_stream(self, inputs: BaseModel, cancellation: Optional[CancellationToken] = None) -> Generator[Any, None, None]:
         """
         Default implementation for tools that don't support streaming.
         Simply wraps the synchronous _invoke method and yields the result once.
+
+        Streaming tools override this to yield `ToolOutputOp`s describing
+        their output incrementally, e.g. appending new stdout text. Any other
+        value yielded replaces the whole output. Tools that block should
+        register a callback on `cancellation` that stops the work early.
         """
         result = self._invoke(inputs)
         yield result
 
+    def warmup(self) -> None:
+        """
+        Prepare for the first invocation ahead of time, e.g. load client
+        configuration or open connections. Called once when the server starts.
+        """
+        pass
+
     def invoke(self, **kwargs) -> Any:
         """
         Synchronously invoke the tool and return the complete result.
         """
         return self._invoke(self.input_model(**kwargs))
         
-    def invoke_stream(self, **kwargs) -> Generator[Dict[str, Any], None, None]:
+    def invoke_stream(self, cancellation: Optional[CancellationToken] = None, **kwargs) -> Generator[Any, None, None]:
         """
         Invoke the tool with streaming, yielding partial results as they become available.
         """
         input_obj = self.input_model(**kwargs)
-        yield from self._invoke_stream(input_obj)
+        yield from self._invoke_stream(input_obj, cancellation)
     
     @property
     def info(self) -> Dict[str, Any]:
@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from agent.logger import logger
+
+
+def prestart(executor: ThreadPoolExecutor, timeout: float = 5.0) -> None:
+    """
+    Start all threads of `executor` now rather than on its first submits.
+    Each task waits for the others, so the pool cannot reuse an idle thread.
+    """
+    workers = executor._max_workers
+    barrier = threading.Barrier(workers)
+
+    def wait():
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            pass
+
+    for future in [executor.submit(wait) for _ in range(workers)]:
+        future.result()
+
+
+class Warmup:
+    """
+    Runs the warmup steps of a server's components once, in order, and
+    reports how long each took. Until it is done the server is not ready:
+    the first requests would otherwise pay for opening connections,
+    compiling templates and paging in the vector index.
+
+    A failing step is logged and reported but does not hold readiness back;
+    the component then initializes lazily on first use, as it would without
+    a warmup.
+    """
+
+    def __init__(self, steps: Dict[str, Callable[[], Any]]):
+        """
+        Args:
+            steps: Warmup callables by component name, run in insertion order
+        """
+        self.steps = steps
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._components: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.finished is not None
+
+    def run(self) -> None:
+        """Run the steps on the calling thread."""
+        self.started = time.perf_counter()
+        for name, step in self.steps.items():
+            start = time.perf_counter()
+            result = {"status": "ok"}
+            try:
+                step()
+            except Exception as e:
+                logger.warning(f"Warmup of {name} failed: {str(e)}")
+                result = {"status": "failed", "error": str(e)}
+            result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self._components[name] = result
+        self.finished = time.perf_counter()
+        logger.info(f"Warmup finished in {self.report()['duration_ms']} ms")
+
+    def report(self) -> Dict[str, Any]:
+        """Readiness and the per-component warmup durations in milliseconds."""
+        if self.started is None:
+            status, duration = "pending", 0.0
+        else:
+            status = "ready" if self.ready else "warming_up"
+            duration = (self.finished or time.perf_counter()) - self.started
+        return {
+            "status": status,
+            "duration_ms": round(duration * 1000, 2),
+            "components": dict(self._components),
+        }
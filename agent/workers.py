@@ -0,0 +1,196 @@
+import gc
+import hashlib
+import os
+import signal
+import socket
+import time
+import weakref
+from typing import Callable, Dict, List, Optional
+from agent.logger import logger
+
+# Interface of the per-worker ports, which only the other workers connect to
+LOOPBACK = "127.0.0.1"
+
+
+def register_after_fork(obj) -> None:
+    """
+    Call `obj._after_fork()` in the child process after every fork, for as
+    long as `obj` is alive. Objects use it to drop state that does not
+    survive a fork: threads, thread pools, locks and database connections.
+    """
+    if not hasattr(os, "register_at_fork"):
+        return
+    ref = weakref.ref(obj)
+
+    def reinit():
+        target = ref()
+        if target is not None:
+            target._after_fork()
+
+    os.register_at_fork(after_in_child=reinit)
+
+
+class Affinity:
+    """
+    Assigns conversations, runs and uploads to the worker processes that
+    keep them in local memory, by a stable hash of their ids. Ids created
+    by a worker are drawn until the worker owns them, so later requests
+    that refer to them can be routed back to it.
+    """
+
+    def __init__(self, index: int, workers: int):
+        self.index = index
+        self.workers = workers
+
+    def owner(self, key: str) -> int:
+        """Index of the worker that owns `key`, stable across processes and restarts."""
+        return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") % self.workers
+
+    def owns(self, key: str) -> bool:
+        return self.owner(key) == self.index
+
+    def new_id(self, new_id: Callable[[], str]) -> str:
+        """A fresh id from `new_id` that this worker owns."""
+        while True:
+            candidate = new_id()
+            if self.owns(candidate):
+                return candidate
+
+
+def _listen(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """
+    Serves an ASGI app from several worker processes forked from a parent
+    that has already built the expensive state: the agent with its loaded
+    vector index, compiled prompt templates and caches.
+
+    The parent binds the listening socket, freezes the garbage collector so
+    that collections in the workers do not write to (and thereby copy) the
+    inherited objects, and forks. Memory-mapped indexes and every object
+    built before the fork are shared copy-on-write; objects registered with
+    `register_after_fork` recreate their threads, pools, locks and
+    connections in each worker. The kernel spreads connections over the
+    workers, and the parent restarts workers that die.
+
+    With `affinity` each worker also listens on its own port,
+    `port + 1 + index`, so that requests for state held in a worker's local
+    caches can be routed to the worker that owns it (see `Affinity`). These
+    ports only take connections from the other workers and are bound to the
+    loopback interface whatever `host` is.
+    """
+
+    def __init__(
+        self,
+        app,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        affinity: bool = False,
+        on_worker_start: Optional[Callable[[int], None]] = None,
+        restart_delay: float = 1.0
+    ):
+        """
+        Args:
+            app: The ASGI application
+            host: Host to bind to
+            port: Shared port of all workers
+            workers: Number of worker processes
+            affinity: Whether every worker also listens on its own port
+            on_worker_start: Called with the worker index in each worker before it serves
+            restart_delay: Seconds to wait before restarting a worker that died
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.affinity = affinity
+        self.on_worker_start = on_worker_start
+        self.restart_delay = restart_delay
+        self._children: Dict[int, int] = {}
+        self._stopping = False
+
+    def worker_port(self, index: int) -> int:
+        return self.port + 1 + index
+
+    def run(self) -> None:
+        """Fork the workers and supervise them until SIGINT or SIGTERM."""
+        shared = _listen(self.host, self.port)
+        own: List[Optional[socket.socket]] = [
+            _listen(LOOPBACK, self.worker_port(index)) if self.affinity else None for index in range(self.workers)
+        ]
+        logger.info(f"Starting {self.workers} workers on {self.host}:{self.port}")
+        gc.collect()
+        gc.freeze()
+        previous = {sig: signal.signal(sig, self._stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            for index in range(self.workers):
+                self._spawn(index, shared, own)
+            while self._children:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                index = self._children.pop(pid, None)
+                if index is None or self._stopping:
+                    continue
+                logger.error(f"Worker {index} (pid {pid}) exited with status {status}, restarting it")
+                time.sleep(self.restart_delay)
+                if not self._stopping:
+                    self._spawn(index, shared, own)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            shared.close()
+            for sock in own:
+                if sock is not None:
+                    sock.close()
+            gc.unfreeze()
+
+    def _stop(self, signum, frame) -> None:
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info("Stopping workers")
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, index: int, shared: socket.socket, own: List[Optional[socket.socket]]) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = index
+            return
+        # Worker process: never returns into the supervisor loop
+        code = 0
+        try:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            sockets = [shared]
+            for other, sock in enumerate(own):
+                if sock is not None and other != index:
+                    sock.close()
+            if own[index] is not None:
+                sockets.append(own[index])
+            if self.on_worker_start is not None:
+                self.on_worker_start(index)
+            logger.info(f"Worker {index} serving (pid {os.getpid()})")
+            import uvicorn
+            uvicorn.Server(uvicorn.Config(self.app)).run(sockets=sockets)
+        except BaseException as e:
+            logger.error(f"Worker {index} failed: {str(e)}")
+            code = 1
+        finally:
+            os._exit(code)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark recall and search cost of reduced-dimension embeddings.
+
+Takes full-dimensional embeddings (a .npy file dumped from a real provider, or
+synthetic vectors with decaying variance per component), computes exact
+top-k neighbours at full dimension, then reports recall@k, queries per
+second and vector memory after truncation and after PCA to each target
+dimension.
+
+Usage:
+    python benchmarks/embedding_dimensions.py --embeddings corpus.npy --dimensions 256 512 768
+    python benchmarks/embedding_dimensions.py --num-vectors 50000 --dimension 1536
+"""
+
+import argparse
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.retriever.embeddings import BaseEmbeddingProvider, ReducedEmbeddingProvider
+from providers.vector_dbs.local import LocalVectorDB
+from benchmarks.vector_search import run_queries, recall_at_k
+
+
+class PrecomputedEmbeddingProvider(BaseEmbeddingProvider):
+    """Stands in for a real provider; the benchmark only uses its dimension."""
+
+    def embed_text(self, text):
+        raise NotImplementedError
+
+
+def make_embeddings(num_vectors: int, dimension: int, rng: np.random.Generator) -> np.ndarray:
+    """Vectors whose variance decays across components, like real embedding spectra."""
+    scales = 1.0 / np.sqrt(np.arange(1, dimension + 1, dtype=np.float32))
+    return rng.standard_normal((num_vectors, dimension)).astype(np.float32) * scales
+
+
+def build(vectors: np.ndarray) -> LocalVectorDB:
+    db = LocalVectorDB(dimension=vectors.shape[1], index_type="flat", score_threshold=-1.0)
+    db.add_vectors([(vector, {"id": i, "source": str(i)}) for i, vector in enumerate(vectors)])
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default=None, help=".npy file of shape (n, d); synthetic data if omitted")
+    parser.add_argument("--num-vectors", type=int, default=20_000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 768, 1024])
+    parser.add_argument("--methods", nargs="+", choices=ReducedEmbeddingProvider.supported_methods,
+                        default=ReducedEmbeddingProvider.supported_methods)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.embeddings:
+        corpus = np.load(args.embeddings).astype(np.float32)
+    else:
+        corpus = make_embeddings(args.num_vectors, args.dimension, rng)
+    picks = rng.choice(len(corpus), args.num_queries, replace=False)
+    queries = corpus[picks] + 0.05 * corpus.std() * rng.standard_normal((args.num_queries, corpus.shape[1])).astype(np.float32)
+
+    full = build(corpus)
+    ground_truth, full_qps = run_queries(full, queries, args.top_k)
+    full_memory = full.memory_footprint()["vectors"]
+    print(f"full   d={corpus.shape[1]:<5} recall@{args.top_k}=1.000  qps={full_qps:9.1f}  "
+          f"vectors={full_memory / 2**20:7.1f}MiB")
+
+    base = PrecomputedEmbeddingProvider(dimension=corpus.shape[1])
+    for method in args.methods:
+        for dimension in args.dimensions:
+            if dimension > corpus.shape[1]:
+                continue
+            reducer = ReducedEmbeddingProvider(base, dimension, method=method)
+            if method == "pca":
+                reducer.fit(corpus)
+            db = build(reducer.reduce(corpus))
+            results, qps = run_queries(db, reducer.reduce(queries), args.top_k)
+            memory = db.memory_footprint()["vectors"]
+            print(f"{method:<8} d={dimension:<5} recall@{args.top_k}={recall_at_k(results, ground_truth):.3f}  "
+                  f"qps={qps:9.1f}  speedup={qps / full_qps:4.1f}x  "
+                  f"vectors={memory / 2**20:7.1f}MiB  ({full_memory / memory:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
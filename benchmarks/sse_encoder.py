@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark SSE frame encoding for streamed chat completion chunks.
+
+Compares the original per-chunk dict + json.dumps + f-string encoding with
+SSEEncoder using the standard library string encoder and, when installed,
+orjson. Reports frames per second on one core for typical token-sized
+deltas and for longer tool output deltas.
+
+Usage:
+    python benchmarks/sse_encoder.py --frames 200000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.sse import BACKENDS, SSEEncoder
+
+
+def baseline(content: str, finished: bool) -> bytes:
+    """Frame encoding as previously done in AgentServer.stream_response."""
+    delta_chunk = {
+        "choices": [{
+            "index": 0,
+            "delta": {"content": content},
+            "finish_reason": "stop" if finished else None
+        }]
+    }
+    return f"data: {json.dumps(delta_chunk)}\n\n".encode()
+
+
+def measure(encode, deltas, frames: int) -> float:
+    count = len(deltas)
+    start = time.perf_counter()
+    for i in range(frames):
+        encode(deltas[i % count], None)
+    return frames / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200_000)
+    args = parser.parse_args()
+
+    workloads = {
+        "token deltas": ["The", " pod", " web-7d9f", " is", " in", " CrashLoop", "BackOff", " because", "\n", " \"OOM\""],
+        "tool output": ['{"stdout": "NAME   READY   STATUS\\nweb-1   1/1   Running\\n", "finished": false}' * 4],
+    }
+
+    encoders = [("json.dumps baseline", lambda text, reason: baseline(text, reason == "stop"))]
+    encoders.extend((f"SSEEncoder ({backend})", SSEEncoder(backend=backend).content) for backend in BACKENDS)
+
+    for name, deltas in workloads.items():
+        base_rate = None
+        print(f"{name}:")
+        for label, encode in encoders:
+            rate = measure(encode, deltas, args.frames)
+            base_rate = base_rate or rate
+            print(f"  {label:<22} {rate:12,.0f} frames/s  {rate / base_rate:5.1f}x")
+        # The standard library backend produces byte-identical frames
+        assert baseline(deltas[0], False) == SSEEncoder(backend="json").content(deltas[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+Benchmark cold start of the agent server.
+
+Reports the time to import main.py in a fresh interpreter (median of several
+runs) and, for a server started from scratch in a child process, the time
+until it accepts connections, until its first chat completion streams an
+answer and until /ready reports the warmup done. The child uses main.py's
+agent configuration with a canned LLM provider, so no credentials or network
+are needed and only startup costs are measured.
+
+With thresholds the exit status is 1 when one is exceeded, so that cold-start
+regressions fail CI. --profile lists the imports that cost the most.
+
+Usage:
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --max-import-ms 600 --max-first-response-ms 3000 --json
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agent.cognitive_engine.llm import BaseLLMProvider
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+class CannedLLMProvider(BaseLLMProvider):
+    """Answers at once, so that only the server's own startup is measured."""
+    supports_streaming = True
+    response = "<thinking>\nNothing to look up.\n</thinking>\n<answer>\nReady.\n</answer>"
+
+    def generate_response(self, messages, *args, **kwargs):
+        return self.response
+
+    def stream_response(self, messages, *args, **kwargs):
+        yield from self.response.splitlines(keepends=True)
+
+
+def measure_import(runs: int) -> List[float]:
+    """Seconds to import main.py, each in a fresh interpreter."""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def import_times(code: str) -> Dict[str, float]:
+    """Cumulative milliseconds per top-level package imported by `code` in a fresh interpreter."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        # Cumulative times nest; the outermost entry of a package covers the rest
+        packages[package] = max(packages.get(package, 0.0), int(cumulative) / 1000)
+    return packages
+
+
+def profile_imports(top: int) -> List[Dict[str, float]]:
+    """
+    The `top` dependencies that main.py imports with the highest cumulative
+    import time. Packages a bare interpreter loads at startup are left out,
+    as are the repo's own, whose times include their dependencies.
+    """
+    startup = import_times("pass")
+    packages = import_times("import main")
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [
+        {"package": package, "ms": round(ms, 1)} for package, ms in ranked
+        if package not in startup and package not in ("main", "agent", "providers")
+    ][:top]
+
+
+def serve(port: int) -> None:
+    """Child process: start the server with main.py's agent and a canned LLM provider."""
+    os.environ["LLM_PROVIDER"] = "canned"
+    import main
+    from providers import register_provider
+
+    register_provider("llm", "canned", f"{__name__}:CannedLLMProvider")
+    agent = main.create_agent()
+    agent.start_server(host="127.0.0.1", port=port)
+
+
+def wait_until(check, deadline: float, interval: float = 0.01) -> Optional[float]:
+    """Poll `check` until it returns true; the time it did, or None at the deadline."""
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return time.perf_counter()
+        except Exception:
+            pass
+        time.sleep(interval)
+    return None
+
+
+def measure_server(port: int, timeout: float) -> Dict[str, Optional[float]]:
+    """Milliseconds from spawning the server to listening, first streamed answer and readiness."""
+    import requests
+
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, CONVERSATION_DB=os.path.join(data_dir, "conversations.db"))
+        start = time.perf_counter()
+        child = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = start + timeout
+        try:
+            listening = wait_until(lambda: requests.get(f"{base}/health", timeout=1).ok, deadline)
+            first_response = None
+            if listening is not None:
+                with requests.post(
+                    f"{base}/v1/chat/completions",
+                    json={"messages": [{"role": "user", "content": "Are you up?"}], "stream": True, "coalesce": False},
+                    stream=True,
+                    timeout=timeout
+                ) as response:
+                    for line in response.iter_lines():
+                        if b'"content"' in line:
+                            first_response = time.perf_counter()
+                            break
+            ready = wait_until(lambda: requests.get(f"{base}/ready", timeout=1).status_code == 200, deadline)
+        finally:
+            child.send_signal(signal.SIGTERM)
+            try:
+                child.wait(10)
+            except subprocess.TimeoutExpired:
+                child.kill()
+
+    def since_start(moment: Optional[float]) -> Optional[float]:
+        return None if moment is None else round((moment - start) * 1000, 1)
+
+    return {
+        "listening_ms": since_start(listening),
+        "first_response_ms": since_start(first_response),
+        "ready_ms": since_start(ready),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time the import in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server")
+    parser.add_argument("--profile", type=int, default=10, metavar="N", help="Show the N most expensive imports")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-first-response-ms", type=float, help="Fail if the first answer takes longer")
+    parser.add_argument("--max-ready-ms", type=float, help="Fail if readiness takes longer")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    imports = measure_import(max(1, args.runs))
+    results = {
+        "import_ms": round(statistics.median(imports) * 1000, 1),
+        "import_ms_min": round(min(imports) * 1000, 1),
+        **measure_server(args.port, args.timeout),
+        "top_imports": profile_imports(args.profile) if args.profile else [],
+    }
+
+    failures = []
+    for key, limit in (
+        ("import_ms", args.max_import_ms),
+        ("first_response_ms", args.max_first_response_ms),
+        ("ready_ms", args.max_ready_ms),
+    ):
+        if limit is not None and (results[key] is None or results[key] > limit):
+            failures.append(f"{key} {results[key]} exceeds {limit}")
+
+    if args.json:
+        print(json.dumps({**results, "failures": failures}, indent=2))
+    else:
+        print(f"import main:       {results['import_ms']:8.1f} ms median of {len(imports)} (min {results['import_ms_min']:.1f})")
+        for key, label in (("listening_ms", "listening"), ("first_response_ms", "first answer"), ("ready_ms", "ready")):
+            value = results[key]
+            print(f"{label + ':':18} {value:8.1f} ms after spawn" if value is not None else f"{label + ':':18}  timed out")
+        if results["top_imports"]:
+            print("most expensive imports (cumulative):")
+            for entry in results["top_imports"]:
+                print(f"  {entry['package']:24} {entry['ms']:8.1f} ms")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Benchmark approximate search in LocalVectorDB against exact search.
+
+Builds a synthetic clustered corpus, computes exact top-k neighbours with the
+flat index and reports recall@k and queries per second for each nprobe value,
+then the memory footprint and recall of each quantizer setting.
+
+Usage:
+    python benchmarks/vector_search.py --num-vectors 200000 --dimension 256 --nprobe 1 4 16 64
+    python benchmarks/vector_search.py --quantizer int8 pq --rerank-factor 0 4
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers.vector_dbs.local import LocalVectorDB
+from providers.vector_dbs.quantization import ScalarQuantizer, ProductQuantizer
+
+
+def make_corpus(num_vectors: int, dimension: int, num_clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian mixture data, closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((num_clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, num_vectors)
+    return centers[labels] + 0.3 * rng.standard_normal((num_vectors, dimension)).astype(np.float32)
+
+
+def run_queries(db: LocalVectorDB, queries: np.ndarray, top_k: int):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([hit['metadata']['id'] for hit in db.find_similar(query, top_k)])
+    elapsed = time.perf_counter() - start
+    return results, len(queries) / elapsed
+
+
+def recall_at_k(results, ground_truth) -> float:
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, ground_truth))
+    return hits / sum(len(expected) for expected in ground_truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--quantizer", nargs="*", choices=["int8", "pq"], default=[])
+    parser.add_argument("--pq-subspaces", type=int, default=32)
+    parser.add_argument("--rerank-factor", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    corpus = make_corpus(args.num_vectors, args.dimension, max(1, args.num_vectors // 500), rng)
+    queries = corpus[rng.choice(len(corpus), args.num_queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    data = [(vector, {"id": i, "source": str(i)}) for i, vector in enumerate(corpus)]
+
+    exact = LocalVectorDB(dimension=args.dimension, index_type="flat", score_threshold=-1.0)
+    exact.add_vectors(data)
+    ground_truth, exact_qps = run_queries(exact, queries, args.top_k)
+    print(f"exact      recall@{args.top_k}=1.000  qps={exact_qps:9.1f}  "
+          f"memory={exact.memory_footprint()['total'] / 2**20:8.1f}MiB")
+
+    ivf = LocalVectorDB(dimension=args.dimension, index_type="ivf", nlist=args.nlist, score_threshold=-1.0)
+    start = time.perf_counter()
+    ivf.add_vectors(data)
+    if not ivf.is_trained:
+        ivf.train()
+    print(f"ivf build  {time.perf_counter() - start:.2f}s")
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        results, qps = run_queries(ivf, queries, args.top_k)
+        print(f"nprobe={nprobe:<4} recall@{args.top_k}={recall_at_k(results, ground_truth):.3f}  "
+              f"qps={qps:9.1f}  speedup={qps / exact_qps:5.1f}x")
+
+    for name in args.quantizer:
+        quantizer = ScalarQuantizer() if name == "int8" else ProductQuantizer(num_subspaces=args.pq_subspaces)
+        for rerank_factor in args.rerank_factor:
+            quantized = LocalVectorDB(
+                dimension=args.dimension,
+                index_type="flat",
+                quantizer=quantizer,
+                rerank_factor=rerank_factor,
+                store_vectors=rerank_factor > 0,
+                score_threshold=-1.0
+            )
+            quantized.add_vectors(data)
+            results, qps = run_queries(quantized, queries, args.top_k)
+            footprint = quantized.memory_footprint()
+            print(f"{name:<5} rerank={rerank_factor:<2} recall@{args.top_k}={recall_at_k(results, ground_truth):.3f}  "
+                  f"qps={qps:9.1f}  vectors={footprint['vectors'] / 2**20:7.1f}MiB  "
+                  f"codes={footprint['codes'] / 2**20:7.1f}MiB  total={footprint['total'] / 2**20:7.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
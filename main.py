@@ -1,16 +1,47 @@
+import argparse
 import os
+import sys
 
 # Import agent components
 from agent.agent import Agent
 from agent.cognitive_engine import CognitiveEngine
+from agent.cognitive_engine.rate_limiter import RateLimiter
 from agent.retriever import Retriever
 from agent.toolkit import Toolkit
 from agent.toolkit.config import PythonCodeExecutorConfig
+from agent.conversation_store import SQLiteConversationStore
+from agent.admission import AdmissionController
+from agent.batch import dumps_result, run_batch
+from agent.runs import RunRegistry
+from agent.jobs import JobQueue, SQLiteJobStore
 
-# Import providers
-from providers.llm.azure_openai import AzureOpenAILLMProvider
-# from providers.llm.bedrock import BedrockLLMProvider
-from providers.embeddings.azure_openai import AzureOpenAIEmbeddingProvider
+# Providers are imported on first use, so only the configured one loads its SDK
+from providers import create_provider
+
+def create_llm_provider(name: str):
+    """
+    Create the LLM provider selected by the LLM_PROVIDER environment variable.
+    
+    Args:
+        name: "azure_openai", "bedrock", or another provider registered with
+            `providers.register_provider` that takes no arguments
+    """
+    if name == "azure_openai":
+        return create_provider(
+            "llm",
+            name,
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            deployment_name="gpt-4o-default"
+        )
+    if name == "bedrock":
+        return create_provider(
+            "llm",
+            "bedrock",
+            model_id=os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-7-sonnet-20250219-v1:0"),
+            region_name=os.getenv("AWS_REGION", "us-east-1")
+        )
+    return create_provider("llm", name)
 
 def create_agent():
     """
@@ -27,15 +58,12 @@ def create_agent():
         Try to do incremental steps and get to a good response and feel free to use the tools multiple times, the previous steps taken will be provided to you. 
         Keep your codes small and atomic and try to debug through multiple steps rather than one large block of code.
         """,
-        LLM_PROVIDER=AzureOpenAILLMProvider(
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            deployment_name="gpt-4o-default"
+        LLM_PROVIDER=create_llm_provider(os.getenv("LLM_PROVIDER", "azure_openai")),
+        # Share the deployment's quota so batch runs yield to interactive ones
+        RATE_LIMITER=RateLimiter(
+            requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")) or None,
+            tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "0")) or None
         ),
-        # LLM_PROVIDER=BedrockLLMProvider(
-        #     model_id="anthropic.claude-3-7-sonnet-20250219-v1:0",
-        #     region_name=os.getenv("AWS_REGION", "us-east-1")
-        # ),
         MAX_ITERATIONS=10,
         AGENT_NAME="Kubernetes Agent",
         AGENT_ROLE="You are an AI assistant that tries to help the user with their Kubernetes problems.",
@@ -57,30 +85,91 @@ def create_agent():
                 }
             },
             resource_requests={"cpu": "200m", "memory": "512Mi"},
-            resource_limits={"cpu": "200m", "memory": "512Mi"}
+            resource_limits={"cpu": "200m", "memory": "512Mi"},
+            # The code can change cluster resources, so runs are never shared and results never replayed
+            side_effects=True
         )
     )
 
     agent = Agent(
         cognitive_engine=cognitive_engine,
         retriever=None,
-        toolkit=toolkit
+        toolkit=toolkit,
+        conversation_store=SQLiteConversationStore(os.getenv("CONVERSATION_DB", "data/conversations.db"))
     )
     agent.setup()
     
     return agent
 
+def run_batch_file(agent, input_path: str, output_path: str = None, concurrency: int = 4):
+    """
+    Run a JSONL file of chat completion requests offline and write one
+    result line per item as it finishes, to `output_path` or stdout.
+    """
+    output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        with open(input_path, "r", encoding="utf-8") as lines:
+            for result in run_batch(agent, lines, concurrency=concurrency):
+                output.write(dumps_result(result))
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
 def main():
     """
     Main entry point for the application.
-    Creates the agent and starts the server.
+    Creates the agent and starts the server, or runs a batch file with
+    `python main.py batch requests.jsonl`.
     """
+    parser = argparse.ArgumentParser(description="Kubernetes agent")
+    commands = parser.add_subparsers(dest="command")
+    batch = commands.add_parser("batch", help="Run a JSONL file of chat completion requests")
+    batch.add_argument("input", help="JSONL file with one chat completion request per line")
+    batch.add_argument("-o", "--output", help="File to write the JSONL results to (default: stdout)")
+    batch.add_argument("--concurrency", type=int, default=4, help="Number of items to run at once")
+    args = parser.parse_args()
+    
     # Create and initialize agent
     agent = create_agent()
-    print("Agent initialized successfully")
+    print("Agent initialized successfully", file=sys.stderr)
+    
+    if args.command == "batch":
+        try:
+            run_batch_file(agent, args.input, args.output, args.concurrency)
+        finally:
+            agent.close()
+        return
     
-    # Start the server
-    agent.start_server(host="0.0.0.0", port=8000)
+    # Limit concurrent agent runs so traffic spikes queue briefly or get a 429
+    admission = AdmissionController(
+        MAX_CONCURRENT_RUNS=int(os.getenv("MAX_CONCURRENT_RUNS", "16")),
+        MAX_QUEUE_SIZE=int(os.getenv("MAX_QUEUE_SIZE", "64")),
+        QUEUE_TIMEOUT=float(os.getenv("QUEUE_TIMEOUT", "30")),
+        BATCH_MAX_CONCURRENT_RUNS=int(os.getenv("BATCH_MAX_CONCURRENT_RUNS", "0")) or None
+    )
+    
+    # Runs outlive a dropped stream for a grace period so clients can resume them
+    runs = RunRegistry(GRACE_PERIOD=float(os.getenv("RESUME_GRACE_PERIOD", "30")))
+    
+    # Long investigations run in the background from a persisted queue
+    jobs = JobQueue(
+        agent,
+        SQLiteJobStore(os.getenv("RUNS_DB", "data/runs.db")),
+        WORKERS=int(os.getenv("RUN_WORKERS", "4")),
+        WEBHOOK_SECRET=os.getenv("WEBHOOK_SECRET") or None
+    )
+    
+    # Start the server; with several workers the limits above apply per worker process
+    agent.start_server(
+        host="0.0.0.0",
+        port=8000,
+        admission=admission,
+        runs=runs,
+        jobs=jobs,
+        workers=int(os.getenv("SERVER_WORKERS", "1")),
+        affinity=os.getenv("WORKER_AFFINITY", "true").lower() == "true"
+    )
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+Provider implementations, registered by kind and name and imported on first
+use, so that a process only loads the SDKs of the providers it is configured
+with: boto3 for Bedrock, qdrant_client and its gRPC stack for Qdrant.
+"""
+import importlib
+from typing import Any, Dict, Type
+
+# Kind -> name -> "module:class"
+PROVIDERS: Dict[str, Dict[str, str]] = {
+    "llm": {
+        "azure_openai": "providers.llm.azure_openai:AzureOpenAILLMProvider",
+        "openai": "providers.llm.openai:OpenAILLMProvider",
+        "bedrock": "providers.llm.bedrock:BedrockLLMProvider",
+    },
+    "embeddings": {
+        "azure_openai": "providers.embeddings.azure_openai:AzureOpenAIEmbeddingProvider",
+        "openai": "providers.embeddings.openai:OpenAIEmbeddingProvider",
+    },
+    "vector_db": {
+        "local": "providers.vector_dbs.local:LocalVectorDB",
+        "qdrant": "providers.vector_dbs.qdrant:QdrantVectorDB",
+    },
+    "tool": {
+        "code_execution": "providers.tools.code_execution:CodeExecutionTool",
+    },
+    "connection": {
+        "kubernetes": "providers.connections.kubernetes:KubernetesConnection",
+        "notion": "providers.connections.notion:NotionConnection",
+    },
+}
+
+
+def register_provider(kind: str, name: str, target: str) -> None:
+    """
+    Register a provider class under `name`, given as "module:class" so that
+    its module is only imported when the provider is used.
+    """
+    PROVIDERS.setdefault(kind, {})[name] = target
+
+
+def get_provider(kind: str, name: str) -> Type:
+    """
+    Import and return the provider class registered under `kind` and `name`.
+
+    Raises:
+        ValueError: If no such provider is registered
+    """
+    target = PROVIDERS.get(kind, {}).get(name)
+    if target is None:
+        raise ValueError(
+            f"Unknown {kind} provider {name}. Registered: {', '.join(sorted(PROVIDERS.get(kind, {})))}"
+        )
+    module_name, _, class_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_provider(kind: str, name: str, *args, **kwargs) -> Any:
+    """Instantiate the provider registered under `kind` and `name`."""
+    return get_provider(kind, name)(*args, **kwargs)
@@ -43,6 +43,10 @@ class KubernetesConnection(BaseConnection):
         except config.config_exception.ConfigException as e:
             raise ValueError(f"Error loading Kubernetes config: {e}")
 
+    def warmup(self):
+        # Loading the kube config reads and parses files and may run auth plugins
+        self.api_client
+
     def close(self):
         if self._api_client:
             self._api_client.close()
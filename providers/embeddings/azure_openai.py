@@ -1,6 +1,7 @@
 import requests
 from typing import Optional, List
 from agent.retriever.embeddings import BaseEmbeddingProvider
+from agent.workers import register_after_fork
 
 class AzureOpenAIEmbeddingProvider(BaseEmbeddingProvider):
     dimension = 1536
@@ -10,6 +11,8 @@ class AzureOpenAIEmbeddingProvider(BaseEmbeddingProvider):
             endpoint: str, 
             deployment_name: str,
             dimension: int = 1536,
+            batch_size: int = 256,
+            pool_size: int = 32,
             **kwargs
         ):
         """
@@ -20,16 +23,43 @@ class AzureOpenAIEmbeddingProvider(BaseEmbeddingProvider):
             endpoint (Optional[str]): Endpoint URL for Azure OpenAI.
             deployment_name (str): Deployment name for the embedding model.
             dimension (int): Dimension of the embedding vectors.
+            batch_size (int): Maximum number of texts sent in one request by embed_texts.
+            pool_size (int): Maximum number of pooled keep-alive connections to the endpoint.
         """
         super().__init__(dimension=dimension, **kwargs)
         self.api_key = api_key
         self.endpoint = endpoint
         self.deployment_name = deployment_name
+        self.batch_size = batch_size
         self.api_url = f"{self.endpoint}/openai/deployments/{self.deployment_name}/embeddings?api-version=2023-05-15"
         self.headers = {
             "Content-Type": "application/json",
             "api-key": self.api_key
         }
+        self.pool_size = pool_size
+        self._session = None
+        register_after_fork(self)
+
+    @property
+    def session(self) -> requests.Session:
+        """Pool of keep-alive connections to the endpoint, created on first use."""
+        if self._session is None:
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=self.pool_size))
+            self._session = session
+        return self._session
+
+    def _after_fork(self):
+        # Pooled sockets must not be shared with the parent process
+        self._session = None
+
+    @property
+    def identity(self) -> str:
+        return f"azure_openai:{self.endpoint}/{self.deployment_name}:{self.dimension}"
+
+    def warmup(self):
+        # Any response will do: the TCP and TLS handshakes leave a pooled connection behind
+        self.session.head(self.endpoint, timeout=10)
 
     def embed_text(self, text: str) -> Optional[List[float]]:
         try:
@@ -39,10 +69,31 @@ class AzureOpenAIEmbeddingProvider(BaseEmbeddingProvider):
                 "encoding_format": "float", 
                 "dimensions": self.dimension
             }
-            response = requests.post(self.api_url, headers=self.headers, json=data)
+            response = self.session.post(self.api_url, headers=self.headers, json=data)
             response.raise_for_status()
             return response.json()["data"][0]["embedding"]
         except requests.exceptions.RequestException as e:
             print(f"Embedding request failed: {e}: {response.text}")
             return None
-        
\ No newline at end of file
+
+    def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        embeddings: List[Optional[List[float]]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = None
+            try:
+                data = {
+                    "input": batch,
+                    "model": self.deployment_name,
+                    "encoding_format": "float",
+                    "dimensions": self.dimension
+                }
+                response = self.session.post(self.api_url, headers=self.headers, json=data)
+                response.raise_for_status()
+                # Results carry the index of their input and are not guaranteed to be in order
+                results = sorted(response.json()["data"], key=lambda item: item["index"])
+                embeddings.extend(item["embedding"] for item in results)
+            except requests.exceptions.RequestException as e:
+                print(f"Embedding request failed: {e}: {response.text if response is not None else ''}")
+                embeddings.extend([None] * len(batch))
+        return embeddings
@@ -6,26 +6,34 @@ from agent.retriever.embeddings import BaseEmbeddingProvider
 class OpenAIEmbeddingProvider(BaseEmbeddingProvider):
     dimension = 1536
 
-    def __init__(self, api_key: Optional[str], model: str):
+    def __init__(self, api_key: Optional[str], model: str, dimensions: Optional[int] = None):
         """
         Initializes the OpenAI embedding provider.
 
         Args:
             api_key (Optional[str]): API key for OpenAI.
             model (str): The model to use for embeddings.
+            dimensions (Optional[int]): Truncate embeddings server-side to this size (text-embedding-3 models only).
         """
-        super().__init__()
+        super().__init__(dimension=dimensions or self.dimension)
         self.api_key = api_key
         self.model = model
+        self.dimensions = dimensions
         self.api_url = "https://api.openai.com/v1/embeddings"
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
 
+    @property
+    def identity(self) -> str:
+        return f"openai:{self.model}:{self.dimension}"
+
     def embed_text(self, text: str) -> Optional[List[float]]:
         try:
             data = {"model": self.model, "input": text}
+            if self.dimensions:
+                data["dimensions"] = self.dimensions
             response = requests.post(self.api_url, headers=self.headers, json=data)
             response.raise_for_status()
             return response.json()["data"][0]["embedding"]
@@ -4,11 +4,18 @@ import requests
 from agent.cognitive_engine.llm import BaseLLMProvider
 import json
 import time
+from agent.messages import Message, encode_json_array
+from agent.cancellation import CancellationToken, sleep
+from agent.workers import register_after_fork
+
+
+def _encode_message(message: Message) -> str:
+    return json.dumps({"role": message.role, "content": message.content})
 
 class AzureOpenAILLMProvider(BaseLLMProvider):
     supports_streaming = True
 
-    def __init__(self, api_key: str, endpoint: str, deployment_name: str):
+    def __init__(self, api_key: str, endpoint: str, deployment_name: str, pool_size: int = 32):
         super().__init__()
         self.api_key = api_key
         self.endpoint = endpoint
@@ -18,13 +25,33 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
             "Content-Type": "application/json",
             "api-key": self.api_key
         }
+        self.pool_size = pool_size
+        self._session = None
+        register_after_fork(self)
 
-    def generate_response(self, messages: List[dict], max_tokens: int, temperature: float) -> Optional[str]:
-        payload = {
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
+    @property
+    def session(self) -> requests.Session:
+        """Pool of keep-alive connections to the endpoint, created on first use."""
+        if self._session is None:
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=self.pool_size))
+            self._session = session
+        return self._session
+
+    def _after_fork(self):
+        # Pooled sockets must not be shared with the parent process
+        self._session = None
+
+    def warmup(self):
+        # Any response will do: the TCP and TLS handshakes leave a pooled connection behind
+        self.session.head(self.endpoint, timeout=10)
+
+    def _payload(self, messages: List[Message], **params) -> bytes:
+        """Request body; each message's JSON is cached on it and reused across calls."""
+        return f'{{"messages":{encode_json_array(messages, "openai", _encode_message)},{json.dumps(params)[1:]}'.encode()
+
+    def generate_response(self, messages: List[Message], max_tokens: int, temperature: float) -> Optional[str]:
+        payload = self._payload(messages, max_tokens=max_tokens, temperature=temperature)
         
         # Add retry logic with exponential backoff
         max_retries = 3
@@ -32,7 +59,7 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
         
         for attempt in range(max_retries):
             try:
-                response = requests.post(self.api_url, headers=self.headers, json=payload)
+                response = self.session.post(self.api_url, headers=self.headers, data=payload)
                 response.raise_for_status()
                 return response.json()["choices"][0]["message"]["content"].strip()
             except requests.exceptions.HTTPError as e:
@@ -47,17 +74,18 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
                 logging.error(f"Unexpected error: {str(e)}")
                 raise
 
-    def stream_response(self, messages: List[dict], max_tokens: int, temperature: float) -> Iterator[str]:
+    def stream_response(
+        self,
+        messages: List[Message],
+        max_tokens: int,
+        temperature: float,
+        cancellation: Optional[CancellationToken] = None
+    ) -> Iterator[str]:
         headers = {
             **self.headers,
             "Accept": "text/event-stream"
         }
-        payload = {
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "stream": True
-        }
+        payload = self._payload(messages, max_tokens=max_tokens, temperature=temperature, stream=True)
         
         # Add retry logic with exponential backoff
         max_retries = 3
@@ -65,10 +93,10 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
         
         for attempt in range(max_retries):
             try:
-                response = requests.post(
+                response = self.session.post(
                     self.api_url,
                     headers=headers,
-                    json=payload,
+                    data=payload,
                     stream=True,
                     timeout=60  # Add explicit timeout
                 )
@@ -80,7 +108,8 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429 and attempt < max_retries - 1:
                     logging.warning(f"Rate limited by Azure OpenAI (attempt {attempt+1}/{max_retries}). Retrying in {retry_delay} seconds.")
-                    time.sleep(retry_delay)
+                    if sleep(retry_delay, cancellation):
+                        return
                     retry_delay *= 2  # exponential backoff
                     continue
                 else:
@@ -97,7 +126,9 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
         if attempt == max_retries - 1:
             yield "Error: Maximum retry attempts reached. Azure OpenAI API is currently unavailable."
             return
-            
+        
+        # Cancelling the request closes the connection, which ends iter_lines
+        unregister = cancellation.register(response.close) if cancellation else None
         try:
             for line in response.iter_lines():
                 if not line:
@@ -117,5 +148,11 @@ class AzureOpenAILLMProvider(BaseLLMProvider):
                     except json.JSONDecodeError:
                         continue
         except Exception as e:
+            if cancellation and cancellation.cancelled:
+                return
             logging.error(f"Error during streaming: {str(e)}")
-            yield f"Error during streaming: {str(e)}"
\ No newline at end of file
+            yield f"Error during streaming: {str(e)}"
+        finally:
+            if unregister:
+                unregister()
+            response.close()
\ No newline at end of file
@@ -5,6 +5,12 @@ from agent.cognitive_engine.llm import BaseLLMProvider
 import json
 import time
 from botocore.exceptions import ClientError
+from agent.messages import Message, as_message, encode_json_array
+from agent.cancellation import CancellationToken, sleep
+
+
+def _encode_message(message: Message) -> str:
+    return json.dumps({"role": message.role, "content": [{"type": "text", "text": message.content}]})
 
 class BedrockLLMProvider(BaseLLMProvider):
     supports_streaming = True
@@ -23,25 +29,31 @@ class BedrockLLMProvider(BaseLLMProvider):
             region_name=region_name
         )
 
-    def generate_response(self, messages: List[dict], max_tokens: int, temperature: float) -> Optional[str]:
-        # Format messages for Claude
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": [{"type": "text", "text": msg["content"]}]
-            })
-        
-        # Prepare the payload
-        payload = {
+    def _body(self, messages: List[Message], max_tokens: int, temperature: float) -> str:
+        """
+        Request body for Claude. System messages go to the top-level `system`
+        field, which the Messages API requires; the nested form of every other
+        message is encoded once and cached on it.
+        """
+        messages = [as_message(message) for message in messages]
+        params = {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": max_tokens,
             "top_k": 250,
             "stop_sequences": [],
             "temperature": temperature,
-            "top_p": 0.999,
-            "messages": formatted_messages
+            "top_p": 0.999
         }
+        system = "\n\n".join(message.content for message in messages if message.role == "system")
+        if system:
+            params["system"] = system
+        conversation = encode_json_array(
+            [message for message in messages if message.role != "system"], "bedrock", _encode_message
+        )
+        return f'{json.dumps(params)[:-1]},"messages":{conversation}}}'
+
+    def generate_response(self, messages: List[Message], max_tokens: int, temperature: float) -> Optional[str]:
+        payload = self._body(messages, max_tokens, temperature)
         
         # Add retry logic with exponential backoff
         max_retries = 3
@@ -53,7 +65,7 @@ class BedrockLLMProvider(BaseLLMProvider):
                     modelId=self.model_id,
                     contentType="application/json",
                     accept="application/json",
-                    body=json.dumps(payload)
+                    body=payload
                 )
                 
                 # Parse response
@@ -72,25 +84,14 @@ class BedrockLLMProvider(BaseLLMProvider):
                 logging.error(f"Unexpected error: {str(e)}")
                 raise
 
-    def stream_response(self, messages: List[dict], max_tokens: int, temperature: float) -> Iterator[str]:
-        # Format messages for Claude
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": [{"type": "text", "text": msg["content"]}]
-            })
-        
-        # Prepare the payload
-        payload = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "top_k": 250,
-            "stop_sequences": [],
-            "temperature": temperature,
-            "top_p": 0.999,
-            "messages": formatted_messages
-        }
+    def stream_response(
+        self,
+        messages: List[Message],
+        max_tokens: int,
+        temperature: float,
+        cancellation: Optional[CancellationToken] = None
+    ) -> Iterator[str]:
+        payload = self._body(messages, max_tokens, temperature)
         
         # Add retry logic with exponential backoff
         max_retries = 3
@@ -102,7 +103,7 @@ class BedrockLLMProvider(BaseLLMProvider):
                     modelId=self.model_id,
                     contentType="application/json",
                     accept="application/json",
-                    body=json.dumps(payload)
+                    body=payload
                 )
                 
                 # If we reach here, we have a successful response
@@ -111,7 +112,8 @@ class BedrockLLMProvider(BaseLLMProvider):
             except ClientError as e:
                 if e.response['Error']['Code'] == 'ThrottlingException' and attempt < max_retries - 1:
                     logging.warning(f"Rate limited by Bedrock (attempt {attempt+1}/{max_retries}). Retrying in {retry_delay} seconds.")
-                    time.sleep(retry_delay)
+                    if sleep(retry_delay, cancellation):
+                        return
                     retry_delay *= 2  # exponential backoff
                     continue
                 else:
@@ -128,14 +130,23 @@ class BedrockLLMProvider(BaseLLMProvider):
             yield "Error: Maximum retry attempts reached. Bedrock API is currently unavailable."
             return
             
+        # Cancelling the request closes the event stream, which ends the loop below
+        body = response['body']
+        unregister = cancellation.register(body.close) if cancellation else None
         try:
             # Process streaming response
-            for event in response['body']:
+            for event in body:
                 if 'chunk' in event:
                     chunk_data = json.loads(event['chunk']['bytes'].decode('utf-8'))
                     if content := chunk_data.get('content'):
                         if content and len(content) > 0:
                             yield content[0]['text']
         except Exception as e:
+            if cancellation and cancellation.cancelled:
+                return
             logging.error(f"Error during streaming: {str(e)}")
-            yield f"Error during streaming: {str(e)}" 
\ No newline at end of file
+            yield f"Error during streaming: {str(e)}"
+        finally:
+            if unregister:
+                unregister()
+            body.close()
\ No newline at end of file
@@ -1,7 +1,13 @@
 import os
 from typing import Optional, List
 import requests
+import json
 from agent.cognitive_engine.llm import BaseLLMProvider
+from agent.messages import Message, encode_json_array
+
+
+def _encode_message(message: Message) -> str:
+    return json.dumps({"role": message.role, "content": message.content})
 
 class OpenAILLMProvider(BaseLLMProvider):
     def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4"):
@@ -13,13 +19,14 @@ class OpenAILLMProvider(BaseLLMProvider):
             "Authorization": f"Bearer {self.api_key}"
         }
 
-    def generate_response(self, messages: List[dict], max_tokens: int, temperature: float) -> Optional[str]:
-        payload = {
+    def generate_response(self, messages: List[Message], max_tokens: int, temperature: float) -> Optional[str]:
+        params = {
             "model": self.model,
-            "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature
             }
-        response = requests.post(self.api_url, headers=self.headers, json=payload)
+        # Each message's JSON is cached on it and reused across calls
+        payload = f'{{"messages":{encode_json_array(messages, "openai", _encode_message)},{json.dumps(params)[1:]}'
+        response = requests.post(self.api_url, headers=self.headers, data=payload.encode())
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"].strip()
\ No newline at end of file
@@ -12,6 +12,8 @@ class CodeExecutionTool(BaseTool):
         super().__init__(id)
         self.server_address = server_address.rstrip('/')
         self._description = description
+        # Runs arbitrary code, so its results are never cached or shared
+        self._side_effects = True
         
     @property
     def input_model(self) -> type[BaseModel]:
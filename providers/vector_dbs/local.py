@@ -0,0 +1,695 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+from typing import List, Any, Tuple, Dict, Optional
+import numpy as np
+from agent.retriever.vector_db import BaseVectorDB
+from .quantization import BaseQuantizer, kmeans, assign
+
+FORMAT_VERSION = 2
+CURRENT_FILE = "CURRENT"
+# Vectors added to a trained IVF index are kept in a pending array, scanned by
+# every query, until there are this many or 1/PENDING_FOLD_FRACTION of the index
+PENDING_FOLD_MIN = 4096
+PENDING_FOLD_FRACTION = 32
+
+
+def _snapshot_versions(path: str) -> List[int]:
+    """Sorted snapshot version numbers present under `path`."""
+    return sorted(
+        int(name[1:]) for name in os.listdir(path)
+        if name.startswith("v") and name[1:].isdigit()
+    )
+
+
+def _page_in(array: Optional[np.ndarray], page_size: int = mmap.PAGESIZE) -> None:
+    """Read one byte of every page of a memory-mapped array so later searches do not fault."""
+    if isinstance(array, np.memmap) and array.size:
+        np.asarray(array).reshape(-1).view(np.uint8)[::page_size].sum()
+
+
+class MetadataSidecar:
+    """
+    Read-only metadata of a snapshot: one JSON document per line plus an
+    offsets array, both memory-mapped so rows are only decoded when accessed.
+    """
+
+    def __init__(self, snapshot_dir: str):
+        self._offsets = np.load(os.path.join(snapshot_dir, "metadata_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(snapshot_dir, "metadata.jsonl"), "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+
+    @staticmethod
+    def write(snapshot_dir: str, rows) -> None:
+        offsets = [0]
+        with open(os.path.join(snapshot_dir, "metadata.jsonl"), "wb") as file:
+            for row in rows:
+                line = json.dumps(row).encode("utf-8") + b"\n"
+                file.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(os.path.join(snapshot_dir, "metadata_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return json.loads(self._data[self._offsets[index]:self._offsets[index + 1]])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class _IndexView:
+    """
+    The arrays a search reads, taken under the lock so that the scan itself
+    can run outside it and concurrent searches overlap. Writers replace these
+    arrays when they grow, compact, train or rebuild the lists, and append
+    past `count`, so a view stays consistent while they run; only updates and
+    deletes change single rows in place, which a search may or may not see.
+    """
+    __slots__ = (
+        "vectors", "codes", "deleted", "num_deleted", "assignments", "metadata", "count",
+        "centroids", "centroid_half_norms", "list_ids", "list_offsets", "pending"
+    )
+
+    def __init__(self, db: "LocalVectorDB"):
+        self.vectors = db._vectors
+        self.codes = db._codes
+        self.deleted = db._deleted
+        self.num_deleted = db._num_deleted
+        self.assignments = db._assignments
+        self.metadata = db._metadata
+        self.count = db._count
+        self.centroids = db._centroids
+        self.centroid_half_norms = db._centroid_half_norms
+        self.list_ids = db._list_ids
+        self.list_offsets = db._list_offsets
+        self.pending = db._pending
+
+
+class LocalVectorDB(BaseVectorDB):
+    """
+    In-process vector database backed by NumPy.
+
+    Vectors live in one contiguous float32 matrix and are searched either
+    exactly ("flat") or through an IVF-flat index: a k-means coarse quantizer
+    whose inverted lists are scanned for the `nprobe` closest centroids.
+    Vectors added after training are kept in a small pending array that
+    queries scan too, and merged into their lists in bulk.
+    Deletes are recorded as tombstones and purged by `compact()`.
+
+    With a `path`, `setup()` memory-maps the latest snapshot written by
+    `save()` instead of starting empty, so startup does not depend on corpus size.
+
+    With a `quantizer`, vectors are additionally stored as compact codes and
+    scored with asymmetric distance computation; the best `top_k * rerank_factor`
+    candidates are then re-scored with the float vectors when those are kept.
+    """
+    supported_similarity_metrics = ["Cosine", "Dot"]
+    supported_index_types = ["flat", "ivf"]
+
+    def __init__(self,
+            dimension: int,
+            score_threshold: float = 0.0,
+            similarity_metric: str = "Cosine",
+            index_type: str = "ivf",
+            nlist: Optional[int] = None,
+            nprobe: int = 8,
+            min_train_size: int = 4096,
+            kmeans_iterations: int = 20,
+            quantizer: Optional[BaseQuantizer] = None,
+            rerank_factor: int = 4,
+            store_vectors: bool = True,
+            path: Optional[str] = None,
+            mmap: bool = True,
+            keep_snapshots: int = 2,
+            seed: int = 0,
+            **kwargs
+        ):
+        """
+        :param index_type: "flat" for exact search or "ivf" for an IVF-flat index
+        :param nlist: Number of inverted lists, defaults to 4 * sqrt(n) at training time
+        :param nprobe: Number of inverted lists scanned per query (recall/latency trade-off)
+        :param min_train_size: Number of vectors after which the index and quantizer train themselves
+        :param kmeans_iterations: Lloyd iterations used when training the coarse quantizer
+        :param quantizer: Optional ScalarQuantizer/ProductQuantizer used to store compact codes
+        :param rerank_factor: Candidates per result re-scored with float vectors (0 disables re-ranking)
+        :param store_vectors: Keep float vectors once the quantizer is trained; required for re-ranking
+        :param path: Snapshot directory used by `setup()`, `save()` and `load()`
+        :param mmap: Memory-map snapshot files on load instead of reading them into memory
+        :param keep_snapshots: Number of snapshot versions kept under `path`, at least 1
+        """
+        super().__init__(
+            similarity_metric=similarity_metric,
+            score_threshold=score_threshold,
+            dimension=dimension,
+            **kwargs
+        )
+        if index_type not in self.supported_index_types:
+            raise ValueError(
+                f"Index type {index_type} not supported. "
+                f"Supported index types: {self.supported_index_types}"
+            )
+        if keep_snapshots < 1:
+            raise ValueError(f"keep_snapshots must be at least 1, got {keep_snapshots}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iterations = kmeans_iterations
+        self.quantizer = quantizer
+        self.rerank_factor = rerank_factor
+        self.store_vectors = store_vectors
+        self.path = path
+        self.mmap = mmap
+        self.keep_snapshots = keep_snapshots
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._fingerprint: Optional[str] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vectors: Optional[np.ndarray] = np.empty((0, self.dimension), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        self._deleted = np.empty(0, dtype=bool)
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._metadata: List[Dict[str, Any]] = []
+        self._count = 0
+        self._num_deleted = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_half_norms: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        self._list_ids: Optional[np.ndarray] = None
+        self._pending = np.empty(0, dtype=np.int64)
+        if self.quantizer:
+            self.quantizer.is_trained = False
+
+    @property
+    def count(self) -> int:
+        """Number of live (non-deleted) vectors."""
+        return self._count - self._num_deleted
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def is_quantized(self) -> bool:
+        return self._codes is not None
+
+    @property
+    def _needs_training(self) -> bool:
+        return (
+            (self.index_type == "ivf" and not self.is_trained)
+            or (self.quantizer is not None and not self.is_quantized)
+        )
+
+    def setup(self) -> None:
+        with self._lock:
+            if self.has_snapshot():
+                self.load()
+            else:
+                self._reset()
+
+    def teardown(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def clear(self) -> None:
+        # setup() would reload the snapshot being replaced
+        with self._lock:
+            self._reset()
+            self._fingerprint = None
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self._fingerprint
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        self._fingerprint = fingerprint
+
+    def add_vectors(self, data: List[Tuple[List[float], Dict[str, Any]]]) -> None:
+        if not data:
+            return
+        vectors = self._prepare(np.asarray([vector for vector, _ in data], dtype=np.float32))
+
+        with self._lock:
+            self._materialize()
+            start = self._count
+            end = start + len(vectors)
+            self._ensure_capacity(end)
+            self._write_rows(slice(start, end), vectors)
+            self._deleted[start:end] = False
+            self._metadata.extend(dict(metadata) for _, metadata in data)
+            self._count = end
+
+            if self._needs_training and self.count >= self.min_train_size:
+                self.train()
+            elif len(self._pending) > max(PENDING_FOLD_MIN, self._count // PENDING_FOLD_FRACTION):
+                self._fold_pending()
+
+    def find_similar(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filter_dict: Optional[Dict] = None,
+        with_vectors: bool = False
+    ) -> List[Dict[str, Any]]:
+        query = self._prepare(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+
+        with self._lock:
+            view = self._view()
+        ids, scores = self._search(view, query, top_k, filter_dict)
+        results = [{
+            'source': view.metadata[i].get('source'),
+            'metadata': view.metadata[i],
+            'score': float(score)
+        } for i, score in zip(ids, scores)]
+        if with_vectors:
+            vectors = view.vectors[ids] if view.vectors is not None else self.quantizer.decode(view.codes[ids])
+            for result, vector in zip(results, vectors):
+                result['vector'] = vector
+        return results
+
+    def delete_vectors(self, filter_dict: Dict) -> None:
+        with self._lock:
+            for i in range(self._count):
+                if not self._deleted[i] and self._matches(self._metadata[i], filter_dict):
+                    self._deleted[i] = True
+                    self._num_deleted += 1
+
+    def update_vectors(
+        self,
+        retriever_uri_pairs: List[Tuple[str, str, List[float]]]
+    ) -> None:
+        for retriever_id, uri, new_vector in retriever_uri_pairs:
+            metadata = {"retriever_id": retriever_id, "uri": uri}
+            with self._lock:
+                existing = next(
+                    (i for i in range(self._count)
+                     if not self._deleted[i] and self._matches(self._metadata[i], metadata)),
+                    None
+                )
+                if existing is None:
+                    self.add_vectors([(new_vector, metadata)])
+                    logging.info(f"Added new vector for retriever_id: {retriever_id} and uri: {uri}")
+                    continue
+
+                vector = self._prepare(np.asarray(new_vector, dtype=np.float32).reshape(1, -1))
+                self._materialize()
+                self._write_rows(slice(existing, existing + 1), vector)
+
+    def train(self, nlist: Optional[int] = None) -> None:
+        """
+        Train the IVF coarse quantizer and the vector quantizer (when configured)
+        over a sample of the live vectors, then assign and encode every vector.
+        """
+        with self._lock:
+            live = np.flatnonzero(~self._deleted[:self._count])
+            if len(live) == 0:
+                return
+            self._materialize()
+            vectors = self._float_rows(slice(0, self._count))
+
+            if self.index_type == "ivf":
+                nlist = nlist or self.nlist or max(1, int(4 * np.sqrt(len(live))))
+                nlist = min(nlist, len(live))
+                sample = self._rng.choice(live, min(len(live), nlist * 256), replace=False)
+                logging.info(f"Training IVF index with {nlist} lists on {len(sample)} vectors")
+                self._set_centroids(kmeans(vectors[sample], nlist, self.kmeans_iterations, self._rng))
+                # Replaced rather than overwritten, as searches may be reading the old assignments
+                assignments = np.full(len(self._deleted), -1, dtype=np.int32)
+                assignments[:self._count] = assign(vectors, self._centroids)
+                self._assignments = assignments
+
+            if self.quantizer is not None:
+                sample = self._rng.choice(live, min(len(live), 65536), replace=False)
+                logging.info(f"Training {self.quantizer.name} quantizer on {len(sample)} vectors")
+                self.quantizer.train(vectors[sample])
+                self._codes = np.empty((len(self._deleted), self.quantizer.code_size),
+                                       dtype=self.quantizer.encode(vectors[:1]).dtype)
+                self._codes[:self._count] = self.quantizer.encode(vectors)
+                if not self.store_vectors:
+                    self._vectors = None
+
+    def compact(self) -> None:
+        """Physically remove tombstoned vectors."""
+        with self._lock:
+            if not self._num_deleted:
+                return
+            self._materialize()
+            live = np.flatnonzero(~self._deleted[:self._count])
+            if self._vectors is not None:
+                self._vectors = self._vectors[live].copy()
+            if self._codes is not None:
+                self._codes = self._codes[live].copy()
+            self._assignments = self._assignments[live].copy()
+            self._deleted = np.zeros(len(live), dtype=bool)
+            self._metadata = [self._metadata[i] for i in live]
+            self._count = len(live)
+            self._num_deleted = 0
+            self._invalidate_lists()
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Bytes of private memory held by each part of the index. Read-only
+        memory-mapped snapshot data lives in the shared page cache and is
+        reported separately as "mapped".
+        """
+        with self._lock:
+            index_arrays = [
+                self._deleted, self._assignments, self._centroids, self._list_ids, self._list_offsets, self._pending
+            ]
+            mapped = [array for array in [self._vectors, self._codes] + index_arrays
+                      if array is not None and not array.flags.writeable]
+
+            def resident(*arrays) -> int:
+                return sum(array.nbytes for array in arrays if array is not None and array.flags.writeable)
+
+            footprint = {
+                "vectors": resident(self._vectors),
+                "codes": resident(self._codes),
+                "index": resident(*index_arrays),
+                "quantizer": self.quantizer.codebook_size if self.quantizer else 0,
+            }
+            footprint["total"] = sum(footprint.values())
+            footprint["mapped"] = sum(array.nbytes for array in mapped)
+            return footprint
+
+    def measure_recall(self, query_vectors: List[List[float]], top_k: int) -> float:
+        """
+        Recall@k of the current index/quantizer settings against an exact float
+        scan, averaged over the given queries.
+        """
+        if self._vectors is None:
+            raise ValueError("Measuring recall requires float vectors (store_vectors=True)")
+        queries = self._prepare(np.asarray(query_vectors, dtype=np.float32))
+        hits = total = 0
+        with self._lock:
+            view = self._view()
+        for query in queries:
+            found, _ = self._search(view, query, top_k)
+            expected, _ = self._search(view, query, top_k, exact=True)
+            hits += len(np.intersect1d(found, expected))
+            total += len(expected)
+        return hits / total if total else 1.0
+
+    def has_snapshot(self, path: Optional[str] = None) -> bool:
+        path = path or self.path
+        return bool(path) and os.path.exists(os.path.join(path, CURRENT_FILE))
+
+    def save(self, path: Optional[str] = None) -> str:
+        """
+        Write a new snapshot version under `path` and point CURRENT at it.
+
+        The snapshot is written to a temporary directory and renamed into place,
+        so readers never observe a partial snapshot. Only the newest
+        `keep_snapshots` versions are kept; processes that still map an older
+        version keep working since unlinked files stay mapped.
+
+        :return: The directory of the written snapshot
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given to save the vector database to")
+        os.makedirs(path, exist_ok=True)
+
+        with self._lock:
+            versions = _snapshot_versions(path)
+            name = f"v{(versions[-1] + 1 if versions else 1):06d}"
+            tmp_dir = os.path.join(path, f".tmp-{name}-{os.getpid()}")
+            os.makedirs(tmp_dir)
+
+            if self._vectors is not None:
+                np.save(os.path.join(tmp_dir, "vectors.npy"), self._vectors[:self._count])
+            if self._codes is not None:
+                np.save(os.path.join(tmp_dir, "codes.npy"), self._codes[:self._count])
+                np.savez(os.path.join(tmp_dir, "quantizer.npz"), **self.quantizer.state())
+            np.save(os.path.join(tmp_dir, "deleted.npy"), self._deleted[:self._count])
+            np.save(os.path.join(tmp_dir, "assignments.npy"), self._assignments[:self._count])
+            if self.is_trained:
+                if self._list_ids is None:
+                    self._rebuild_lists()
+                elif len(self._pending):
+                    self._fold_pending()
+                np.save(os.path.join(tmp_dir, "centroids.npy"), self._centroids)
+                np.save(os.path.join(tmp_dir, "list_ids.npy"), self._list_ids)
+                np.save(os.path.join(tmp_dir, "list_offsets.npy"), self._list_offsets)
+            MetadataSidecar.write(tmp_dir, (self._metadata[i] for i in range(self._count)))
+            with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as file:
+                json.dump({
+                    "format_version": FORMAT_VERSION,
+                    "dimension": self.dimension,
+                    "similarity_metric": self.similarity_metric,
+                    "index_type": self.index_type,
+                    "count": self._count,
+                    "trained": self.is_trained,
+                    "quantizer": self.quantizer.name if self.is_quantized else None,
+                    "has_vectors": self._vectors is not None,
+                    "fingerprint": self._fingerprint,
+                }, file)
+
+            snapshot_dir = os.path.join(path, name)
+            os.rename(tmp_dir, snapshot_dir)
+            tmp_current = os.path.join(path, f".{CURRENT_FILE}-{os.getpid()}")
+            with open(tmp_current, "w", encoding="utf-8") as file:
+                file.write(name)
+            os.replace(tmp_current, os.path.join(path, CURRENT_FILE))
+
+            for version in _snapshot_versions(path)[:-self.keep_snapshots]:
+                shutil.rmtree(os.path.join(path, f"v{version:06d}"), ignore_errors=True)
+
+        logging.info(f"Saved vector database snapshot {snapshot_dir} with {self.count} vectors")
+        return snapshot_dir
+
+    def load(self, path: Optional[str] = None) -> None:
+        """
+        Load the CURRENT snapshot under `path`, replacing the current contents.
+
+        With `mmap` enabled, vectors, codes, inverted lists and metadata are
+        memory-mapped rather than read, so loading is O(1) in corpus size and
+        pages are shared between processes through the OS page cache. The
+        first mutation copies the mapped arrays into private memory.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given to load the vector database from")
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as file:
+            snapshot_dir = os.path.join(path, file.read().strip())
+
+        with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector database format version: {manifest['format_version']}")
+        if manifest["dimension"] != self.dimension or manifest["similarity_metric"] != self.similarity_metric:
+            raise ValueError(
+                f"Stored index ({manifest['dimension']}, {manifest['similarity_metric']}) does not match "
+                f"configured index ({self.dimension}, {self.similarity_metric})"
+            )
+        if manifest["quantizer"] and manifest["quantizer"] != (self.quantizer.name if self.quantizer else None):
+            raise ValueError(f"Stored index uses quantizer {manifest['quantizer']}, which is not configured")
+
+        mmap_mode = "r" if self.mmap else None
+
+        def load_array(name: str) -> np.ndarray:
+            return np.load(os.path.join(snapshot_dir, name), mmap_mode=mmap_mode)
+
+        with self._lock:
+            self._reset()
+            self._vectors = load_array("vectors.npy") if manifest["has_vectors"] else None
+            if manifest["quantizer"]:
+                with np.load(os.path.join(snapshot_dir, "quantizer.npz")) as state:
+                    self.quantizer.load_state(dict(state))
+                self._codes = load_array("codes.npy")
+            self._deleted = np.load(os.path.join(snapshot_dir, "deleted.npy"))
+            self._assignments = load_array("assignments.npy")
+            self._metadata = MetadataSidecar(snapshot_dir)
+            if not self.mmap:
+                self._metadata = list(self._metadata)
+            self._count = manifest["count"]
+            self._fingerprint = manifest.get("fingerprint")
+            self._num_deleted = int(self._deleted.sum())
+            if manifest["trained"]:
+                self._set_centroids(np.load(os.path.join(snapshot_dir, "centroids.npy")))
+                self._list_ids = load_array("list_ids.npy")
+                self._list_offsets = np.load(os.path.join(snapshot_dir, "list_offsets.npy"))
+
+        logging.info(f"Loaded vector database snapshot {snapshot_dir} with {self.count} vectors")
+
+    def persist(self) -> None:
+        if self.path:
+            self.save()
+
+    def warmup(self) -> None:
+        """Page in the memory-mapped arrays scanned by searches."""
+        with self._lock:
+            for array in (self._vectors, self._codes, self._assignments, self._list_ids):
+                _page_in(array)
+
+    def _materialize(self) -> None:
+        """Copy memory-mapped snapshot data into private memory before it is mutated."""
+        if self._vectors is not None and not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors)
+        if self._codes is not None and not self._codes.flags.writeable:
+            self._codes = np.array(self._codes)
+        if not self._assignments.flags.writeable:
+            self._assignments = np.array(self._assignments)
+        if isinstance(self._metadata, MetadataSidecar):
+            self._metadata = list(self._metadata)
+
+    def _view(self) -> _IndexView:
+        """Take a view of the index for a search, building the inverted lists first if needed. Caller holds the lock."""
+        if self.index_type == "ivf" and self.is_trained and self._list_ids is None:
+            self._rebuild_lists()
+        return _IndexView(self)
+
+    def _search(
+        self,
+        view: _IndexView,
+        query: np.ndarray,
+        top_k: int,
+        filter_dict: Optional[Dict] = None,
+        exact: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids and scores of the best matches in `view`, best first. Needs no lock."""
+        candidates = None if exact else self._candidate_ids(view, query)
+        if candidates is None:
+            ids = np.flatnonzero(~view.deleted[:view.count]) if view.num_deleted else np.arange(view.count)
+        else:
+            ids = candidates[~view.deleted[candidates]]
+
+        if filter_dict:
+            keep = np.fromiter(
+                (self._matches(view.metadata[i], filter_dict) for i in ids),
+                dtype=bool,
+                count=len(ids)
+            )
+            ids = ids[keep]
+
+        if view.codes is not None and not exact:
+            scores = self.quantizer.inner_product(query, view.codes[ids])
+            if self.rerank_factor and view.vectors is not None:
+                shortlist = self._top_k(scores, top_k * self.rerank_factor)
+                ids = ids[shortlist]
+                scores = view.vectors[ids] @ query
+        else:
+            scores = view.vectors[ids] @ query
+
+        keep = scores >= self.score_threshold
+        ids, scores = ids[keep], scores[keep]
+        top = self._top_k(scores, top_k)
+        return ids[top], scores[top]
+
+    def _write_rows(self, rows: slice, vectors: np.ndarray) -> None:
+        """Store prepared vectors at the given rows: floats, codes and list assignment."""
+        if self._vectors is not None:
+            self._vectors[rows] = vectors
+        if self._codes is not None:
+            self._codes[rows] = self.quantizer.encode(vectors)
+        if self.is_trained:
+            self._assignments[rows] = assign(vectors, self._centroids)
+            if rows.start >= self._count and self._list_ids is not None:
+                # Appended rows are searched as pending ids until they are folded into the lists
+                self._pending = np.concatenate((self._pending, np.arange(rows.start, rows.stop)))
+            else:
+                # An updated vector may move to another list
+                self._invalidate_lists()
+        else:
+            self._assignments[rows] = -1
+
+    def _float_rows(self, rows) -> np.ndarray:
+        """Float vectors for the given rows, reconstructed from codes if floats were dropped."""
+        if self._vectors is not None:
+            return self._vectors[rows]
+        return self.quantizer.decode(self._codes[rows])
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got shape {vectors.shape}")
+        if self.similarity_metric == "Cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _ensure_capacity(self, size: int) -> None:
+        capacity = len(self._deleted)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        if self._vectors is not None:
+            vectors = np.empty((capacity, self.dimension), dtype=np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            self._vectors = vectors
+        if self._codes is not None:
+            codes = np.empty((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+            codes[:self._count] = self._codes[:self._count]
+            self._codes = codes
+        deleted = np.zeros(capacity, dtype=bool)
+        deleted[:self._count] = self._deleted[:self._count]
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[:self._count] = self._assignments[:self._count]
+        self._deleted, self._assignments = deleted, assignments
+
+    def _candidate_ids(self, view: _IndexView, query: np.ndarray) -> Optional[np.ndarray]:
+        """Vector ids in the `nprobe` closest inverted lists, or None for an exact scan."""
+        if self.index_type != "ivf" or view.list_ids is None:
+            return None
+
+        nlist = len(view.centroids)
+        nprobe = min(self.nprobe, nlist)
+        centroid_scores = view.centroids @ query - view.centroid_half_norms
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        probed = np.zeros(nlist, dtype=bool)
+        probed[probe] = True
+        return np.concatenate([
+            view.list_ids[view.list_offsets[l]:view.list_offsets[l + 1]] for l in probe
+        ] + [view.pending[probed[view.assignments[view.pending]]]])
+
+    def _set_centroids(self, centroids: np.ndarray) -> None:
+        self._centroids = centroids
+        self._centroid_half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+        self._invalidate_lists()
+
+    def _invalidate_lists(self) -> None:
+        """Drop the inverted lists, and with them the pending ids; the next search rebuilds them."""
+        self._list_ids = None
+        self._pending = np.empty(0, dtype=np.int64)
+
+    def _rebuild_lists(self) -> None:
+        """Rebuild the inverted lists (CSR layout) from the per-vector assignments."""
+        assignments = self._assignments[:self._count]
+        ids = np.flatnonzero(assignments >= 0)
+        order = np.argsort(assignments[ids], kind="stable")
+        counts = np.bincount(assignments[ids], minlength=len(self._centroids))
+        self._list_ids = ids[order]
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._pending = np.empty(0, dtype=np.int64)
+
+    def _fold_pending(self) -> None:
+        """
+        Append the pending ids to the ends of their inverted lists. This is a
+        single linear merge, unlike `_rebuild_lists`, which sorts every id.
+        """
+        pending = self._pending[np.argsort(self._assignments[self._pending], kind="stable")]
+        lists = self._assignments[pending]
+        counts = np.bincount(lists, minlength=len(self._centroids))
+        self._list_ids = np.insert(self._list_ids, self._list_offsets[lists + 1], pending)
+        self._list_offsets = self._list_offsets + np.concatenate(([0], np.cumsum(counts)))
+        self._pending = np.empty(0, dtype=np.int64)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        if top_k <= 0 or len(scores) == 0:
+            return np.empty(0, dtype=np.int64)
+        if top_k < len(scores):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filter_dict: Dict) -> bool:
+        return all(metadata.get(key) == value for key, value in filter_dict.items())
@@ -7,34 +7,116 @@ import uuid
 
 class QdrantVectorDB(BaseVectorDB):
     supported_similarity_metrics = ["Cosine", "Euclid", "Dot", "Manhattan"]
+    supported_quantizations = ["int8", "pq"]
 
     def __init__(self, 
             dimension: int,
             in_memory: bool = True,
+            path: Optional[str] = None,
+            on_disk: bool = False,
             host: Optional[str] = "localhost", 
             port: Optional[int] = 6333, 
             score_threshold: float = 0.0,
             collection: str = "default",
             similarity_metric: str = "Cosine",
+            quantization: Optional[str] = None,
+            rescore_oversampling: float = 2.0,
             **kwargs
         ):
+        """
+        :param path: Directory for Qdrant's embedded on-disk storage, kept across restarts
+        :param on_disk: Store original vectors memory-mapped on disk instead of in RAM
+        :param quantization: Optional "int8" (scalar) or "pq" (product) quantization of stored vectors
+        :param rescore_oversampling: Candidates fetched per result and re-scored with the original vectors
+            when quantization is enabled
+        """
+        if quantization is not None and quantization not in self.supported_quantizations:
+            raise ValueError(
+                f"Quantization {quantization} not supported. "
+                f"Supported quantizations: {self.supported_quantizations}"
+            )
         super().__init__(
             similarity_metric=similarity_metric,
             score_threshold=score_threshold,
             dimension=dimension,
             **kwargs
         )
-        self.client = QClient(location=":memory:") if in_memory else QClient(host=host, port=port)
+        if path:
+            self.client = QClient(path=path)
+        elif in_memory:
+            self.client = QClient(location=":memory:")
+        else:
+            self.client = QClient(host=host, port=port)
+        self.on_disk = on_disk
         self.collection = collection
+        self.quantization = quantization
+        self.rescore_oversampling = rescore_oversampling
+
+    def _quantization_config(self):
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=True)
+            )
+        if self.quantization == "pq":
+            return models.ProductQuantization(
+                product=models.ProductQuantizationConfig(compression=models.CompressionRatio.X16, always_ram=True)
+            )
+        return None
+
+    @property
+    def _fingerprint_collection(self) -> str:
+        # Collections carry no metadata of their own; the fingerprint is kept in a one-point companion collection
+        return f"{self.collection}_fingerprint"
+
+    @property
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection, exact=True).count
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        if not self.client.collection_exists(collection_name=self._fingerprint_collection):
+            return None
+        points = self.client.retrieve(collection_name=self._fingerprint_collection, ids=[0])
+        return points[0].payload.get("fingerprint") if points else None
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        if not self.client.collection_exists(collection_name=self._fingerprint_collection):
+            self.client.create_collection(
+                collection_name=self._fingerprint_collection,
+                vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT)
+            )
+        self.client.upsert(
+            collection_name=self._fingerprint_collection,
+            points=[models.PointStruct(id=0, vector=[1.0], payload={"fingerprint": fingerprint})]
+        )
 
     def setup(self) -> None:
-        self.client.recreate_collection(
+        # Reuse a persisted collection so startup does not re-index the corpus
+        if self.client.collection_exists(collection_name=self.collection):
+            vectors = self.client.get_collection(collection_name=self.collection).config.params.vectors
+            if vectors.size != self.dimension or vectors.distance != self.similarity_metric:
+                raise ValueError(
+                    f"Stored collection {self.collection} ({vectors.size}, {vectors.distance}) does not match "
+                    f"configured index ({self.dimension}, {self.similarity_metric})"
+                )
+            return
+        self.client.create_collection(
             collection_name=self.collection,
-            vectors_config=models.VectorParams(size=self.dimension, distance=self.similarity_metric),
+            vectors_config=models.VectorParams(
+                size=self.dimension,
+                distance=self.similarity_metric,
+                on_disk=self.on_disk
+            ),
+            quantization_config=self._quantization_config(),
         )
 
+    def warmup(self) -> None:
+        # Opens the connection to a remote server, or loads an embedded collection
+        self.client.count(collection_name=self.collection, exact=False)
+
     def teardown(self) -> None:
         self.client.delete_collection(collection_name=self.collection)
+        self.client.delete_collection(collection_name=self._fingerprint_collection)
 
     def add_vectors(self, data: List[Tuple[List[float], Dict[str, Any]]]) -> None:
         points = []
@@ -55,7 +137,8 @@ class QdrantVectorDB(BaseVectorDB):
         self, 
         query_vector: List[float], 
         top_k: int,
-        filter_dict: Optional[Dict] = None
+        filter_dict: Optional[Dict] = None,
+        with_vectors: bool = False
     ) -> List[Dict[str, Any]]:
         # Convert filter_dict to Qdrant filter format if provided
         qdrant_filter = None
@@ -70,19 +153,36 @@ class QdrantVectorDB(BaseVectorDB):
                 )
             qdrant_filter = models.Filter(must=must_conditions)
 
+        search_params = None
+        if self.quantization:
+            search_params = models.SearchParams(
+                quantization=models.QuantizationSearchParams(
+                    rescore=True,
+                    oversampling=self.rescore_oversampling
+                )
+            )
+
         search_result = self.client.search(
             collection_name=self.collection,
             query_vector=query_vector,
             limit=top_k,
             score_threshold=self.score_threshold,
-            query_filter=qdrant_filter
+            query_filter=qdrant_filter,
+            search_params=search_params,
+            with_vectors=with_vectors
         )
         
-        return [{
-            'source': hit.payload['source'],
-            'metadata': hit.payload,
-            'score': hit.score
-        } for hit in search_result]
+        results = []
+        for hit in search_result:
+            result = {
+                'source': hit.payload['source'],
+                'metadata': hit.payload,
+                'score': hit.score
+            }
+            if with_vectors:
+                result['vector'] = hit.vector
+            results.append(result)
+        return results
 
     def delete_vectors(self, filter_dict: Dict) -> None:
         must_conditions = []
@@ -0,0 +1,198 @@
+from abc import ABC, abstractmethod
+from typing import Dict
+import numpy as np
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means with random initialisation; empty clusters are re-seeded."""
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(data, centroids)
+
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+    """Index of the nearest centroid (L2) for each vector, computed in batches."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        labels[start:start + batch_size] = np.argmax(batch @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+class BaseQuantizer(ABC):
+    """
+    Compresses float32 vectors into compact codes and scores queries against
+    the codes with asymmetric distance computation (float query, coded database).
+    """
+    name: str
+
+    def __init__(self):
+        self.is_trained = False
+
+    @property
+    @abstractmethod
+    def code_size(self) -> int:
+        """Bytes per encoded vector."""
+        pass
+
+    @abstractmethod
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit the quantizer parameters on a sample of vectors."""
+        pass
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode an (n, d) float matrix into an (n, code_size) code matrix."""
+        pass
+
+    @abstractmethod
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Reconstruct approximate float vectors from codes."""
+        pass
+
+    @abstractmethod
+    def inner_product(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner product between a float query and each encoded vector."""
+        pass
+
+    @abstractmethod
+    def state(self) -> Dict[str, np.ndarray]:
+        """Trained parameters as arrays, for persistence."""
+        pass
+
+    @abstractmethod
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Restore parameters produced by `state()`."""
+        pass
+
+    @property
+    def codebook_size(self) -> int:
+        """Bytes used by the trained parameters."""
+        return sum(array.nbytes for array in self.state().values()) if self.is_trained else 0
+
+
+class ScalarQuantizer(BaseQuantizer):
+    """
+    Per-dimension int8 scalar quantization (4x smaller than float32).
+    """
+    name = "int8"
+
+    def __init__(self, batch_size: int = 65536):
+        super().__init__()
+        self.batch_size = batch_size
+        self.offset = None
+        self.scale = None
+
+    @property
+    def code_size(self) -> int:
+        return len(self.scale)
+
+    def train(self, vectors: np.ndarray) -> None:
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = low.astype(np.float32)
+        self.scale = (np.maximum(high - low, 1e-12) / 255.0).astype(np.float32)
+        self.is_trained = True
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128) * self.scale + self.offset
+
+    def inner_product(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # q . ((c + 128) * s + o) == (q * s) . c + 128 * sum(q * s) + q . o
+        weights = query * self.scale
+        bias = 128.0 * weights.sum() + query @ self.offset
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.batch_size):
+            batch = codes[start:start + self.batch_size]
+            scores[start:start + self.batch_size] = batch @ weights
+        return scores + bias
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"offset": self.offset, "scale": self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.offset = state["offset"]
+        self.scale = state["scale"]
+        self.is_trained = True
+
+
+class ProductQuantizer(BaseQuantizer):
+    """
+    Product quantization: the vector is split into `num_subspaces` chunks and
+    each chunk is replaced by the index of its nearest of 256 sub-centroids,
+    so every vector costs `num_subspaces` bytes.
+    """
+    name = "pq"
+
+    def __init__(self, num_subspaces: int = 64, iterations: int = 20, seed: int = 0, batch_size: int = 65536):
+        super().__init__()
+        self.num_subspaces = num_subspaces
+        self.iterations = iterations
+        self.batch_size = batch_size
+        self._rng = np.random.default_rng(seed)
+        self.codebooks = None
+
+    @property
+    def code_size(self) -> int:
+        return self.num_subspaces
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dimension = vectors.shape
+        if dimension % self.num_subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible by {self.num_subspaces} subspaces")
+        return vectors.reshape(n, self.num_subspaces, dimension // self.num_subspaces)
+
+    def train(self, vectors: np.ndarray) -> None:
+        subvectors = self._split(vectors)
+        num_centroids = min(256, len(vectors))
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(subvectors[:, j]), num_centroids, self.iterations, self._rng)
+            for j in range(self.num_subspaces)
+        ]).astype(np.float32)
+        self.is_trained = True
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subvectors = self._split(vectors)
+        codes = np.empty((len(vectors), self.num_subspaces), dtype=np.uint8)
+        for j in range(self.num_subspaces):
+            codes[:, j] = assign(np.ascontiguousarray(subvectors[:, j]), self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        subspaces = np.arange(self.num_subspaces)
+        return self.codebooks[subspaces, codes].reshape(len(codes), -1)
+
+    def inner_product(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # Lookup table of query-chunk . sub-centroid, summed over the code bytes
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.num_subspaces, -1))
+        subspaces = np.arange(self.num_subspaces)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.batch_size):
+            batch = codes[start:start + self.batch_size]
+            scores[start:start + self.batch_size] = table[subspaces, batch].sum(axis=1)
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.codebooks = state["codebooks"]
+        self.num_subspaces = len(self.codebooks)
+        self.is_trained = True